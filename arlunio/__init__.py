@@ -1,19 +1,35 @@
 import inspect
 import logging
+import threading
 from typing import Any
+from typing import Callable
 from typing import ClassVar
 from typing import Dict
+from typing import FrozenSet
 from typing import List
 from typing import Optional
+from typing import Tuple
 
 import attr
+import numpy as np
 
 from ._version import __version__
+from .cache import CACHE
+from .cache import freeze
+from .cache import thaw
 
 __all__ = ["Defn", "DefnInput", "definition", "__version__"]
 
 logger = logging.getLogger(__name__)
 
+_RESTRICT_MAX_COVERAGE = 0.5
+"""Only restrict evaluation to a definition's bounds if they cover at most this
+fraction of the image."""
+
+_RESTRICT_MIN_PIXELS = 128 * 128
+"""Only restrict evaluation to a definition's bounds if doing so skips at least this
+many pixels."""
+
 
 def _format_type(obj: Optional[Any] = None, type_: Optional[Any] = None) -> str:
     """Given an object, return an appropriate representation for its type."""
@@ -63,6 +79,16 @@ class _BaseDefn(type):
 class Defn(metaclass=_BaseDefn):
     """Defn, short for 'Definition' is the object that powers the rest of
     :code:`arlunio`.
+
+    While a definition is being evaluated, the result of each base definition is
+    remembered so that any other part of the evaluation that asks for the same base,
+    with the same attribute values and inputs, is given the existing result rather
+    than computing it again. Each part of the evaluation is given its own copy of
+    any array that can be modified, so it is free to modify it in place.
+
+    Definitions created with :code:`@definition(cache=True)` go further and keep
+    their results in a process wide :class:`arlunio.cache.Cache` so that they can be
+    reused across evaluations.
     """
 
     ATTR_ID: ClassVar[str] = "arlunio.attribute"
@@ -82,57 +108,190 @@ class Defn(metaclass=_BaseDefn):
     OP_XOR: ClassVar[str] = "exclusive_or"
 
     def __call__(self, *pos, **kwargs):
-        logger.debug("Preparing: '%s'", self.__class__.__name__)
-        logger.debug("--> Positional Args: %s", pos)
-        logger.debug("--> Keyword arguments: %s", kwargs.keys())
 
         # Requiring inputs to be given as kw args makes the api less sensitive to
         # changes in the implementation
         if len(pos) != 0:
             raise TypeError("Definition inputs must be passed as keyword arguments")
 
-        required = self.inputs(inherited=False)
-        missing = ["'" + n + "'" for n in required.keys() if n not in kwargs]
+        # Nested calls share the evaluation started by the outermost call, so that
+        # identical base definitions anywhere in the tree are only computed once.
+        if _STATE.evaluation is not None:
+            return self._evaluate(_STATE.evaluation, kwargs)
+
+        _STATE.evaluation = _Evaluation()
+
+        try:
+            return self._evaluate(_STATE.evaluation, kwargs)
+        finally:
+            _STATE.evaluation = None
+
+    def _evaluate(self, evaluation, kwargs):
+        """Evaluate this definition as part of the given evaluation."""
+
+        profiler = _STATE.profiler
 
-        logger.debug("Preparing arguments")
-        logger.debug("--> Directly required inputs: %s", list(required.keys()))
+        if profiler is None:
+            return self._execute(evaluation, kwargs)
+
+        with profiler.record(self.__class__.__name__):
+            return self._execute(evaluation, kwargs)
+
+    def _execute(self, evaluation, kwargs, restrict=True, cache=True):
+        """Execute the evaluation plan for this definition."""
+
+        plan = self._plan
+
+        if cache and plan.cache:
+            return self._execute_cached(evaluation, kwargs)
+
+        if restrict and plan.bounds is not None:
+            box = self._restriction(kwargs)
+
+            if box is not None:
+                return self._execute_within(evaluation, box, kwargs)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Preparing: '%s'", plan.name)
+            logger.debug("--> Keyword arguments: %s", list(kwargs.keys()))
+            logger.debug("--> Directly required inputs: %s", list(plan.inputs))
+            logger.debug("--> Bases: %s", [name for name, _, _ in plan.bases])
+
+        missing = ["'" + n + "'" for n in plan.inputs if n not in kwargs]
 
         if len(missing) != 0:
-            name = self.__class__.__name__
             inpts = ", ".join(missing)
-            message = f"Unable to evaluate definition '{name}', missing inputs: {inpts}"
+            message = (
+                f"Unable to evaluate definition '{plan.name}', missing inputs: {inpts}"
+            )
 
             raise TypeError(message)
 
         # Start building a dict for the args to pass to the _impl function. Starting
         # with the actual values of the required inputs
-        args = {inpt: kwargs[inpt] for inpt in required}
+        args = {inpt: kwargs[inpt] for inpt in plan.inputs}
 
         # Now to evaluate any definitions this definition is derived from.
-        attributes = self.attributes(inherited=True)
-        bases = dict(self._bases)
-
-        logger.debug("--> Attributes: %s", attributes)
-        logger.debug("--> Bases: %s", bases)
-
-        for name, defn in bases.items():
+        for name, defn, attribs in plan.bases:
 
             if name in kwargs:
-                logger.debug("%s: Using user provided override, %s", name, kwargs[name])
                 args[name] = kwargs[name]
                 continue
 
-            attrs = {name: attributes[name] for name in defn.attribs(inherited=True)}
-            instance = defn(**attrs)
-            logger.debug("%s: Created instance, %s", name, instance)
+            values = tuple(getattr(self, a) for a in attribs)
+            key = evaluation.key(defn, values, kwargs)
+
+            if key is not None and key in evaluation.results:
+                args[name] = evaluation.reuse(key)
+
+                if _STATE.profiler is not None:
+                    _STATE.profiler.reuse(defn.__name__)
+
+                continue
+
+            base = defn(**dict(zip(attribs, values)))
+            args[name] = base._evaluate(evaluation, kwargs)
+
+            if key is not None:
+                evaluation.store(key, args[name])
+
+        for a in plan.attributes:
+            args[a] = getattr(self, a)
+
+        return self._impl(**args)
+
+    def _execute_cached(self, evaluation, kwargs):
+        """Execute this definition, reusing the result from the process wide cache if
+        possible."""
+
+        plan = self._plan
+
+        # Only the inputs the definition depends on should have any say in the key.
+        try:
+            key = (
+                self.__class__,
+                _cache_key(tuple(getattr(self, a) for a in plan.inherited)),
+                evaluation.inputs_key(kwargs, plan.dependencies),
+                _STATE.viewport,
+            )
+        except _Uncacheable:
+            return self._execute(evaluation, kwargs, cache=False)
+
+        result = CACHE.get(key)
 
-            # And then evaluate it!
-            args[name] = instance(**kwargs)
+        if result is not None:
+            return result
 
-        message = "Executing '%s' with %s"
-        logger.debug(message, self.__class__.__name__, args.keys())
+        result = self._execute(evaluation, kwargs, cache=False)
+        CACHE.put(key, result)
 
-        return self._impl(**args, **self.attributes())
+        return result
+
+    def _restriction(self, kwargs):
+        """Return the region to restrict the evaluation of this definition to, if it
+        would be worth doing so."""
+
+        if "width" not in kwargs or "height" not in kwargs:
+            return None
+
+        # The bounds only hold if the values of the bases are left to the definition.
+        if not self._plan.overrides.isdisjoint(kwargs):
+            return None
+
+        width, height = kwargs["width"], kwargs["height"]
+
+        # Setting up the region has a fixed cost, only worth paying if it means
+        # skipping a good portion of the image.
+        if width * height < _RESTRICT_MIN_PIXELS:
+            return None
+
+        box = self.bounds(width, height)
+
+        if box is None:
+            return None
+
+        x0, y0, x1, y1 = box
+        total, area = width * height, (x1 - x0) * (y1 - y0)
+
+        if area > total * _RESTRICT_MAX_COVERAGE or total - area < _RESTRICT_MIN_PIXELS:
+            return None
+
+        return box
+
+    def _execute_within(self, evaluation, box, kwargs):
+        """Evaluate this definition within the given region, padding the result with
+        zeros to cover the full image."""
+
+        from arlunio.tile import allocate
+        from arlunio.tile import Viewport
+
+        width, height = kwargs["width"], kwargs["height"]
+        x0, y0, x1, y1 = box
+        empty = x1 == x0 or y1 == y0
+
+        logger.debug("%s: restricted to %s", self._plan.name, box)
+
+        # Even if the region is empty, evaluate a single pixel to know what the
+        # result should look like.
+        if empty:
+            x0, y0, w, h = 0, 0, 1, 1
+        else:
+            w, h = x1 - x0, y1 - y0
+
+        args = {**kwargs, "width": w, "height": h}
+
+        # Remain part of the enclosing evaluation, since results are keyed by the
+        # active viewport, bases evaluated within the same region are still shared.
+        with Viewport.current(width, height).region(x0, y0):
+            _STATE.evaluation = evaluation
+            region = self._execute(evaluation, args, restrict=False)
+
+        out = allocate(region, width, height)
+
+        if not empty:
+            out[y0:y1, x0:x1] = region
+
+        return out
 
     def _special_method(self, operation, a, b):
         """Implements the special methods in a standardized way."""
@@ -274,6 +433,42 @@ class Defn(metaclass=_BaseDefn):
             if not a.metadata[Defn.ATTR_ID]["inherited"]
         }
 
+    def bounds(self, width: int, height: int) -> Optional[Tuple[int, int, int, int]]:
+        """Return the region of the image that this definition covers.
+
+        Definitions that declare their bounds produce zeros (or :code:`False` in the
+        case of masks) everywhere outside of this region, which allows their evaluation
+        to be restricted to just this region. This is only done when the region skips
+        a large enough portion of the image to outweigh the cost of setting it up.
+
+        The region is returned as a tuple :code:`(x0, y0, x1, y1)` of pixel indices
+        where :code:`x0 <= x < x1` and :code:`y0 <= y < y1`, clipped to the image.
+        If the definition does not declare its bounds, :code:`None` is returned.
+
+        Parameters
+        ----------
+        width:
+            The width of the image
+        height:
+            The height of the image
+        """
+
+        bounds = self._plan.bounds
+
+        if bounds is None:
+            return None
+
+        box = bounds(self, width, height)
+
+        if box is None:
+            return None
+
+        x0, y0, x1, y1 = box
+        x0, x1 = min(max(x0, 0), width), min(max(x1, 0), width)
+        y0, y1 = min(max(y0, 0), height), min(max(y1, 0), height)
+
+        return (x0, y0, max(x0, x1), max(y0, y1))
+
     @classmethod
     def bases(cls):
         """Return all the definitions this defintion is derived from."""
@@ -311,6 +506,151 @@ class Defn(metaclass=_BaseDefn):
         return rtype if rtype != inspect._empty else Any
 
 
+class _Uncacheable(Exception):
+    """Raised when a value cannot be turned into a cache key."""
+
+
+_SCALARS = frozenset({bool, int, float, str, type(None)})
+"""Types whose values can be used as a cache key as they are."""
+
+
+def _cache_key(value, refs=None):
+    """Return a hashable key that represents the given value.
+
+    Numpy arrays are represented by their identity, a reference to each array is
+    added to :code:`refs` to ensure the identity remains valid while the key is in
+    use. If :code:`refs` is not given, arrays cannot be represented. Definition
+    instances are represented by their type and attribute values.
+    """
+
+    if type(value) in _SCALARS:
+        return (type(value), value)
+
+    if isinstance(value, np.ndarray):
+        if refs is None:
+            raise _Uncacheable()
+
+        refs.append(value)
+        return (np.ndarray, id(value))
+
+    if isinstance(value, Defn):
+        attrs = value.attributes(inherited=True)
+        return (type(value), _cache_key(attrs, refs))
+
+    if isinstance(value, dict):
+        return (dict, tuple((k, _cache_key(v, refs)) for k, v in value.items()))
+
+    if isinstance(value, (list, tuple)):
+        return (type(value), tuple(_cache_key(v, refs) for v in value))
+
+    try:
+        hash(value)
+    except TypeError:
+        raise _Uncacheable()
+
+    return (type(value), value)
+
+
+class _Evaluation:
+    """Holds the state of a single evaluation of a definition tree."""
+
+    def __init__(self):
+        self.results = {}
+        """Results of the base definitions evaluated so far, indexed by key."""
+
+        self.refs = []
+        """Objects that must be kept alive while their ids are used in a key."""
+
+        self.inputs = None
+        """The inputs the keys in :code:`inputs_keys` represent."""
+
+        self.inputs_keys = {}
+        """Keys representing :code:`inputs`, indexed by the names they are limited to.
+        """
+
+    def key(self, defn, values, inputs):
+        """Return the key for evaluating the given definition with the given
+        attribute values and inputs, or :code:`None` if it cannot be cached."""
+
+        try:
+            return (
+                defn,
+                _cache_key(values, self.refs),
+                self.inputs_key(inputs),
+                _STATE.viewport,
+            )
+        except _Uncacheable:
+            return None
+
+    def inputs_key(self, inputs, names=None):
+        """Return the key representing the given inputs.
+
+        Every definition in the tree is usually given the same inputs, so each key is
+        only computed once. If :code:`names` is given, the key only represents the
+        inputs with those names and is suitable for use in the process wide cache, so
+        cannot represent arrays.
+        """
+
+        if inputs is not self.inputs:
+            self.inputs = inputs
+            self.inputs_keys = {}
+
+        try:
+            key = self.inputs_keys[names]
+        except KeyError:
+            key = self.inputs_keys[names] = self._inputs_key(inputs, names)
+
+        if key is None:
+            raise _Uncacheable()
+
+        return key
+
+    def _inputs_key(self, inputs, names):
+        """Compute the key for :meth:`inputs_key`, :code:`None` if there is no key."""
+
+        try:
+            if names is None:
+                return _cache_key(inputs, self.refs)
+
+            return _cache_key({k: v for k, v in inputs.items() if k in names})
+        except _Uncacheable:
+            return None
+
+    def store(self, key, value):
+        """Remember the result of evaluating a base definition.
+
+        The definition that asked for the result is free to modify it, so a read-only
+        copy of any array is kept for reuse instead.
+        """
+
+        if isinstance(value, np.ndarray):
+            self.results[key] = freeze(value)
+        else:
+            self.results[key] = (value, False)
+
+    def reuse(self, key):
+        """Return the remembered result of evaluating a base definition, copying any
+        array so that it can be modified without affecting anyone else."""
+
+        value, copied = self.results[key]
+        return thaw(value, copied)
+
+
+class _State(threading.local):
+    """Per-thread state used while evaluating definitions."""
+
+    evaluation: Optional[_Evaluation] = None
+
+    viewport: Optional[Any] = None
+    """The :class:`arlunio.tile.Viewport` describing the region being evaluated."""
+
+    profiler: Optional[Any] = None
+    """The :class:`arlunio.profile.Profiler` recording evaluations, if any."""
+
+
+_STATE = _State()
+
+
 @attr.s(auto_attribs=True)
 class DefnInput:
     """A class that represents an input to a definition"""
@@ -469,6 +809,76 @@ def _process_parameters(
     return defns, inputs
 
 
+@attr.s(auto_attribs=True, frozen=True)
+class _Plan:
+    """Everything needed to evaluate a definition that can be worked out when the
+    definition is created."""
+
+    name: str
+    """The name of the definition."""
+
+    inputs: Tuple[str, ...]
+    """The names of the inputs that must be passed directly to the definition."""
+
+    attributes: Tuple[str, ...]
+    """The names of the attributes declared directly on the definition."""
+
+    inherited: Tuple[str, ...]
+    """The names of all the attributes of the definition, including those inherited
+    from its bases."""
+
+    bases: Tuple[Tuple[str, Any, Tuple[str, ...]], ...]
+    """For each base, its parameter name, definition and the names of the attributes
+    that should be passed on to it."""
+
+    overrides: FrozenSet[str]
+    """The names of all the bases anywhere in the tree below the definition, any of
+    which could be overridden when evaluating it."""
+
+    dependencies: FrozenSet[str] = frozenset()
+    """The names of all the inputs and bases anywhere in the tree below the definition,
+    i.e. every keyword argument that could affect its result."""
+
+    bounds: Optional[Callable] = None
+    """The function used to work out the region of the image that the definition
+    covers."""
+
+    cache: bool = False
+    """Flag to indicate if the results of the definition should be kept in the process
+    wide cache."""
+
+
+def _compile_plan(defn, bounds=None, cache=False) -> _Plan:
+    """Work out how to evaluate the given definition."""
+
+    inputs = tuple(defn.inputs(inherited=False).keys())
+    attributes = defn.attribs(inherited=False)
+    bases = tuple(
+        (name, base, tuple(base.attribs(inherited=True).keys()))
+        for name, base in defn.bases().items()
+    )
+
+    overrides = set()
+    dependencies = set(inputs)
+
+    for name, base, _ in bases:
+        overrides.add(name)
+        overrides.update(base._plan.overrides)
+        dependencies.update(base._plan.dependencies)
+
+    return _Plan(
+        name=defn.__name__,
+        inputs=inputs,
+        attributes=tuple(attributes.keys()),
+        inherited=tuple(defn.attribs(inherited=True).keys()),
+        bases=bases,
+        overrides=frozenset(overrides),
+        dependencies=frozenset(dependencies | overrides),
+        bounds=bounds,
+        cache=cache,
+    )
+
+
 _OPERATOR_POOL = {}
 
 
@@ -506,7 +916,14 @@ def _define_operator(defn: Defn, operation: str, operator_pool):
     operator_pool[key] = defn
 
 
-def definition(f=None, *, operation: str = None, operator_pool=None):
+def definition(
+    f=None,
+    *,
+    operation: str = None,
+    operator_pool=None,
+    bounds: Callable = None,
+    cache: bool = False,
+):
     """Create a new Definition.
 
     Parameters
@@ -517,6 +934,16 @@ def definition(f=None, *, operation: str = None, operator_pool=None):
         Flag used to indicate if this definition is an operator.
     operator_pool:
         Can be used to override the default operator pool
+    bounds:
+        A function that given an instance of the definition along with the
+        :code:`width` and :code:`height` of the image, returns the region of the image
+        outside of which the definition is known to produce zeros (or :code:`False`).
+        See :meth:`Defn.bounds` for details.
+    cache:
+        If :code:`True`, keep the results of the definition in the process wide
+        :data:`arlunio.cache.CACHE` so that they can be reused across evaluations.
+        This is only suitable for definitions whose result depends solely on their
+        attributes and inputs, such as the coordinate grids in :mod:`arlunio.math`.
     """
 
     def wrapper(fn):
@@ -544,6 +971,7 @@ def definition(f=None, *, operation: str = None, operator_pool=None):
         attributes["_inputs"] = inputs
 
         defn = attr.s(type(name, (Defn,), attributes))
+        defn._plan = _compile_plan(defn, bounds, cache)
 
         if operation is not None:
             _define_operator(defn, operation, operators)
@@ -0,0 +1,183 @@
+"""Reusing the results of definitions across evaluations."""
+import collections
+import threading
+from typing import Any
+from typing import Hashable
+from typing import Optional
+from typing import Tuple
+
+import numpy as np
+
+
+def nbytes(value: np.ndarray) -> int:
+    """Return the number of bytes actually used to store the values in an array.
+
+    Unlike :code:`value.nbytes` this does not count values that are repeated along an
+    axis without being stored more than once, as is the case with arrays produced by
+    :func:`numpy:numpy.broadcast_to`.
+
+    Example
+    -------
+    >>> import numpy as np
+    >>> from arlunio.cache import nbytes
+    >>> row = np.zeros(8)
+    >>> nbytes(np.broadcast_to(row, (100, 8)))
+    64
+    """
+
+    if value.size == 0:
+        return 0
+
+    size = value.itemsize
+
+    for n, stride in zip(value.shape, value.strides):
+        if stride != 0:
+            size *= n
+
+    return size
+
+
+def freeze(value: np.ndarray) -> Tuple[np.ndarray, bool]:
+    """Return a read-only version of the given array that can be kept for reuse,
+    along with a flag indicating if it is a copy.
+
+    Arrays that can be modified are copied so that whoever produced the original is
+    free to go on modifying it. Arrays that are already read-only, such as those
+    produced by :func:`numpy:numpy.broadcast_to`, are kept as they are.
+    """
+
+    if not value.flags.writeable:
+        return value, False
+
+    value = value.copy()
+    value.flags.writeable = False
+
+    return value, True
+
+
+def thaw(value: np.ndarray, copied: bool) -> np.ndarray:
+    """Return a version of an array kept by :func:`freeze` that can be handed out.
+
+    If the original could be modified, so can the array returned."""
+    return value.copy() if copied else value
+
+
+class Cache:
+    """A least recently used cache of arrays, bounded by the number of bytes it holds.
+
+    Definitions created with :code:`@definition(cache=True)` such as
+    :class:`arlunio.math.X` and :class:`arlunio.math.R` store their results in the
+    process wide cache found at :data:`arlunio.cache.CACHE`. Each result is stored
+    against the definition's type, attribute values and inputs along with the active
+    :class:`arlunio.tile.Viewport`, so evaluating a definition with the same values
+    again, even as part of a different image, reuses the existing result. The cache
+    keeps its own read-only copy of each result, handing out a fresh copy of it
+    each time it is reused so the results given out can be modified as before.
+    Results that are read-only to begin with, such as the views produced by
+    :class:`arlunio.math.X`, are shared without copying.
+
+    Results are only cached if they are numpy arrays and the inputs they were
+    computed from do not include any arrays. Once the cache holds more than
+    :code:`maxbytes` bytes the least recently used results are discarded.
+
+    Parameters
+    ----------
+    maxbytes:
+        The maximum number of bytes to hold, setting this to :code:`0` disables the
+        cache.
+
+    Example
+    -------
+    >>> from arlunio.cache import CACHE
+    >>> from arlunio.math import R
+    >>> CACHE.clear()
+    >>> r = R()(width=64, height=64)
+    >>> r = R()(width=64, height=64)
+    >>> CACHE.hits, CACHE.misses
+    (1, 3)
+    """
+
+    def __init__(self, maxbytes: int = 256 * 1024 * 1024):
+        self.maxbytes = maxbytes
+
+        self.nbytes = 0
+        """The number of bytes currently held by the cache."""
+
+        self.hits = 0
+        """The number of times a result was found in the cache."""
+
+        self.misses = 0
+        """The number of times a result was not found in the cache."""
+
+        self._items: collections.OrderedDict = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the result stored under the given key, or :code:`None` if there
+        isn't one."""
+
+        with self._lock:
+            item = self._items.get(key, None)
+
+            if item is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._items.move_to_end(key)
+
+        return thaw(*item)
+
+    def put(self, key: Hashable, value: Any):
+        """Store the given result under the given key.
+
+        Anything other than a numpy array, or arrays too large to fit in the cache are
+        ignored.
+        """
+
+        if not isinstance(value, np.ndarray):
+            return
+
+        size = nbytes(value)
+
+        if size > self.maxbytes:
+            return
+
+        item = freeze(value)
+
+        with self._lock:
+
+            if key in self._items:
+                self.nbytes -= nbytes(self._items.pop(key)[0])
+
+            self._items[key] = item
+            self.nbytes += size
+
+            self._evict()
+
+    def clear(self):
+        """Discard all cached results and reset the counters."""
+
+        with self._lock:
+            self._items.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def _evict(self):
+        """Discard the least recently used results until the cache is within its
+        limit."""
+
+        while self._items and self.nbytes > self.maxbytes:
+            _, (value, _) = self._items.popitem(last=False)
+            self.nbytes -= nbytes(value)
+
+
+CACHE = Cache()
+"""The cache used by definitions created with :code:`@definition(cache=True)`."""
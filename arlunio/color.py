@@ -1,5 +1,62 @@
+import functools
+
+import numpy as np
 import PIL.ImageColor as Color
 
+COLORMAPS = {
+    "greys": ["black", "white"],
+    "viridis": [
+        "#440154",
+        "#482878",
+        "#3e4989",
+        "#31688e",
+        "#26828e",
+        "#1f9e89",
+        "#35b779",
+        "#6ece58",
+        "#b5de2b",
+        "#fde725",
+    ],
+    "magma": [
+        "#000004",
+        "#180f3d",
+        "#440f76",
+        "#721f81",
+        "#9e2f7f",
+        "#cd4071",
+        "#f1605d",
+        "#fd9668",
+        "#feca8d",
+        "#fcfdbf",
+    ],
+    "inferno": [
+        "#000004",
+        "#1b0c41",
+        "#4a0c6b",
+        "#781c6d",
+        "#a52c60",
+        "#cf4446",
+        "#ed6925",
+        "#fb9b06",
+        "#f7d13d",
+        "#fcffa4",
+    ],
+    "plasma": [
+        "#0d0887",
+        "#46039f",
+        "#7201a8",
+        "#9c179e",
+        "#bd3786",
+        "#d8576b",
+        "#ed7953",
+        "#fb9f3a",
+        "#fdca26",
+        "#f0f921",
+    ],
+}
+"""Named colormaps that can be passed to :func:`gradient`, each one is a list of
+evenly spaced colors."""
+
 
 def getcolor(*args, **kwargs):
     """Exactly as Pillow's getrgb function."""
@@ -12,3 +69,79 @@ def getcolorf(*args, **kwargs):
 
     col = Color.getcolor(*args, **kwargs)
     return tuple([c / 255 for c in col])
+
+
+def gradient(colors, resolution: int = 256) -> np.ndarray:
+    """Return a lookup table that blends smoothly between the given colors.
+
+    The result is a read-only array of shape :code:`(resolution, 4)` where the row at
+    index :code:`i` holds the RGBA color found at the position :code:`i / (resolution -
+    1)` along the gradient.
+
+    Parameters
+    ----------
+    colors:
+        Either the name of one of the :data:`COLORMAPS`, or a list of colors. Each
+        color can be any string supported by the :mod:`pillow:PIL.ImageColor` module,
+        in which case the colors are spaced evenly along the gradient. Alternatively
+        each color can be given as a :code:`(position, color)` pair, where the
+        positions increase from :code:`0` to :code:`1`.
+    resolution:
+        The number of entries in the lookup table.
+
+    Example
+    -------
+    >>> from arlunio.color import gradient
+    >>> gradient(["red", "#00f"], resolution=3)
+    array([[255,   0,   0, 255],
+           [127,   0, 127, 255],
+           [  0,   0, 255, 255]], dtype=uint8)
+    >>> gradient([(0, "black"), (0.25, "white"), (1, "black")], resolution=5)
+    array([[  0,   0,   0, 255],
+           [255, 255, 255, 255],
+           [170, 170, 170, 255],
+           [ 85,  85,  85, 255],
+           [  0,   0,   0, 255]], dtype=uint8)
+    """
+
+    if isinstance(colors, str):
+
+        if colors not in COLORMAPS:
+            raise ValueError(f"Unknown colormap: {colors}")
+
+        colors = COLORMAPS[colors]
+
+    if len(colors) < 2:
+        raise ValueError("A gradient needs at least 2 colors")
+
+    if all(isinstance(c, str) for c in colors):
+        positions = np.linspace(0, 1, len(colors))
+        colors = list(zip(positions.tolist(), colors))
+
+    return _gradient(tuple((float(p), c) for p, c in colors), resolution)
+
+
+@functools.lru_cache(maxsize=32)
+def _gradient(stops, resolution):
+    """Build the lookup table for the given :code:`(position, color)` stops."""
+
+    positions = np.array([p for p, _ in stops])
+    values = np.array([getcolor(c, "RGBA") for _, c in stops], dtype=float)
+
+    if (np.diff(positions) < 0).any():
+        raise ValueError("The positions of the colors must be increasing")
+
+    ts = np.linspace(0, 1, resolution)
+
+    # Find the pair of stops either side of each entry in the table.
+    idx = np.searchsorted(positions, ts, side="right") - 1
+    idx = np.clip(idx, 0, len(positions) - 2)
+
+    start, stop = positions[idx], positions[idx + 1]
+    width = np.where(stop > start, stop - start, 1)
+    t = np.clip((ts - start) / width, 0, 1)[:, np.newaxis]
+
+    lut = np.floor((1 - t) * values[idx] + t * values[idx + 1]).astype(np.uint8)
+    lut.flags.writeable = False
+
+    return lut
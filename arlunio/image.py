@@ -3,6 +3,7 @@ import io
 import logging
 import pathlib
 from typing import Optional
+from typing import Union
 
 import numpy as np
 import PIL.Image as PImage
@@ -137,6 +138,78 @@ def fromarray(*args, **kwargs):
     return Image(PImage.fromarray(*args, **kwargs))
 
 
+def fromlabels(labels, palette) -> Image:
+    """Create an image from an array of integer labels and a palette of colors.
+
+    Every pixel in the resulting image is given the color in the palette that
+    corresponds to its label. Since the palette is first converted into a lookup table
+    the entire image is colored in a single pass, making this much more efficient than
+    coloring each region with a separate call to :func:`fill`. See
+    :func:`arlunio.mask.label` for a way to produce labels from a number of masks.
+
+    Parameters
+    ----------
+    labels:
+        A 2D array of non-negative integers.
+    palette:
+        Either a list of colors, where the color at index :code:`i` is used for pixels
+        with label :code:`i`, or a dictionary mapping labels to colors. Colors can be
+        any string supported by the :mod:`pillow:PIL.ImageColor` module, or
+        :code:`None` for transparent. Pixels whose label is missing from a dictionary
+        are also left transparent.
+
+    Example
+    -------
+
+    .. arlunio-image:: Labels Demo
+       :include-code:
+
+       ::
+
+          import arlunio.image as image
+          import arlunio.mask as mask
+          import arlunio.shape as shape
+
+          width, height = 512, 256
+          circles = [
+              shape.Circle(xc=0.5 * (i - 1), yc=0.25 * (1 - i), r=0.6)
+              for i in range(3)
+          ]
+
+          labels = mask.label(*[c(width=width, height=height) for c in circles])
+          img = image.fromlabels(labels, ["white", "red", "#0f0", "blue"])
+    """
+
+    labels = np.asarray(labels)
+
+    if not np.issubdtype(labels.dtype, np.integer):
+        raise TypeError(f"Labels must be integers, not {labels.dtype}")
+
+    if isinstance(palette, dict):
+        size = max(palette.keys(), default=-1) + 1
+        items = palette.items()
+    else:
+        size = len(palette)
+        items = enumerate(palette)
+
+    lut = np.zeros((size, 4), dtype=np.uint8)
+
+    for idx, value in items:
+        if value is not None:
+            lut[idx] = color.getcolor(value, "RGBA")
+
+    if labels.size > 0 and (labels.min() < 0 or labels.max() >= size):
+        raise ValueError(
+            f"Labels must be in the range [0, {size}) to match the given palette"
+        )
+
+    # Treating each color as a single 32-bit value means each pixel is a single lookup
+    pixels = np.empty(labels.shape + (4,), dtype=np.uint8)
+    np.take(lut.view(np.uint32)[:, 0], labels, out=pixels.view(np.uint32)[..., 0])
+
+    return fromarray(pixels)
+
+
 def load(*args, **kwargs) -> Image:
     """Load an image from the given file.
 
@@ -214,7 +287,14 @@ def decode(bytestring: bytes) -> Image:
     return Image(load(bytes_))
 
 
-def colorramp(values, start: Optional[str] = None, stop: Optional[str] = None) -> Image:
+def colorramp(
+    values,
+    start: Optional[str] = None,
+    stop: Optional[str] = None,
+    *,
+    colors=None,
+    resolution: int = 4096,
+) -> Image:
     """Given a 2d array of values, produce an image gradient based on them.
 
     .. arlunio-image:: Colorramp Demo
@@ -244,6 +324,14 @@ def colorramp(values, start: Optional[str] = None, stop: Optional[str] = None) -
 
     - Otherwise the color will be some mix between the two.
 
+    Rather than blending between two colors, a gradient with any number of colors or
+    one of the named :data:`arlunio.color.COLORMAPS` can be given using the
+    :code:`colors` parameter.
+
+    The colors are computed ahead of time into a lookup table (see
+    :func:`arlunio.color.gradient`), each value is then rounded down to the nearest
+    entry in the table and the image is built by looking up each pixel's color.
+
     Parameters
     ----------
     values:
@@ -252,6 +340,12 @@ def colorramp(values, start: Optional[str] = None, stop: Optional[str] = None) -
        The color to use for values near :math:`0` (default, :code:`black`)
     stop:
        The color to use for values near :math:`1` (default, :code:`white`)
+    colors:
+       The name of a colormap or a list of colors to use instead of :code:`start` and
+       :code:`stop`. See :func:`arlunio.color.gradient` for details.
+    resolution:
+       The number of entries in the lookup table, controlling how many distinct colors
+       the image can contain.
 
     Examples
     --------
@@ -272,31 +366,78 @@ def colorramp(values, start: Optional[str] = None, stop: Optional[str] = None) -
           y = image.colorramp(p[:, :, 1], start="#0000", stop="#00f7")
 
           img = x + y
+
+    .. arlunio-image:: Colorramp Demo 3
+       :include-code:
+
+       ::
+
+          import arlunio.image as image
+          import arlunio.math as math
+
+          r = math.R()
+          img = image.colorramp(r(width=256, height=256), colors="viridis")
     """
 
-    # Scale all the values so that they fall into the range [0, 1]
-    minx = np.min(values)
-    vs = np.array(values) - minx
-    vs = vs / np.max(vs)
+    if colors is not None and (start is not None or stop is not None):
+        raise ValueError("Unable to use 'colors' alongside 'start' and 'stop'")
+
+    if colors is None:
+        colors = [
+            "black" if start is None else start,
+            "white" if stop is None else stop,
+        ]
 
-    if start is None:
-        start = "black"
+    lut = color.gradient(colors, resolution)
 
-    if stop is None:
-        stop = "white"
+    # Values that are repeated along an axis only need to be looked up once.
+    values = np.asarray(values)
+    vs = math.compact(values)
 
-    start = color.getcolor(start, "RGBA")
-    stop = color.getcolor(stop, "RGBA")
+    # Scale all the values so that they fall into the range [0, resolution - 1]
+    minx, maxx = np.min(vs), np.max(vs)
+    scale = (resolution - 1) / (maxx - minx) if maxx > minx else 0
 
-    funcs = [math.lerp(a, b) for a, b in zip(start, stop)]
-    channels = [np.floor(func(vs)) for func in funcs]
+    index = np.subtract(vs, minx, dtype=float)
+    index *= scale
+
+    index = np.clip(index, 0, resolution - 1, out=index).astype(np.intp)
+    index = np.broadcast_to(index, values.shape)
+
+    # Treating each color as a single 32-bit value means each pixel is a single lookup
+    pixels = np.empty(values.shape + (4,), dtype=np.uint8)
+    np.take(lut.view(np.uint32)[:, 0], index, out=pixels.view(np.uint32)[..., 0])
 
-    pixels = np.array(np.dstack(channels), dtype=np.uint8)
     return fromarray(pixels)
 
 
+def _alpha(selection) -> np.ndarray:
+    """Convert an array of coverage values in the range :math:`[0, 1]` into alpha
+    values in the range :math:`[0, 255]`."""
+
+    alpha = np.clip(selection, 0, 1) * 255
+    return np.rint(alpha, out=alpha).astype(np.uint8)
+
+
+def _mask_image(selection) -> PImage.Image:
+    """Convert a mask into an image that can be used as a mask by Pillow."""
+
+    if not isinstance(selection, mask.PackedMask):
+        selection = np.asarray(selection)
+
+        if np.issubdtype(selection.dtype, np.floating):
+            return PImage.fromarray(_alpha(selection))
+
+        return PImage.fromarray(selection)
+
+    # The rows of a packed mask are laid out exactly as Pillow expects for an image
+    # with one bit per pixel.
+    height, width = selection.shape
+    return PImage.frombytes("1", (width, height), selection.bits.tobytes())
+
+
 def fill(
-    mask: mask.Mask,
+    mask: Union[mask.Mask, mask.PackedMask],
     foreground: Optional[str] = None,
     background: Optional[str] = None,
     image: Optional[Image] = None,
@@ -306,7 +447,11 @@ def fill(
     Parameters
     ----------
     mask:
-        The mask that selects the region to be coloured
+        The mask that selects the region to be coloured. This can also be a
+        :class:`arlunio.mask.PackedMask` which is used without unpacking it, or an
+        array of floats in the range :math:`[0, 1]` such as the coverage produced by
+        :class:`arlunio.mask.Coverage`, in which case the foreground color is blended
+        with the image using the values as the opacity.
     foreground:
         A string representation of the color to use, this can be in any format that is
         supported by the :mod:`pillow:PIL.ImageColor` module. If omitted this will
@@ -339,12 +484,16 @@ def fill(
           circle.x0, circle.y0 = 0.5, -0.25
           img = image.fill(circle(width=512, height=256), foreground='blue', image=img)
 
+    .. note::
+
+       Each call to this function makes a copy of the image. When filling in a large
+       number of masks consider using a :class:`Canvas` instead.
     """
 
     foreground = "#000" if foreground is None else foreground
     fill_color = color.getcolor(foreground, "RGBA")
 
-    mask_img = PImage.fromarray(mask)
+    mask_img = _mask_image(mask)
 
     if image is None:
         background = "#0000" if background is None else background
@@ -358,3 +507,135 @@ def fill(
     image.paste(fill_color, mask=mask_img)
 
     return image
+
+
+class Canvas:
+    """An RGBA pixel buffer that masks can be filled in place.
+
+    Where :func:`fill` produces a new image each time it is called, a canvas
+    allocates a single buffer up front and colors it in place. This makes it much
+    more efficient when filling in a large number of masks, with the result only
+    being converted into an :class:`Image` once, at the end.
+
+    Filling a mask has the same effect as calling :func:`fill`, every pixel selected
+    by the mask is replaced by the given color.
+
+    Parameters
+    ----------
+    width:
+        The width of the canvas
+    height:
+        The height of the canvas
+    background:
+        The color to initialise the canvas with, this can be any string that is
+        accepted by the :mod:`pillow:PIL.ImageColor` module. If omitted this will
+        default to transparent.
+
+    Example
+    -------
+
+    .. arlunio-image:: Canvas Demo
+       :include-code:
+
+       ::
+
+          import arlunio.image as image
+          import arlunio.shape as shape
+
+          canvas = image.Canvas(512, 256, background="white")
+          colors = ["red", "#0f0", "blue"]
+
+          for i, color in enumerate(colors):
+              circle = shape.Circle(x0=0.5 * (i - 1), y0=0.25 * (1 - i), r=0.6)
+              canvas.fill(circle(width=512, height=256), foreground=color)
+
+          img = canvas.image()
+    """
+
+    def __init__(self, width: int, height: int, background: Optional[str] = None):
+        background = "#0000" if background is None else background
+
+        self.pixels = np.empty((height, width, 4), dtype=np.uint8)
+        """The pixels of the canvas, as an array of shape :code:`(height, width, 4)`"""
+
+        self.pixels[...] = color.getcolor(background, "RGBA")
+
+    @classmethod
+    def fromimage(cls, image: Image) -> "Canvas":
+        """Create a canvas, initialised with a copy of the given image."""
+
+        width, height = image.size
+
+        canvas = cls(width, height)
+        canvas.pixels[...] = np.asarray(image.img.convert("RGBA"))
+
+        return canvas
+
+    @property
+    def width(self) -> int:
+        return self.pixels.shape[1]
+
+    @property
+    def height(self) -> int:
+        return self.pixels.shape[0]
+
+    def fill(
+        self,
+        mask: Union[mask.Mask, mask.PackedMask],
+        foreground: Optional[str] = None,
+    ) -> "Canvas":
+        """Color in the region of the canvas selected by the given mask.
+
+        Parameters
+        ----------
+        mask:
+            The mask that selects the region to be coloured, it must have the same
+            shape as the canvas. As with :func:`fill` this can also be an array of
+            floats in the range :math:`[0, 1]` to blend the color with the canvas.
+        foreground:
+            A string representation of the color to use, this can be in any format that
+            is supported by the :mod:`pillow:PIL.ImageColor` module. If omitted this
+            will default to black.
+        """
+
+        foreground = "#000" if foreground is None else foreground
+        fill_color = np.array(color.getcolor(foreground, "RGBA"), dtype=np.uint8)
+
+        if mask.shape != (self.height, self.width):
+            raise ValueError(
+                f"Mask with shape {mask.shape} does not match the size of the "
+                f"canvas ({self.width}, {self.height})"
+            )
+
+        selection = np.asarray(mask)
+
+        if np.issubdtype(selection.dtype, np.floating):
+            self._blend(_alpha(selection), fill_color)
+            return self
+
+        # Treating each pixel as a single 32-bit value allows each one to be written
+        # in a single operation.
+        pixels = self.pixels.view(np.uint32)[:, :, 0]
+        np.copyto(pixels, fill_color.view(np.uint32), where=selection)
+
+        return self
+
+    def _blend(self, alpha: np.ndarray, fill_color: np.ndarray):
+        """Blend the given color with the canvas, using the same arithmetic as Pillow
+        so that the result matches :func:`fill`."""
+
+        # Only the rows containing some color need to be touched.
+        rows = np.flatnonzero(alpha.any(axis=1))
+
+        if len(rows) == 0:
+            return
+
+        y0, y1 = rows[0], rows[-1] + 1
+        a = alpha[y0:y1, :, np.newaxis].astype(np.uint16)
+
+        tmp = self.pixels[y0:y1] * (255 - a) + fill_color * a + 128
+        self.pixels[y0:y1] = ((tmp >> 8) + tmp) >> 8
+
+    def image(self) -> Image:
+        """Return the contents of the canvas as an :class:`Image`."""
+        return fromarray(self.pixels)
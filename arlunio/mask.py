@@ -1,10 +1,14 @@
 import functools
 import logging
+from typing import Tuple
 from typing import Union
 
 import numpy as np
 
 import arlunio as ar
+from arlunio.tile import allocate
+from arlunio.tile import tiles
+from arlunio.tile import Viewport
 
 
 class Mask(np.ndarray):
@@ -19,6 +23,9 @@ class Mask(np.ndarray):
 
     def __mul__(self, other):
 
+        if isinstance(other, PackedMask):
+            return NotImplemented
+
         try:
             return np.logical_and(self, other)
         except ValueError:
@@ -36,6 +43,10 @@ class Mask(np.ndarray):
         return np.logical_not(self)
 
     def __sub__(self, other):
+
+        if isinstance(other, PackedMask):
+            return NotImplemented
+
         return np.logical_and(self, np.logical_not(other))
 
     def __rsub__(self, other):
@@ -77,8 +88,214 @@ class Mask(np.ndarray):
 
         return cls(np.full(shape, True))
 
+    def pack(self) -> "PackedMask":
+        """Return a copy of this mask, packed into a :class:`PackedMask`.
 
-@ar.definition
+        Example
+        -------
+        >>> from arlunio.mask import Mask
+        >>> Mask.full(3, 4).pack()
+        PackedMask(shape=(3, 4), nbytes=8)
+        """
+        return PackedMask.pack(self)
+
+
+@functools.lru_cache(maxsize=16)
+def _valid_words(shape: Tuple[int, ...]) -> np.ndarray:
+    """Return the words of a packed mask with the given shape where every pixel is
+    set, i.e. with every bit set apart from those used as padding."""
+
+    words = PackedMask.pack(np.full(shape, True)).words
+    words.flags.writeable = False
+
+    return words
+
+
+class PackedMask:
+    """A mask that stores 8 pixels in each byte.
+
+    Each row of the mask is packed into bytes using :func:`numpy:numpy.packbits`, with
+    the bytes stored in an array of 64-bit words. Holding a mask in this form uses an
+    eighth of the memory required by a :class:`Mask` and masks can be combined using
+    the same :code:`+`, :code:`-`, :code:`*` and unary :code:`-` operators, along with
+    :func:`any_` and :func:`all_` which operate on 64 pixels at a time.
+
+    Packed masks can be passed directly to :func:`arlunio.image.fill`, otherwise use
+    :meth:`unpack` or :func:`numpy:numpy.asarray` to convert them back into a
+    :class:`Mask`. Packed masks are not unpacked by any other numpy function, passing
+    one to a ufunc such as :func:`numpy:numpy.logical_and` (or a function built on
+    one, such as :func:`numpy:numpy.any`) raises a :code:`TypeError`.
+
+    Example
+    -------
+    >>> import numpy as np
+    >>> from arlunio.mask import Mask, PackedMask
+    >>> a = PackedMask.pack(np.array([[True, False, True], [False, False, True]]))
+    >>> b = Mask([[True, True, False], [False, False, False]]).pack()
+    >>> (a + b).unpack()
+    Mask([[ True,  True,  True],
+          [False, False,  True]])
+    >>> (a - b).unpack()
+    Mask([[False, False,  True],
+          [False, False,  True]])
+    >>> (-a).unpack()
+    Mask([[False,  True, False],
+          [ True,  True, False]])
+    """
+
+    # Ensure numpy defers to our operators rather than unpacking us.
+    __array_ufunc__ = None
+
+    def __init__(self, words: np.ndarray, shape: Tuple[int, ...]):
+        self.words = words
+        """The packed bits of the mask, as an array of 64-bit words."""
+
+        self.shape = tuple(shape)
+        """The shape of the mask when unpacked."""
+
+    def __repr__(self):
+        return f"PackedMask(shape={self.shape}, nbytes={self.nbytes})"
+
+    def __array__(self, dtype=None, copy=None):
+        mask = np.asarray(self.unpack())
+        return mask if dtype is None else mask.astype(dtype)
+
+    def __add__(self, other):
+        return PackedMask(self.words | self._words(other), self.shape)
+
+    def __radd__(self, other):
+        return self + other
+
+    def __mul__(self, other):
+        return PackedMask(self.words & self._words(other), self.shape)
+
+    def __rmul__(self, other):
+        return self * other
+
+    def __sub__(self, other):
+        return PackedMask(self.words & ~self._words(other), self.shape)
+
+    def __rsub__(self, other):
+        return PackedMask(self._words(other) & ~self.words, self.shape)
+
+    def __neg__(self):
+        return PackedMask(~self.words & _valid_words(self.shape), self.shape)
+
+    @classmethod
+    def pack(cls, mask) -> "PackedMask":
+        """Pack the given boolean array into a new packed mask."""
+
+        mask = np.asarray(mask, dtype=bool)
+
+        if mask.ndim == 0:
+            raise ValueError("Unable to pack a mask with no dimensions")
+
+        bits = np.packbits(mask, axis=-1)
+        words = np.zeros((bits.size + 7) // 8, dtype=np.uint64)
+        words.view(np.uint8)[: bits.size] = bits.reshape(-1)
+
+        return cls(words, mask.shape)
+
+    @property
+    def nbytes(self) -> int:
+        """The number of bytes used to store the mask."""
+        return self.words.nbytes
+
+    @property
+    def bits(self) -> np.ndarray:
+        """The packed bits of the mask, with each row of the mask padded to a whole
+        number of bytes. This is the layout used by Pillow for images with mode
+        :code:`1`."""
+
+        shape = self.shape[:-1] + ((self.shape[-1] + 7) // 8,)
+        size = int(np.prod(shape))
+
+        return self.words.view(np.uint8)[:size].reshape(shape)
+
+    def unpack(self) -> Mask:
+        """Return the mask as a :class:`Mask`."""
+
+        bits = np.unpackbits(self.bits, axis=-1, count=self.shape[-1])
+        return Mask(bits.astype(bool))
+
+    def _words(self, other) -> np.ndarray:
+        """Return the words representing the other operand of an operation."""
+
+        if isinstance(other, PackedMask):
+
+            if other.shape != self.shape:
+                raise ValueError(
+                    f"Unable to combine packed masks with shapes {self.shape} "
+                    f"and {other.shape}"
+                )
+
+            return other.words
+
+        return PackedMask.pack(np.broadcast_to(other, self.shape)).words
+
+
+def _reduce_packed(op, args) -> PackedMask:
+    """Combine the given conditions, at least one of which is a packed mask, using the
+    given bitwise operation."""
+
+    first = next(a for a in args if isinstance(a, PackedMask))
+    words = [first._words(a) for a in args]
+
+    return PackedMask(functools.reduce(op, words), first.shape)
+
+
+def _union(a, b):
+    """Return the smallest region containing both of the given regions."""
+
+    if a is None or b is None:
+        return None
+
+    if a[0] == a[2] or a[1] == a[3]:
+        return b
+
+    if b[0] == b[2] or b[1] == b[3]:
+        return a
+
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+def _intersection(a, b):
+    """Return the region covered by both of the given regions."""
+
+    x0, y0 = max(a[0], b[0]), max(a[1], b[1])
+    x1, y1 = min(a[2], b[2]), min(a[3], b[3])
+
+    return (x0, y0, max(x0, x1), max(y0, y1))
+
+
+def _add_bounds(defn, width, height):
+    return _union(defn.a.bounds(width, height), defn.b.bounds(width, height))
+
+
+def _sub_bounds(defn, width, height):
+
+    # Operands without bounds may depend on the size of the full image, so can only be
+    # evaluated in full.
+    if defn.b.bounds(width, height) is None:
+        return None
+
+    return defn.a.bounds(width, height)
+
+
+def _mul_bounds(defn, width, height):
+    a, b = defn.a.bounds(width, height), defn.b.bounds(width, height)
+
+    if a is None or b is None:
+        return None
+
+    return _intersection(a, b)
+
+
+def _empty_bounds(defn, width, height):
+    return (0, 0, 0, 0)
+
+
+@ar.definition(bounds=_empty_bounds)
 def Empty(width: int, height: int) -> Mask:
     """An empty mask.
 
@@ -110,14 +327,16 @@ def Full(width: int, height: int) -> Mask:
     return Mask.full(height, width)
 
 
-@ar.definition(operation=ar.Defn.OP_ADD)
+@ar.definition(operation=ar.Defn.OP_ADD, bounds=_add_bounds)
 def MaskAdd(
     width: int, height: int, *, a: ar.Defn[Mask] = None, b: ar.Defn[Mask] = None
 ) -> Mask:
     """Add any two mask producing definitions together.
 
     The resulting defintion will return a mask that is :code:`True` if a given point
-    is :code:`True` in either :code:`a` or :code:`b`.
+    is :code:`True` in either :code:`a` or :code:`b`. If both :code:`a` and
+    :code:`b` declare their :meth:`~arlunio.Defn.bounds` then evaluation is
+    restricted to the region that covers them both.
 
     Attributes
     ----------
@@ -130,14 +349,16 @@ def MaskAdd(
     return a(width=width, height=height) + b(width=width, height=height)
 
 
-@ar.definition(operation=ar.Defn.OP_SUB)
+@ar.definition(operation=ar.Defn.OP_SUB, bounds=_sub_bounds)
 def MaskSub(
     width: int, height: int, *, a: ar.Defn[Mask] = None, b: ar.Defn[Mask] = None
 ) -> Mask:
     """Subtract one mask away from another mask.
 
     The resulting definition will return a mask that is :code:`True` only if a given
-    point is in :code:`a` **and not** in :code:`b`.
+    point is in :code:`a` **and not** in :code:`b`. If both :code:`a` and :code:`b`
+    declare their :meth:`~arlunio.Defn.bounds` then evaluation is restricted to the
+    region covered by :code:`a`.
 
     .. note::
 
@@ -154,14 +375,16 @@ def MaskSub(
     return a(width=width, height=height) - b(width=width, height=height)
 
 
-@ar.definition(operation=ar.Defn.OP_MUL)
+@ar.definition(operation=ar.Defn.OP_MUL, bounds=_mul_bounds)
 def MaskMul(
     width: int, height: int, *, a: ar.Defn[Mask] = None, b: ar.Defn[Mask] = None
 ) -> Mask:
     """Muliply any two mask producing definitions together.
 
     The resulting definition will return a mask that is :code:`True` only if a given
-    point is in both :code:`a` and :code:`b`.
+    point is in both :code:`a` and :code:`b`. If both :code:`a` and :code:`b`
+    declare their :meth:`~arlunio.Defn.bounds` then evaluation is restricted to the
+    region they have in common.
 
     Attributes
     ----------
@@ -173,7 +396,7 @@ def MaskMul(
     return a(width=width, height=height) * b(width=width, height=height)
 
 
-def any_(*args: Union[bool, np.ndarray, Mask]) -> Mask:
+def any_(*args: Union[bool, np.ndarray, Mask, PackedMask]) -> Union[Mask, PackedMask]:
     """Given a number of conditions, return :code:`True` if any of the conditions
     are true.
 
@@ -217,6 +440,11 @@ def any_(*args: Union[bool, np.ndarray, Mask]) -> Mask:
     Mask([[ True,  True],
           [ True, False]])
 
+    If any of the arguments are a :class:`PackedMask` the result will be a packed mask
+    too, with the other arguments broadcast to its shape.
+
+    >>> mask.any_(x1, x2, mask.Mask(x3).pack())
+    PackedMask(shape=(3,), nbytes=8)
 
     See Also
     --------
@@ -230,10 +458,14 @@ def any_(*args: Union[bool, np.ndarray, Mask]) -> Mask:
     :data:`numpy:numpy.logical_or`
        Reference documentation on the :code:`numpy.logical_or` function
     """
+
+    if any(isinstance(a, PackedMask) for a in args):
+        return _reduce_packed(np.bitwise_or, args)
+
     return Mask(functools.reduce(np.logical_or, args))
 
 
-def all_(*args: Union[bool, np.ndarray, Mask]) -> Mask:
+def all_(*args: Union[bool, np.ndarray, Mask, PackedMask]) -> Union[Mask, PackedMask]:
     """Given a number of conditions, return :code:`True` only if **all**
     of the given conditions are true.
 
@@ -277,6 +509,11 @@ def all_(*args: Union[bool, np.ndarray, Mask]) -> Mask:
     Mask([[False, False],
           [ True, False]])
 
+    If any of the arguments are a :class:`PackedMask` the result will be a packed mask
+    too, with the other arguments broadcast to its shape.
+
+    >>> mask.all_(True, x1, mask.Mask(x3).pack()).unpack()
+    Mask([False, False,  True])
 
     See Also
     --------
@@ -290,11 +527,85 @@ def all_(*args: Union[bool, np.ndarray, Mask]) -> Mask:
     :data:`numpy:numpy.logical_and`
        Reference documentation on the :code:`logical_and` function.
     """
+
+    if any(isinstance(a, PackedMask) for a in args):
+        return _reduce_packed(np.bitwise_and, args)
+
     return Mask(functools.reduce(np.logical_and, args))
 
 
+def label(*masks: Union[np.ndarray, Mask, PackedMask]) -> np.ndarray:
+    """Combine a number of masks into a single array of integer labels.
+
+    Each element of the result is set to :code:`i + 1` where :code:`i` is the index of
+    the last mask to select it, or :code:`0` if none of the masks select it. In other
+    words, later masks take priority over earlier ones in the same way that later calls
+    to :func:`arlunio.image.fill` paint over earlier ones. The result uses the smallest
+    unsigned integer type able to hold every label and can be colored in a single pass
+    using :func:`arlunio.image.fromlabels`.
+
+    Parameters
+    ----------
+    masks:
+      The masks to combine, in order of increasing priority. Masks can be of differing
+      shapes, assuming that they can be broadcasted to a common shape.
+
+    Example
+    -------
+    >>> import arlunio.mask as mask
+    >>> a = mask.Mask([[True, True, False], [False, False, False]])
+    >>> b = mask.Mask([[False, True, True], [False, True, False]])
+    >>> mask.label(a, b)
+    array([[1, 2, 2],
+           [0, 2, 0]], dtype=uint8)
+    """
+
+    masks = [np.asarray(m) for m in masks]
+    shape = np.broadcast_shapes(*(m.shape for m in masks))
+
+    labels = np.zeros(shape, dtype=np.min_scalar_type(len(masks)))
+
+    for idx, m in enumerate(masks, start=1):
+        np.copyto(labels, idx, where=m)
+
+    return labels
+
+
+def _repeat(cell: np.ndarray, width: int, height: int, out=None) -> np.ndarray:
+    """Fill an array with copies of the given cell, repeating it as many times as
+    necessary to cover the given width and height.
+
+    Any cells along the bottom and right edges that do not completely fit are cut
+    short. If :code:`out` is :code:`None` a new array will be allocated.
+    """
+
+    if out is None:
+        out = allocate(cell, width, height)
+
+    s_height, s_width = cell.shape[:2]
+    m, n = height // s_height, width // s_width
+    M, N = m * s_height, n * s_width
+
+    # View the region covered by whole cells as an (m, n) grid of cells, so that the
+    # cell can be broadcast into every position of the grid in a single copy.
+    rs, cs = out.strides[:2]
+    grid = np.lib.stride_tricks.as_strided(
+        out,
+        shape=(m, n) + cell.shape,
+        strides=(s_height * rs, s_width * cs) + out.strides,
+        writeable=True,
+    )
+    grid[...] = cell
+
+    # Any remaining columns or rows are the same as the ones the pattern started with
+    out[:M, N:] = out[:M, : width - N]
+    out[M:, :] = out[: height - M, :]
+
+    return out
+
+
 @ar.definition
-def Repeat(width: int, height: int, *, n=4, m=None, defn=None) -> Mask:
+def Repeat(width: int, height: int, *, n=4, m=None, defn=None, out=None) -> Mask:
     """Given a mask producing definition, replicate the resulting mask in a grid.
 
     .. arlunio-image:: Simple Grid
@@ -316,12 +627,11 @@ def Repeat(width: int, height: int, *, n=4, m=None, defn=None) -> Mask:
     It's important to note that the given definition must only take :code:`width` and
     :code:`height` as inputs.
 
-
-    .. note::
-
-       Due to a limitation in the current implementation, you will get the best results
-       if your :math:`n \\times m` grid divides cleanly into the resolution of the final
-       mask. Otherwise you will find that the generated grid won't completly fill it.
+    The definition is only evaluated once, for a single cell, with the result copied
+    directly into place in the final mask. If the :math:`n \\times m` grid does not
+    divide cleanly into the resolution of the final mask, the pattern is continued
+    into the remaining rows and columns with the cells along the bottom and right edges
+    cut short.
 
     Attributes
     ----------
@@ -332,6 +642,9 @@ def Repeat(width: int, height: int, *, n=4, m=None, defn=None) -> Mask:
         this defaults to the value of :code:`n`
     defn:
         The instance of the definition to replicate.
+    out:
+        If given, the array to write the result into. Otherwise a new array will be
+        allocated.
 
     Examples
     --------
@@ -379,23 +692,11 @@ def Repeat(width: int, height: int, *, n=4, m=None, defn=None) -> Mask:
     if m is None:
         m = n
 
-    bg = np.full((height, width), False)
-
     # Draw the shape at a size determined by the size of the grid
-    s_height, s_width = height // m, width // n
-    mask = defn(width=s_width, height=s_height)
-
-    # Let numpy handle the repeating of the shape across the image.
-    pattern = np.tile(mask, (m, n))
-
-    # Apply the pattern to the background, depending on the grid size and
-    # image dimensions align, the generated grid may not perfectly fill the
-    # image.
-    p_height, p_width = pattern.shape
-
-    bg[:p_height, :p_width] = pattern
+    s_height, s_width = max(height // m, 1), max(width // n, 1)
+    cell = np.asanyarray(defn(width=s_width, height=s_height))
 
-    return bg
+    return _repeat(cell, width, height, out=out)
 
 
 @ar.definition
@@ -416,11 +717,10 @@ def Map(width: int, height: int, *, layout=None, legend=None, fill=None) -> Mask
     corresponding to the value in the :code:`layout`. If however the :code:`legend` does
     not contain a matching key then the :code:`fill` definition will be used instead.
 
-    .. note::
-
-       Due to a limitation in the current implementation, you will get best results
-       if the dimensions of the :code:`layout` grid divide cleanly into the dimensions
-       of the final mask.
+    Each definition is only evaluated once, no matter how many cells it is used in.
+    If the dimensions of the :code:`layout` grid do not divide cleanly into the
+    dimensions of the final mask, some cells will be one pixel smaller than the others
+    and the mask in those cells will be scaled down to fit.
 
     Attributes
     ----------
@@ -481,16 +781,37 @@ def Map(width: int, height: int, *, layout=None, legend=None, fill=None) -> Mask
     """
     fill = fill if fill is not None else Empty()
 
-    # TODO: Handle divisions with rounding errors
-    nx, ny = len(layout), len(layout[0])
-    size = {"height": height // ny, "width": width // nx}
+    layout = np.asarray(layout)
+    rows, cols = layout.shape
+
+    # Give each distinct key in the layout a number, which will be its position in the
+    # atlas of cells.
+    keys, index = np.unique(layout, return_inverse=True)
+    index = index.reshape(layout.shape)
+
+    # Each cell is drawn at the size of the largest cell in the grid.
+    size = {"height": -(-height // rows), "width": -(-width // cols)}
+    atlas = np.stack([legend.get(key, fill)(**size) for key in keys])
+
+    def lookup(length, n, cell_length):
+        """For each pixel along an axis, return the cell it falls in along with the
+        corresponding pixel in the cell's mask."""
 
-    # Build a new dict with the values being the shapes drawn at the appropriate res
-    # to ensure we only draw them once.
-    items = {k: v(**size) for k, v in legend.items()}
-    default = fill(**size)
+        pixels = np.arange(length)
+        start = (np.arange(n + 1) * length) // n
+        cells = np.searchsorted(start, pixels, side="right") - 1
 
-    return np.block([[items.get(key, default) for key in row] for row in layout])
+        # Cells may be smaller than the masks in the atlas if the grid does not divide
+        # cleanly, in which case we sample their mask instead.
+        offset = ((pixels - start[cells]) * cell_length) // np.diff(start)[cells]
+
+        return cells, offset
+
+    ys, vs = lookup(height, rows, size["height"])
+    xs, us = lookup(width, cols, size["width"])
+
+    cells = index[ys[:, np.newaxis], xs]
+    return Mask(atlas[cells, vs[:, np.newaxis], us])
 
 
 @ar.definition
@@ -513,16 +834,10 @@ def Pixelize(width: int, height: int, *, mask=None, defn=None, scale=16) -> Mask
     definition which can be given with the :code:`defn` attribute. Note that this
     definition can only take :code:`width` and :code:`height` as inputs.
 
-    .. note::
-
-       There is a limitation in the current implementation where the resulting mask may
-       be smaller than expected due to rounding errors. For best results
-
-       - Ensure that the shape of the mask given with the :code:`mask` attribute cleanly
-         divides your desired :code:`width` and :code:`height`.
-
-       - When using the :code:`defn` attribute ensure that the :code:`scale` attribute
-         cleanly divides your desired :code:`width` and :code:`height`.
+    Each pixel in the result takes its value from the nearest pixel in the smaller
+    mask, so the result always has the requested :code:`width` and :code:`height`.
+    If the size of the smaller mask does not cleanly divide the size of the result then
+    some of the enlarged pixels will be one pixel larger than the others.
 
 
     Attributes
@@ -608,22 +923,131 @@ def Pixelize(width: int, height: int, *, mask=None, defn=None, scale=16) -> Mask
     if defn is None and mask is None:
         raise ValueError("You must provide a mask or a mask producing definition.")
 
-    if mask is not None:
-        w, h = len(mask), len(mask[0])
-
     if defn is not None:
         # Based on the given resolution, calculate the size of each enlarged element.
         ratio = width / height
+        mask = defn(width=int(scale * ratio), height=scale)
 
-        w, h = int(scale * ratio), scale
-        mask = defn(width=w, height=h)
-
-    n, m = int(width // w), int(height // h)
+    mask = np.asarray(mask)
+    h, w = mask.shape
 
     logger.debug("Mask size: (%s, %s)", w, h)
-    logger.debug("Pixel size: (%s, %s)", n, m)
+    logger.debug("Pixel size: (%s, %s)", width / w, height / h)
+
+    # Find the pixel in the smaller mask that each pixel in the result corresponds to.
+    rows = (np.arange(height) * h) // height
+    cols = (np.arange(width) * w) // width
+
+    return Mask(mask[rows[:, np.newaxis], cols])
+
+
+def _edges(mask: np.ndarray) -> np.ndarray:
+    """Return the pixels in the mask that differ from at least one of their
+    neighbours."""
+
+    edges = np.full(mask.shape, False)
+
+    dx = mask[:, 1:] != mask[:, :-1]
+    edges[:, 1:] |= dx
+    edges[:, :-1] |= dx
+
+    dy = mask[1:, :] != mask[:-1, :]
+    edges[1:, :] |= dy
+    edges[:-1, :] |= dy
+
+    return edges
+
+
+@ar.definition
+def Coverage(width: int, height: int, *, defn=None, samples=4, size=32) -> np.ndarray:
+    """Compute how much of each pixel is covered by a mask, producing smooth edges.
+
+    .. arlunio-image:: Coverage Demo
+       :align: right
+
+       ::
+
+          import arlunio.image as image
+          import arlunio.mask as mask
+          import arlunio.shape as shape
+
+          circle = shape.Circle(r=0.6) - shape.Square(size=0.3)
+          coverage = mask.Coverage(defn=circle)
+          img = image.fill(coverage(width=256, height=256), background="white")
+
+    Masks produced by definitions such as those in :mod:`arlunio.shape` only say
+    whether or not each pixel is part of the shape, which produces jagged edges.
+    Instead this definition produces an array of floats in the range :math:`[0, 1]`
+    representing the fraction of each pixel covered by the mask. These can be given to
+    :func:`arlunio.image.fill` which will use them as the opacity of the color.
+
+    The mask produced by the definition given with the :code:`defn` attribute is first
+    evaluated as normal to find the pixels on the edges of the mask. Every region of
+    :code:`size` pixels that contains an edge is then evaluated again at
+    :code:`samples` times the resolution, with the coverage of each pixel given by the
+    fraction of its :math:`samples \\times samples` subpixels that are part of the mask.
+    Since only the regions along the edges of the mask are evaluated again, this
+    produces the same result as evaluating the entire mask at the higher resolution
+    at a fraction of the cost.
+
+    The same restrictions that apply to :class:`arlunio.tile.Tiled` apply here. The
+    given definition must only take :code:`width` and :code:`height` as inputs and
+    should derive its output from the :class:`arlunio.math.X` and
+    :class:`arlunio.math.Y` coordinates.
+
+    .. note::
+
+       Any features of the mask small enough to fall in between the pixels of the
+       initial evaluation will not be picked up.
+
+    Attributes
+    ----------
+    defn:
+        The mask producing definition to evaluate.
+    samples:
+        The number of subpixels to use along each side of a pixel on an edge.
+    size:
+        The size of the regions evaluated at the higher resolution, either a single
+        number for square regions or a :code:`(width, height)` tuple.
+
+    Example
+    -------
+    >>> import arlunio.mask as mask
+    >>> import arlunio.shape as shape
+    >>> coverage = mask.Coverage(defn=shape.Square(size=0.5), samples=2)
+    >>> coverage(width=6, height=6)
+    array([[0.  , 0.  , 0.  , 0.  , 0.  , 0.  ],
+           [0.  , 0.25, 0.5 , 0.5 , 0.25, 0.  ],
+           [0.  , 0.5 , 1.  , 1.  , 0.5 , 0.  ],
+           [0.  , 0.5 , 1.  , 1.  , 0.5 , 0.  ],
+           [0.  , 0.25, 0.5 , 0.5 , 0.25, 0.  ],
+           [0.  , 0.  , 0.  , 0.  , 0.  , 0.  ]])
+    """
+
+    if defn is None:
+        raise ValueError("You must provide a mask producing definition.")
+
+    mask = np.asarray(defn(width=width, height=height), dtype=bool)
+    coverage = mask.astype(float)
+
+    edges = _edges(mask)
+
+    if samples <= 1 or not edges.any():
+        return coverage
+
+    # A viewport that makes every pixel of the image samples times larger.
+    viewport = Viewport.current(width, height)
+    fine = Viewport(width=viewport.width * samples, height=viewport.height * samples)
+
+    for x, y, w, h in tiles(width, height, size):
+
+        if not edges[y : y + h, x : x + w].any():
+            continue
+
+        with fine.region((viewport.x + x) * samples, (viewport.y + y) * samples):
+            result = np.asarray(defn(width=w * samples, height=h * samples))
 
-    fill = Mask.full(m, n)
-    empty = Mask.empty(m, n)
+        result = result.reshape(h, samples, w, samples)
+        coverage[y : y + h, x : x + w] = result.mean(axis=(1, 3))
 
-    return Mask(np.block([[fill if col else empty for col in row] for row in mask]))
+    return coverage
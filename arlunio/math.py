@@ -3,6 +3,7 @@ from typing import Callable
 import numpy as np
 
 import arlunio as ar
+from arlunio.tile import Viewport
 
 
 def clamp(vs, min_=0, max_=1):
@@ -40,6 +41,39 @@ def clamp(vs, min_=0, max_=1):
     return vs
 
 
+def compact(vs):
+    """Return the smallest view of an array that broadcasts to the same values.
+
+    Arrays produced by :func:`numpy:numpy.broadcast_to`, such as the coordinates
+    produced by :class:`X` and :class:`Y`, repeat the same values along some of their
+    axes without storing them more than once. Operating on these arrays directly
+    still produces a full sized result. By first reducing any repeated axes to a
+    length of :code:`1`, numpy's broadcasting rules can be used to compute each value
+    only once. Arrays without any repeated axes are returned unchanged.
+
+    Parameters
+    ----------
+    vs:
+       The array to compact
+
+    Example
+    -------
+    >>> from arlunio.math import X, compact
+    >>> x = X()(width=4, height=4)
+    >>> x.shape
+    (4, 4)
+    >>> compact(x)
+    array([[-1.        , -0.33333333,  0.33333333,  1.        ]])
+    """
+    vs = np.asanyarray(vs)
+    index = tuple(
+        slice(0, 1) if stride == 0 and size > 1 else slice(None)
+        for stride, size in zip(vs.strides, vs.shape)
+    )
+
+    return vs[index]
+
+
 def dot(us, vs):
     """Return the dot product of two arrays of vectors."""
     return np.sum(us * vs, axis=-1)
@@ -104,7 +138,79 @@ def normalise(vs):
         return vs / length(vs)[:, np.newaxis]
 
 
-@ar.definition
+def window(
+    width: int,
+    height: int,
+    xs,
+    ys,
+    *,
+    x0=0,
+    y0=0,
+    scale=1,
+    stretch=False,
+):
+    """Return the region of pixels covering the given range of coordinates.
+
+    Given the range of :math:`x` and :math:`y` values, along with the attributes that
+    would be given to the :class:`X` and :class:`Y` definitions, return the region of
+    the image as a tuple :code:`(x0, y0, x1, y1)` of pixel indices that contains every
+    pixel whose coordinates fall within the given range. This takes into account the
+    active :class:`arlunio.tile.Viewport` if any and the region is given relative to
+    it. The region is conservative and may include a few pixels outside of the range.
+
+    Returns :code:`None` if the region cannot be determined.
+
+    Parameters
+    ----------
+    width:
+        The width of the image
+    height:
+        The height of the image
+    xs:
+        The minimum and maximum :math:`x` values
+    ys:
+        The minimum and maximum :math:`y` values
+
+    Example
+    -------
+    >>> from arlunio.math import window
+    >>> window(9, 9, (-0.25, 0.25), (0, 1))
+    (2, -1, 7, 6)
+    """
+
+    viewport = Viewport.current(width, height)
+    W, H = viewport.width, viewport.height
+
+    if W < 2 or H < 2 or scale <= 0:
+        return None
+
+    sx, sy = scale, scale
+
+    if not stretch and W > H:
+        sx = scale * (W / H)
+
+    if not stretch and H > W:
+        sy = scale * (H / W)
+
+    # Invert the mapping from pixels to coordinates used by X and Y.
+    c0 = (xs[0] + x0 + sx) * (W - 1) / (2 * sx)
+    c1 = (xs[1] + x0 + sx) * (W - 1) / (2 * sx)
+    r0 = (sy - ys[1] - y0) * (H - 1) / (2 * sy)
+    r1 = (sy - ys[0] - y0) * (H - 1) / (2 * sy)
+
+    if not np.all(np.isfinite([c0, c1, r0, r1])):
+        return None
+
+    # Pad by a pixel to be sure of including any pixel affected by rounding
+    return (
+        int(np.floor(c0)) - 1 - viewport.x,
+        int(np.floor(r0)) - 1 - viewport.y,
+        int(np.ceil(c1)) + 2 - viewport.x,
+        int(np.ceil(r1)) + 2 - viewport.y,
+    )
+
+
+@ar.definition(cache=True)
 def X(width: int, height: int, *, x0=0, scale=1, stretch=False):
     """Cartesian :math:`x` coordinates.
 
@@ -119,6 +225,9 @@ def X(width: int, height: int, *, x0=0, scale=1, stretch=False):
           x = X()
           image = colorramp(x(width=256, height=256))
 
+    Since every row of the grid is identical, the result is a read-only view onto a
+    single row of values. See :func:`compact` for a way to take advantage of this.
+
     Attributes
     ----------
     x0:
@@ -170,18 +279,17 @@ def X(width: int, height: int, *, x0=0, scale=1, stretch=False):
               [0.        , 1.33333333, 2.66666667, 4.        ]])
 
     """
-    ratio = width / height
+    viewport = Viewport.current(width, height)
+    ratio = viewport.width / viewport.height
 
     if not stretch and ratio > 1:
         scale = scale * ratio
 
-    x = np.linspace(-scale, scale, width)
-    x = np.array([x for _ in range(height)])
+    x = np.linspace(-scale, scale, viewport.width)[viewport.x : viewport.x + width]
+    return np.broadcast_to(x - x0, (height, width))
 
-    return x - x0
 
-
-@ar.definition
+@ar.definition(cache=True)
 def Y(width: int, height: int, *, y0=0, scale=1, stretch=False):
     """Cartesian :math:`y` coordinates
 
@@ -196,6 +304,9 @@ def Y(width: int, height: int, *, y0=0, scale=1, stretch=False):
           y = Y()
           image = colorramp(y(width=256, height=256))
 
+    Since every column of the grid is identical, the result is a read-only view onto a
+    single column of values. See :func:`compact` for a way to take advantage of this.
+
     Attributes
     ----------
     y0:
@@ -251,18 +362,17 @@ def Y(width: int, height: int, *, y0=0, scale=1, stretch=False):
               [0.        , 0.        , 0.        , 0.        ]])
 
     """
-    ratio = height / width
+    viewport = Viewport.current(width, height)
+    ratio = viewport.height / viewport.width
 
     if not stretch and ratio > 1:
         scale = scale * ratio
 
-    y = np.linspace(scale, -scale, height)
-    y = np.array([y for _ in range(width)]).transpose()
-
-    return y - y0
+    y = np.linspace(scale, -scale, viewport.height)[viewport.y : viewport.y + height]
+    return np.broadcast_to((y - y0)[:, np.newaxis], (height, width))
 
 
-@ar.definition
+@ar.definition(cache=True)
 def R(x: X, y: Y):
     """Polar :math:`r` coordinates.
 
@@ -314,10 +424,11 @@ def R(x: X, y: Y):
     :code:`R` definition.
 
     """
+    x, y = compact(x), compact(y)
     return np.sqrt(x * x + y * y)
 
 
-@ar.definition
+@ar.definition(cache=True)
 def T(x: X, y: Y, *, t0=0):
     """Polar :math:`\\theta` coordinates.
 
@@ -383,7 +494,7 @@ def T(x: X, y: Y, *, t0=0):
               [0.        , 0.        , 0.        , 0.        , 0.        ]])
 
     """
-    t = np.arctan2(y, x)
+    t = np.arctan2(compact(y), compact(x))
     return t - t0
 
 
@@ -399,7 +510,7 @@ def Polar(r: R, t: T):
     return np.dstack([r, t])
 
 
-@ar.definition
+@ar.definition(cache=True)
 def Barycentric(x: X, y: Y, *, a=(0.5, -0.5), b=(0, 0.5), c=(-0.5, -0.5)):
     """Barycentric coordinates.
 
@@ -440,8 +551,6 @@ def Barycentric(x: X, y: Y, *, a=(0.5, -0.5), b=(0, 0.5), c=(-0.5, -0.5)):
       The cartesian :math:`(x, y)` coordinates of the point :math:`c`
     """
 
-    h, w = x.shape
-
     # Construct the transform matrix T
     t1 = a[0] - c[0]
     t2 = b[0] - c[0]
@@ -450,14 +559,13 @@ def Barycentric(x: X, y: Y, *, a=(0.5, -0.5), b=(0, 0.5), c=(-0.5, -0.5)):
 
     # Compute the inverse determinant
     d = 1 / ((t1 * t4) - (t2 * t3))
-    p = np.dstack([x, y]).reshape(w * h, 2) - c
 
-    p1 = p[:, 0]
-    p2 = p[:, 1]
+    p1 = compact(x) - c[0]
+    p2 = compact(y) - c[1]
 
     # Compute the coordinates
     l1 = d * ((p1 * t4) - (p2 * t2))
     l2 = d * ((p2 * t1) - (p1 * t3))
     l3 = 1 - l1 - l2
 
-    return np.dstack([l1, l2, l3])[0].reshape(h, w, 3)
+    return np.dstack([l1, l2, l3])
@@ -19,4 +19,4 @@ def Checker(x: math.X, y: math.Y) -> mask.Mask:
 
     A simple checker pattern
     """
-    return x * y > 0
+    return math.compact(x) * math.compact(y) > 0
@@ -0,0 +1,280 @@
+"""Measuring where the time goes when evaluating definitions."""
+import contextlib
+import json
+import time
+import tracemalloc
+from typing import Any
+from typing import Dict
+from typing import List
+
+import attr
+
+import arlunio as ar
+
+
+@attr.s(auto_attribs=True, repr=False)
+class Node:
+    """The measurements recorded for a definition at a given position in the
+    evaluation tree."""
+
+    name: str
+    """The name of the definition."""
+
+    calls: int = 0
+    """The number of times the definition was evaluated."""
+
+    reused: int = 0
+    """The number of times the definition's result was reused from earlier in the
+    same evaluation, instead of being evaluated again."""
+
+    time: float = 0.0
+    """The total time in seconds spent evaluating the definition, including the time
+    spent evaluating its children."""
+
+    memory: int = 0
+    """The largest amount of memory in bytes allocated while evaluating the
+    definition. Only recorded when the profiler is tracking memory."""
+
+    children: Dict[str, "Node"] = attr.Factory(dict)
+    """The definitions evaluated as part of evaluating this definition."""
+
+    def __repr__(self):
+        return f"Node({self.name}, calls={self.calls}, time={self.time:.6f})"
+
+    @property
+    def own_time(self) -> float:
+        """The time in seconds spent evaluating the definition, excluding the time
+        spent evaluating its children."""
+        return self.time - sum(c.time for c in self.children.values())
+
+    def child(self, name: str) -> "Node":
+        """Return the child node with the given name, creating it if necessary."""
+
+        if name not in self.children:
+            self.children[name] = Node(name)
+
+        return self.children[name]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the measurements for this node and its children as a dictionary."""
+
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "reused": self.reused,
+            "time": self.time,
+            "own_time": self.own_time,
+            "memory": self.memory,
+            "children": [c.to_dict() for c in self.children.values()],
+        }
+
+
+@attr.s(auto_attribs=True)
+class _Frame:
+    """A definition that is currently being evaluated."""
+
+    node: Node
+    start: float
+    base: int = 0
+    peak: int = 0
+
+
+def _format_bytes(n: int) -> str:
+    """Format the given number of bytes in a human readable way."""
+
+    for unit in ["B", "KiB", "MiB"]:
+        if abs(n) < 1024:
+            return f"{n:.1f}{unit}" if unit != "B" else f"{n}{unit}"
+
+        n /= 1024
+
+    return f"{n:.1f}GiB"
+
+
+class Profiler:
+    """Record the time spent evaluating each definition in an evaluation tree.
+
+    While the profiler is active every evaluation of a definition is recorded, this
+    includes any base definitions such as :class:`arlunio.math.X`, as well as
+    any definitions evaluated by other definitions such as the operators in
+    :mod:`arlunio.mask`. Measurements are grouped by the definition's position in the
+    tree so repeated evaluations of the same part of the tree are combined.
+
+    Only evaluations that take place on the thread that activated the profiler are
+    recorded.
+
+    Parameters
+    ----------
+    memory:
+        If :code:`True` also record the peak memory allocated by each definition using
+        the :mod:`python:tracemalloc` module. This slows down evaluation considerably.
+
+    Example
+    -------
+    ::
+
+       >>> import arlunio.shape as shape
+       >>> from arlunio.profile import Profiler
+       >>> defn = shape.Circle() + shape.Square()
+       >>> with Profiler() as profiler:
+       ...     result = defn(width=32, height=32)
+       >>> print(profiler.report(times=False))
+       MaskAdd calls=1
+       ├─ Circle calls=1
+       │  ├─ X calls=1
+       │  └─ Y calls=1
+       └─ Square calls=1
+          ├─ X reused=1
+          └─ Y reused=1
+    """
+
+    def __init__(self, *, memory=False):
+        self.memory = memory
+
+        self.root = Node("<root>")
+        """The root of the tree of measurements, its children are the definitions that
+        were evaluated directly."""
+
+        self._stack: List[_Frame] = []
+        self._previous = None
+        self._tracing = False
+
+    def __enter__(self):
+
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+
+        self._previous = ar._STATE.profiler
+        ar._STATE.profiler = self
+
+        return self
+
+    def __exit__(self, *args):
+        ar._STATE.profiler = self._previous
+
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+
+    @property
+    def _current(self) -> Node:
+        return self._stack[-1].node if self._stack else self.root
+
+    @contextlib.contextmanager
+    def record(self, name: str):
+        """Record the evaluation of the definition with the given name."""
+
+        node = self._current.child(name)
+        frame = _Frame(node=node, start=0.0)
+
+        if self.memory:
+            self._mark(frame)
+
+        self._stack.append(frame)
+        frame.start = time.perf_counter()
+
+        try:
+            yield node
+        finally:
+            elapsed = time.perf_counter() - frame.start
+            self._stack.pop()
+
+            node.calls += 1
+            node.time += elapsed
+
+            if self.memory:
+                self._measure(frame)
+
+    def reuse(self, name: str):
+        """Record that the result of the definition with the given name was reused
+        from earlier in the evaluation."""
+        self._current.child(name).reused += 1
+
+    def _mark(self, frame: _Frame):
+        """Note the memory in use at the start of the given frame."""
+
+        current, peak = tracemalloc.get_traced_memory()
+
+        # Resetting the peak would lose the enclosing frame's peak, so save it first.
+        if self._stack:
+            parent = self._stack[-1]
+            parent.peak = max(parent.peak, peak)
+
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+
+        frame.base = frame.peak = current
+
+    def _measure(self, frame: _Frame):
+        """Record the peak memory allocated during the given frame."""
+
+        current, peak = tracemalloc.get_traced_memory()
+
+        # Without the ability to reset the peak, fall back to the memory retained
+        if not hasattr(tracemalloc, "reset_peak"):
+            peak = current
+
+        frame.peak = max(frame.peak, peak)
+        frame.node.memory = max(frame.node.memory, frame.peak - frame.base)
+
+        if self._stack:
+            parent = self._stack[-1]
+            parent.peak = max(parent.peak, frame.peak)
+
+    def to_dict(self) -> List[Dict[str, Any]]:
+        """Return the recorded measurements as a list of trees, one for each
+        definition that was evaluated directly."""
+        return [c.to_dict() for c in self.root.children.values()]
+
+    def to_json(self, **kwargs) -> str:
+        """Return the recorded measurements as a JSON string.
+
+        Any keyword arguments are passed onto :func:`python:json.dumps`.
+        """
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def report(self, *, times=True) -> str:
+        """Return the recorded measurements formatted as a tree.
+
+        Parameters
+        ----------
+        times:
+            If :code:`False`, omit the times and memory usage, only showing the number
+            of calls.
+        """
+
+        lines = []
+
+        def describe(node: Node) -> str:
+            parts = [node.name]
+
+            if node.calls > 0:
+                parts.append(f"calls={node.calls}")
+
+            if node.reused > 0:
+                parts.append(f"reused={node.reused}")
+
+            if times and node.calls > 0:
+                parts.append(f"time={node.time * 1000:.3f}ms")
+                parts.append(f"own={node.own_time * 1000:.3f}ms")
+
+            if times and self.memory and node.calls > 0:
+                parts.append(f"memory={_format_bytes(node.memory)}")
+
+            return " ".join(parts)
+
+        def walk(node: Node, prefix: str):
+            children = list(node.children.values())
+
+            for idx, child in enumerate(children):
+                last = idx == len(children) - 1
+
+                lines.append(prefix + ("└─ " if last else "├─ ") + describe(child))
+                walk(child, prefix + ("   " if last else "│  "))
+
+        for node in self.root.children.values():
+            lines.append(describe(node))
+            walk(node, "")
+
+        return "\n".join(lines)
@@ -1,3 +1,4 @@
+from .bvh import BVH
 from .camera import SimpleCamera
 from .camera import SimpleSampler
 from .camera import UniformSampler
@@ -7,23 +8,30 @@ from .material import Gradient
 from .material import LambertianDiffuse
 from .material import NormalMap
 from .object import Sphere
+from .object import Spheres
 from .render import ClayRenderer
 from .render import MaterialRenderer
+from .render import Progress
+from .render import ProgressiveRenderer
 from .render import SampledRenderer
 from .render import ZDepthRenderer
 
 __all__ = [
+    "BVH",
     "ClayRenderer",
     "Gradient",
     "LambertianDiffuse",
     "MaterialRenderer",
     "NormalMap",
+    "Progress",
+    "ProgressiveRenderer",
     "Rays",
     "ScatterPoint",
     "SimpleCamera",
     "SampledRenderer",
     "SimpleSampler",
     "Sphere",
+    "Spheres",
     "UniformSampler",
     "ZDepthRenderer",
 ]
@@ -0,0 +1,209 @@
+from typing import Any
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import attr
+import numpy as np
+
+from .data import Rays
+from .data import ScatterPoint
+from .object import Sphere
+from .object import Spheres
+
+
+def _bounds(obj) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """Return the corners of the box containing the given object, or :code:`None` if
+    it is not known."""
+
+    if isinstance(obj, Sphere):
+        center = np.array([0, 0, -1]) if obj.center is None else obj.center
+        center = np.asarray(center, dtype=float)
+        radius = abs(obj.radius)
+
+        return center - radius, center + radius
+
+    if isinstance(obj, Spheres):
+        centers = np.array([[0, 0, -1]]) if obj.centers is None else obj.centers
+        centers = np.asarray(centers, dtype=float).reshape(-1, 3)
+        radii = np.abs(np.asarray(obj.radii, dtype=float)).reshape(-1, 1)
+
+        if len(centers) == 0:
+            return None
+
+        return (centers - radii).min(axis=0), (centers + radii).max(axis=0)
+
+    return None
+
+
+def _enter(rays: Rays, lo, hi, t_min, t_max) -> np.ndarray:
+    """Return which of the rays pass through the given box between :code:`t_min` and
+    :code:`t_max`."""
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        inv = 1 / rays.direction
+
+        t1 = (lo - rays.origin) * inv
+        t2 = (hi - rays.origin) * inv
+
+    # Rays parallel to a face produce NaNs which fmin/fmax ignore.
+    near = np.fmax.reduce(np.fmin(t1, t2), axis=1)
+    far = np.fmin.reduce(np.fmax(t1, t2), axis=1)
+
+    return (near <= far) & (far >= t_min) & (near <= t_max)
+
+
+@attr.s(auto_attribs=True, repr=False)
+class BVH:
+    """A bounding volume hierarchy over the objects in a scene.
+
+    Each node in the hierarchy holds the box containing all of the objects beneath
+    it, so that when looking for the object each ray hits first, only the objects in
+    boxes the ray passes through need to be tested. This makes the cost of tracing
+    rays through a scene grow with the logarithm of the number of objects rather than
+    the number of objects.
+
+    Objects that are not able to report the box containing them are tested against
+    every ray.
+    """
+
+    objects: List[Any]
+    """The objects in the scene."""
+
+    lo: np.ndarray
+    """The lower corner of each node's box."""
+
+    hi: np.ndarray
+    """The upper corner of each node's box."""
+
+    children: np.ndarray
+    """The index of the two children of each node, :code:`-1` for leaf nodes."""
+
+    items: List[np.ndarray]
+    """The index of the objects held in each leaf node."""
+
+    unbounded: np.ndarray
+    """The index of the objects that must be tested against every ray."""
+
+    def __repr__(self):
+        return f"BVH(objects={len(self.objects)}, nodes={len(self.lo)})"
+
+    @classmethod
+    def build(cls, objects, leaf_size=4):
+        """Build the hierarchy for the given objects.
+
+        Parameters
+        ----------
+        objects:
+            The objects to build the hierarchy for, if this is already a
+            :class:`BVH` it is returned as is.
+        leaf_size:
+            The maximum number of objects to hold in each leaf node.
+        """
+
+        if isinstance(objects, cls):
+            return objects
+
+        objects = list(objects)
+        boxes = [_bounds(obj) for obj in objects]
+
+        bounded = np.array([i for i, b in enumerate(boxes) if b is not None], dtype=int)
+        unbounded = np.array([i for i, b in enumerate(boxes) if b is None], dtype=int)
+
+        los = np.array([boxes[i][0] for i in bounded]).reshape(-1, 3)
+        his = np.array([boxes[i][1] for i in bounded]).reshape(-1, 3)
+        centers = (los + his) / 2
+
+        lo, hi, children, items = [], [], [], []
+
+        def node(index):
+            """Add the node holding the given objects, returning its id."""
+
+            n = len(lo)
+            lo.append(los[index].min(axis=0))
+            hi.append(his[index].max(axis=0))
+            children.append((-1, -1))
+            items.append(bounded[index])
+
+            if len(index) <= leaf_size:
+                return n
+
+            # Split the objects in half along the axis they are most spread out along
+            cs = centers[index]
+            axis = np.argmax(cs.max(axis=0) - cs.min(axis=0))
+            order = index[np.argsort(cs[:, axis], kind="stable")]
+            half = len(order) // 2
+
+            left, right = node(order[:half]), node(order[half:])
+            children[n] = (left, right)
+            items[n] = bounded[:0]
+
+            return n
+
+        if len(bounded) > 0:
+            node(np.arange(len(bounded)))
+
+        return cls(
+            objects=objects,
+            lo=np.array(lo).reshape(-1, 3),
+            hi=np.array(hi).reshape(-1, 3),
+            children=np.array(children, dtype=int).reshape(-1, 2),
+            items=items,
+            unbounded=unbounded,
+        )
+
+    def intersect(self, rays: Rays, t_min: float) -> Tuple[ScatterPoint, np.ndarray]:
+        """Find the first object hit by each ray.
+
+        Returns the :class:`ScatterPoint` describing where each ray hit along with the
+        index of the object each ray hit, or :code:`-1` for rays that did not hit
+        anything.
+        """
+
+        scatter = ScatterPoint.new(rays)
+        ids = np.full(scatter.hit.shape, -1)
+
+        def test(i, index):
+            obj = self.objects[i]
+            result = obj(rays=rays[index], t_min=t_min, t_max=scatter.t[index])
+
+            scatter.merge(result, index=index)
+            ids[index[result.hit]] = i
+
+        everything = np.arange(len(ids))
+
+        for i in self.unbounded:
+            test(i, everything)
+
+        stack = [(0, everything)] if len(self.lo) > 0 else []
+
+        while stack:
+            n, index = stack.pop()
+
+            packet = rays[index]
+            entered = _enter(packet, self.lo[n], self.hi[n], t_min, scatter.t[index])
+            index = index[entered]
+
+            if len(index) == 0:
+                continue
+
+            left, right = self.children[n]
+
+            if left < 0:
+                for i in self.items[n]:
+                    test(i, index)
+
+                continue
+
+            # Visit the child nearest to the rays first, so that the hits found there
+            # can be used to skip testing the other.
+            origin = packet.origin.mean(axis=0)
+            dl = np.sum(((self.lo[left] + self.hi[left]) / 2 - origin) ** 2)
+            dr = np.sum(((self.lo[right] + self.hi[right]) / 2 - origin) ** 2)
+
+            near, far = (left, right) if dl <= dr else (right, left)
+
+            stack.append((far, index))
+            stack.append((near, index))
+
+        return scatter, ids
@@ -1,8 +1,8 @@
 import numpy as np
-import numpy.random as npr
 
 import arlunio as ar
 from .data import Rays
+from .rng import rand
 
 
 @ar.definition
@@ -28,8 +28,8 @@ def UniformSampler(width: int, height: int):
     v = np.full((height, width), v)
 
     uv = np.dstack([u, v]).reshape(n, 2)
-    uv[:, 0] += npr.rand(n) / width
-    uv[:, 1] += npr.rand(n) / height
+    uv[:, 0] += rand(n) / width
+    uv[:, 1] += rand(n) / height
 
     return uv
 
@@ -77,15 +77,21 @@ class ScatterPoint:
 
         return ScatterPoint(hit, t, p, normal, front_face)
 
-    def merge(self, other):
-        """Merge the results of another scatter point in with this one."""
+    def merge(self, other, index=None):
+        """Merge the results of another scatter point in with this one.
 
-        self.hit = np.logical_or(self.hit, other.hit)
+        If :code:`index` is given, then :code:`other` is taken to only describe the
+        rays at those indices.
+        """
 
-        self.t[other.hit] = other.t
-        self.p[other.hit] = other.p
-        self.normal[other.hit] = other.normal
-        self.front_face[other.hit] = other.front_face
+        hit = other.hit if index is None else index[other.hit]
+
+        self.hit[hit] = True
+
+        self.t[hit] = other.t
+        self.p[hit] = other.p
+        self.normal[hit] = other.normal
+        self.front_face[hit] = other.front_face
 
     @classmethod
     def new(cls, rays: Rays):
@@ -100,7 +106,7 @@ class ScatterPoint:
         params = {
             "hit": false,
             "t": maxf,
-            "p": rays.direction,
+            "p": np.array(rays.direction),
             "normal": normalise(rays.direction),
             "front_face": true,
         }
@@ -1,15 +1,15 @@
 import numpy as np
-import numpy.random as npr
 
 import arlunio as ar
 from .data import Rays
 from .data import ScatterPoint
+from .rng import rand
 from arlunio.color import getcolorf
 
 
 def random_unit_sphere(n):
-    a = npr.rand(n) * 2 * np.pi
-    z = (npr.rand(n) * 2) - 1
+    a = rand(n) * 2 * np.pi
+    z = (rand(n) * 2) - 1
     r = np.sqrt(1 - (z * z))
 
     return np.dstack([r * np.cos(a), r * np.sin(a), z])[0]
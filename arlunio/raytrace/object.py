@@ -66,3 +66,110 @@ def Sphere(
     normals[front_face != True] = -normals[front_face != True]
 
     return ScatterPoint(hits, t, p, normals, front_face)
+
+
+_CHUNK_SIZE = 64 * 1024
+"""The number of ray-sphere pairs to test at a time."""
+
+
+@ar.definition
+def Spheres(
+    rays: Rays, t_min: float, t_max: float, *, centers=None, radii=0.5
+) -> ScatterPoint:
+    """Many spheres at once.
+
+    Produces the same result as testing the rays against a :class:`Sphere` for each
+    of the given :code:`centers` and :code:`radii` in turn. Rather than testing each
+    sphere separately, the rays are tested against many spheres at a time, keeping
+    track of the nearest hit for each ray as it goes.
+
+    Attributes
+    ----------
+    centers:
+        An array with shape :code:`(n, 3)` containing the center of each sphere. If
+        not set this will default to a single sphere centered at :math:`(0, 0, -1)`.
+    radii:
+        The radius of each sphere, or a single radius shared by all of them.
+    """
+
+    centers = np.array([[0, 0, -1]]) if centers is None else centers
+    centers = np.asarray(centers, dtype=float).reshape(-1, 3)
+
+    radii = np.asarray(radii, dtype=float)
+    rr = np.broadcast_to(radii * radii, (len(centers),))
+
+    n = rays.direction.shape[0]
+    a = dot(rays.direction, rays.direction)
+
+    # The nearest hit found so far for each ray and the sphere it belongs to.
+    nearest = np.array(np.broadcast_to(t_max, (n,)), dtype=float)
+    index = np.full((n,), -1)
+
+    spheres = min(max(len(centers), 1), 64)
+    size = max(1, _CHUNK_SIZE // spheres)
+
+    for i in range(0, n, size):
+        rs = slice(i, i + size)
+
+        ox, oy, oz = (rays.origin[rs, k, np.newaxis] for k in range(3))
+        dx, dy, dz = (rays.direction[rs, k, np.newaxis] for k in range(3))
+
+        for j in range(0, len(centers), spheres):
+            cx, cy, cz = centers[j : j + spheres].T
+
+            # Written out component by component, this matches the arithmetic used by
+            # Sphere without the cost of summing along a short axis.
+            ocx, ocy, ocz = ox - cx, oy - cy, oz - cz
+
+            b = ocx * dx
+            b += ocy * dy
+            b += ocz * dz
+
+            c = np.multiply(ocx, ocx, out=ocx)
+            c += np.multiply(ocy, ocy, out=ocy)
+            c += np.multiply(ocz, ocz, out=ocz)
+            c -= rr[j : j + spheres]
+
+            disc = np.multiply(a[rs, np.newaxis], c, out=c)
+            np.subtract(b * b, disc, out=disc)
+
+            # Only solve for t where the rays actually hit the sphere.
+            ray, sphere = np.nonzero(disc > 0)
+
+            ai, bi = a[rs][ray], b[ray, sphere]
+            root = np.sqrt(disc[ray, sphere])
+
+            t1 = (-bi - root) / ai
+            t2 = (-bi + root) / ai
+
+            # Prefer t1, unless it comes before t_min
+            t = np.where((t1 < t_min) & (t2 > t_min), t2, t1)
+            valid = t > t_min
+
+            ray, sphere, t = ray[valid], sphere[valid] + j, t[valid]
+
+            # Find the nearest hit for each ray, earlier spheres win ties just as if
+            # they were tested first.
+            order = np.lexsort((sphere, t, ray))
+            ray, sphere, t = ray[order], sphere[order], t[order]
+
+            first = np.ones(len(ray), dtype=bool)
+            first[1:] = ray[1:] != ray[:-1]
+            ray, sphere, t = ray[first] + i, sphere[first], t[first]
+
+            closer = t < nearest[ray]
+            nearest[ray[closer]] = t[closer]
+            index[ray[closer]] = sphere[closer]
+
+    hits = index >= 0
+    t = nearest[hits]
+
+    # Determine the points of intersection and surface normals at t
+    p = rays[hits].at(t)
+    normals = normalise(p - centers[index[hits]])
+
+    # Finally determine which rays are hitting the outside surface of the sphere
+    front_face = dot(rays.direction[hits], normals) < 0
+    normals[~front_face] = -normals[~front_face]
+
+    return ScatterPoint(hits, t, p, normals, front_face)
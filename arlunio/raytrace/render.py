@@ -1,10 +1,18 @@
+import concurrent.futures as futures
+import contextlib
 import logging
+import time
+from typing import Iterator
 
+import attr
 import numpy as np
+import numpy.random as npr
 
 import arlunio as ar
 import arlunio.image as image
 import arlunio.math as math
+from . import rng
+from .bvh import BVH
 from .camera import SimpleCamera
 from .data import Rays
 from .data import ScatterPoint
@@ -16,17 +24,17 @@ from .material import LambertianDiffuse
 def ZDepthRenderer(
     width: int, height: int, *, camera=None, objects=None
 ) -> image.Image:
-    """A renderer that returns a z-depth pass."""
+    """A renderer that returns a z-depth pass.
+
+    The :code:`objects` can be given as a list or as a prebuilt
+    :class:`arlunio.raytrace.BVH`.
+    """
 
     camera = SimpleCamera() if camera is None else camera
-    objects = [] if objects is None else objects
+    scene = BVH.build([] if objects is None else objects)
 
     rays = camera(width=width, height=height)
-    scatter = ScatterPoint.new(rays)
-
-    for obj in objects:
-        test = obj(rays=rays, t_min=0, t_max=scatter.t)
-        scatter.merge(test)
+    scatter, _ = scene.intersect(rays, t_min=0)
 
     depth = np.abs(scatter.p[:, 2] - camera.origin[2])
     depth[scatter.t == ScatterPoint.MAX_FLOAT] = np.max(depth)
@@ -48,11 +56,15 @@ def ClayRenderer(
     objects=None,
     bounces=8,
 ) -> image.Image:
-    """A simple clay renderer."""
+    """A simple clay renderer.
+
+    The :code:`objects` can be given as a list or as a prebuilt
+    :class:`arlunio.raytrace.BVH`.
+    """
 
     background = Gradient() if background is None else background
     camera = SimpleCamera() if camera is None else camera
-    objects = [] if objects is None else objects
+    scene = BVH.build([] if objects is None else objects)
 
     rays = camera(width=width, height=height)
     scatter = ScatterPoint.new(rays)
@@ -64,9 +76,7 @@ def ClayRenderer(
 
     while depth < bounces:
 
-        for obj in objects:
-            test = obj(rays=rays, t_min=0.001, t_max=scatter.t)
-            scatter.merge(test)
+        scatter, _ = scene.intersect(rays, t_min=0.001)
 
         # If there were no hits, then there's nothing to do
         if not np.any(scatter.hit):
@@ -80,112 +90,127 @@ def ClayRenderer(
 
         # Increasee the bounce counter and run again
         depth += 1
-        scatter = ScatterPoint.new(rays)
 
     return color
 
 
 @ar.definition
 def MaterialRenderer(
-    width: int, height: int, *, objects=None, bounces=8, camera=None, background=None
+    width: int,
+    height: int,
+    *,
+    objects=None,
+    materials=None,
+    bounces=8,
+    camera=None,
+    background=None,
 ):
-    """A renderer capable of rendering materials."""
+    """A renderer capable of rendering materials.
+
+    The :code:`objects` are given as a list of :code:`(object, material)` pairs, or as
+    a prebuilt :class:`arlunio.raytrace.BVH` in which case :code:`materials` must list
+    the material to use for each of its objects.
+
+    Rays are traced a bounce at a time. After each bounce only the rays that hit
+    something are kept, and the rays that hit each material are gathered together so
+    that the material is run once on a single batch of rays. The resulting colors are
+    then written back to the pixels the rays belong to.
+    """
 
     logger = logging.getLogger(__name__)
 
     background = Gradient() if background is None else background
     camera = SimpleCamera() if camera is None else camera
-    objects = [] if objects is None else objects
+
+    if isinstance(objects, BVH):
+
+        if materials is None:
+            raise ValueError("Missing materials for the objects in the BVH")
+
+        scene = objects
+
+    else:
+        objects = [] if objects is None else objects
+        scene = BVH.build([obj for obj, _ in objects])
+        materials = [mat for _, mat in objects]
 
     rays = camera(width=width, height=height)
     scatter = ScatterPoint.new(rays)
     color = background(scatter=scatter)
 
     depth = 1
-    mask = np.full((scatter.hit.shape), True)
 
-    materials = [mat for _, mat in objects]
+    # The pixel each of the rays still being traced belongs to.
+    pixels = np.arange(scatter.hit.shape[0])
 
     logger.info("Starting render.")
 
     while depth < bounces:
 
-        matmap = np.full((scatter.hit.shape), -1)
-
         logger.debug(" Depth: %i ".center(80, "-"), depth)
-        logger.debug("Mask: %s", mask.shape)
-        logger.debug("Material Map: %s", matmap.shape)
-        logger.debug("%s", scatter)
+        logger.debug("#rays: %s", pixels.shape)
 
-        for idx, (obj, _) in enumerate(objects):
-            logger.debug(" Obj: %i ".center(80, "-"), idx)
-            test = obj(rays=rays, t_min=0.001, t_max=scatter.t)
-
-            # Record which material should be used for these intersections.
-            matmap[test.hit] = idx
-            scatter.merge(test)
+        # The index of the object hit by each ray gives the material to use.
+        scatter, matmap = scene.intersect(rays, t_min=0.001)
 
         if not np.any(scatter.hit):
             logger.debug("Nothing hit, stopping")
             break
 
-        matids = np.unique(matmap[matmap != -1])
-        logger.debug("-" * 80)
-        logger.debug("Mat Ids: %s", matids)
-        logger.debug("#hits: %s", scatter.hit[scatter.hit == True].shape)
+        # Rays that hit nothing are finished with.
+        pixels = pixels[scatter.hit]
+        matmap = matmap[scatter.hit]
+        scatter = scatter[scatter.hit]
 
-        mask[mask] = scatter.hit
-        origin = scatter.p[scatter.hit]
-        directions = scatter.normal[scatter.hit]
+        origin = np.array(scatter.p)
+        directions = np.array(scatter.normal)
 
-        for idx in matids:
-            logger.debug(" Mat: %i ".center(80, "-"), idx)
-            mat = materials[idx]
+        # Group the rays by material, keeping each group in pixel order.
+        order = np.argsort(matmap, kind="stable")
+        matids, starts = np.unique(matmap[order], return_index=True)
+        stops = np.append(starts[1:], len(order))
 
-            # Only select the intersections that correspond with this material
-            mat_mask = matmap[scatter.hit] == idx
+        logger.debug("Mat Ids: %s", matids)
 
-            scatter_mask = np.array(scatter.hit)
-            scatter_mask[scatter.hit] = mat_mask
+        for idx, start, stop in zip(matids, starts, stops):
+            batch = order[start:stop]
+            logger.debug("Mat: %i, #rays: %i", idx, len(batch))
 
-            color_mask = np.array(mask)
-            color_mask[color_mask] = scatter_mask[scatter.hit]
+            matcol, matrays = materials[idx](scatter=scatter[batch])
+            color[pixels[batch]] *= matcol
 
-            logger.debug("Mat Mask: %s", mat_mask.shape)
-            logger.debug("Scatter Mask: %s", scatter_mask.shape)
-            logger.debug("Color Mask: %s", color_mask.shape)
+            origin[batch] = matrays.origin
+            directions[batch] = matrays.direction
 
-            mat_scatter = scatter[scatter_mask]
-            logger.debug("Mat Scatter: %s", mat_scatter)
+        depth += 1
+        rays = Rays(origin, directions)
 
-            matcol, matrays = mat(scatter=mat_scatter)
-            color[color_mask] *= matcol
+    return color
 
-            origin[mat_mask] = matrays.origin
-            directions[mat_mask] = matrays.direction
 
-        depth += 1
+def _prebuild(kernel):
+    """Return the given kernel with the hierarchy for its scene already built, so that
+    it is built once rather than for every sample."""
 
-        rays = Rays(origin, directions)
-        scatter = ScatterPoint.new(rays)
+    objects = getattr(kernel, "objects", None)
 
-    return color
+    if objects is None or isinstance(objects, BVH):
+        return kernel
 
+    if isinstance(kernel, MaterialRenderer):
+        objects = list(objects)
+        scene = BVH.build([obj for obj, _ in objects])
 
-@ar.definition
-def SampledRenderer(width: int, height: int, *, kernel=None, samples=10) -> image.Image:
-    """A renderer is responsible for orchestrating the entire process."""
+        return attr.evolve(kernel, objects=scene, materials=[mat for _, mat in objects])
 
-    if kernel is None:
-        raise ValueError("Missing renderer kernel")
+    if isinstance(kernel, (ClayRenderer, ZDepthRenderer)):
+        return attr.evolve(kernel, objects=BVH.build(objects))
+
+    return kernel
 
-    s = samples
-    n = width * height
-    scale = 1.0 / s
 
-    cols = np.zeros((n, 3))
-    for _ in range(s):
-        cols += kernel(width=width, height=height) * scale
+def _toimage(cols: np.ndarray, width: int, height: int) -> image.Image:
+    """Convert an array of accumulated colors into an image."""
 
     # Gamma correction...
     cols = np.sqrt(cols)
@@ -198,3 +223,291 @@ def SampledRenderer(width: int, height: int, *, kernel=None, samples=10) -> imag
     color = color.reshape(height, width, 3)
 
     return image.fromarray(color, "RGB")
+
+
+_MAX_CHUNKS = 64
+"""The largest number of chunks to split the samples into."""
+
+
+def _chunks(seeds):
+    """Split the given seeds into chunks to be accumulated separately.
+
+    The number of chunks only depends on the number of seeds, so that combining the
+    chunks in order always produces the same result however many processes there are
+    to work on them.
+    """
+
+    n = min(len(seeds), _MAX_CHUNKS)
+    bounds = [len(seeds) * i // n for i in range(n + 1)]
+
+    return [seeds[a:b] for a, b in zip(bounds, bounds[1:])]
+
+
+def _seed_sequence(seed) -> np.random.SeedSequence:
+    """Return the seed sequence to spawn the seed for each sample from.
+
+    If no seed is given, one is drawn from the global :mod:`numpy.random` state so
+    that seeding it with :func:`numpy.random.seed` still produces the same image.
+    """
+
+    if seed is None:
+        seed = [int(v) for v in npr.randint(0, 2 ** 32, size=4, dtype=np.uint64)]
+
+    return np.random.SeedSequence(seed)
+
+
+def _accumulate(kernel, width: int, height: int, seeds, scale: float) -> np.ndarray:
+    """Evaluate the kernel once for each of the given seeds, returning the sum of the
+    results."""
+
+    cols = np.zeros((width * height, 3))
+
+    for seed in seeds:
+        with rng.using(np.random.default_rng(seed)):
+            cols += kernel(width=width, height=height) * scale
+
+    return cols
+
+
+@ar.definition
+def SampledRenderer(
+    width: int, height: int, *, kernel=None, samples=10, seed=None, processes=1
+) -> image.Image:
+    """A renderer is responsible for orchestrating the entire process.
+
+    Each sample is rendered with its own :class:`numpy.random.Generator`, seeded from
+    the given :code:`seed`, so rendering with the same seed always produces the same
+    image no matter how many processes are used. Samples are split into up to 64
+    chunks, depending only on the number of samples, which are spread across a pool
+    of processes.
+
+    Attributes
+    ----------
+    kernel:
+        The renderer to evaluate for each sample, such as a
+        :class:`MaterialRenderer`. When using more than one process this must be
+        able to be pickled. The hierarchy for the kernel's :code:`objects` is built
+        once up front, rather than for every sample.
+    samples:
+        The number of samples to take for each pixel.
+    seed:
+        The seed to use, if :code:`None` the seed is drawn from the global
+        :mod:`numpy.random` state.
+    processes:
+        The number of processes to spread the samples across.
+    """
+
+    if kernel is None:
+        raise ValueError("Missing renderer kernel")
+
+    kernel = _prebuild(kernel)
+    chunks = _chunks(_seed_sequence(seed).spawn(samples))
+
+    args = [(kernel, width, height, chunk, 1.0 / samples) for chunk in chunks]
+
+    if processes > 1 and len(chunks) > 1:
+        workers = min(processes, len(chunks))
+
+        with futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_accumulate, *zip(*args)))
+
+    else:
+        results = [_accumulate(*a) for a in args]
+
+    # Combine the chunks in a fixed order so that the result is reproducible.
+    cols = np.zeros((width * height, 3))
+
+    for result in results:
+        cols += result
+
+    return _toimage(cols, width, height)
+
+
+@attr.s(auto_attribs=True, repr=False)
+class Progress:
+    """The state of a render produced by a :class:`ProgressiveRenderer`."""
+
+    image: image.Image
+    """The image rendered so far."""
+
+    samples: int
+    """The number of samples taken for each pixel."""
+
+    noise: float
+    """The largest standard error in the color of any pixel."""
+
+    elapsed: float
+    """The number of seconds spent rendering."""
+
+    def __repr__(self):
+        return (
+            f"Progress(samples={self.samples}, noise={self.noise:.4f}, "
+            f"elapsed={self.elapsed:.2f})"
+        )
+
+
+def _moments(kernel, width: int, height: int, seeds):
+    """Evaluate the kernel once for each of the given seeds, returning the number of
+    samples, their mean and their sum of squared differences from the mean."""
+
+    mean = np.zeros((width * height, 3))
+    m2 = np.zeros((width * height, 3))
+
+    # Welford's algorithm
+    for n, seed in enumerate(seeds, start=1):
+        with rng.using(np.random.default_rng(seed)):
+            col = kernel(width=width, height=height)
+
+        delta = col - mean
+        mean += delta / n
+        m2 += delta * (col - mean)
+
+    return len(seeds), mean, m2
+
+
+def _combine(a, b):
+    """Combine the moments of two sets of samples."""
+
+    na, ma, sa = a
+    nb, mb, sb = b
+
+    n = na + nb
+    delta = mb - ma
+
+    return n, ma + delta * (nb / n), sa + sb + delta ** 2 * (na * nb / n)
+
+
+def _progressive(
+    kernel, width, height, batch, samples, threshold, budget, seed, processes
+):
+    """Render the image produced by a :class:`ProgressiveRenderer`."""
+
+    start = time.monotonic()
+    seeds = _seed_sequence(seed)
+
+    pixels = width * height
+    state = (0, np.zeros((pixels, 3)), np.zeros((pixels, 3)))
+
+    with contextlib.ExitStack() as stack:
+        pool = None
+
+        if processes > 1:
+            pool = stack.enter_context(futures.ProcessPoolExecutor(processes))
+
+        while True:
+            count = state[0]
+            size = batch
+
+            if samples is not None:
+                size = min(size, samples - count)
+
+            # Start with a single sample to measure how long each one takes, then
+            # shrink the last batch to try and finish within the time budget.
+            if budget is not None and count == 0:
+                size = min(size, 1)
+
+            if budget is not None and count > 0:
+                remaining = budget - (time.monotonic() - start)
+                per_sample = (time.monotonic() - start) / count
+                size = max(1, min(size, int(remaining / per_sample)))
+
+            chunks = _chunks(seeds.spawn(size))
+            args = [(kernel, width, height, chunk) for chunk in chunks]
+
+            if pool is not None and len(chunks) > 1:
+                results = pool.map(_moments, *zip(*args))
+            else:
+                results = (_moments(*a) for a in args)
+
+            for result in results:
+                state = _combine(state, result)
+
+            count, mean, m2 = state
+            noise = np.inf
+
+            if count > 1:
+                noise = float(np.sqrt(m2.max() / (count * (count - 1))))
+
+            elapsed = time.monotonic() - start
+
+            yield Progress(
+                image=_toimage(mean, width, height),
+                samples=count,
+                noise=noise,
+                elapsed=elapsed,
+            )
+
+            if samples is not None and count >= samples:
+                return
+
+            if threshold is not None and noise <= threshold:
+                return
+
+            if budget is not None and elapsed >= budget:
+                return
+
+
+@ar.definition
+def ProgressiveRenderer(
+    width: int,
+    height: int,
+    *,
+    kernel=None,
+    batch=8,
+    samples=None,
+    threshold=None,
+    budget=None,
+    seed=None,
+    processes=1,
+) -> Iterator[Progress]:
+    """A renderer that gradually refines the image.
+
+    Rather than returning a single image, this returns an iterator producing a
+    :class:`Progress` after each batch of samples containing the image so far.
+    Alongside the mean color of each pixel the variance is tracked, rendering stops
+    as soon as any of the following are true
+
+    - :code:`samples` samples have been taken for each pixel
+    - The largest standard error of any pixel's color is at most :code:`threshold`
+    - :code:`budget` seconds have been spent rendering
+
+    If none of these are given, rendering continues until the iterator is no longer
+    used.
+
+    Attributes
+    ----------
+    kernel:
+        The renderer to evaluate for each sample, such as a
+        :class:`MaterialRenderer`. When using more than one process this must be
+        able to be pickled. The hierarchy for the kernel's :code:`objects` is built
+        once up front, rather than for every sample.
+    batch:
+        The number of samples to take between each image.
+    samples:
+        The maximum number of samples to take for each pixel.
+    threshold:
+        The noise level at which to stop rendering.
+    budget:
+        The number of seconds to spend rendering. The first image is produced after
+        a single sample and the size of the final batch is reduced to try and
+        finish on time.
+    seed:
+        The seed to use, if :code:`None` the seed is drawn from the global
+        :mod:`numpy.random` state.
+    processes:
+        The number of processes to spread each batch across. Each batch is split
+        into chunks in the same way as :class:`SampledRenderer`, so the images
+        produced do not depend on the number of processes.
+    """
+
+    if kernel is None:
+        raise ValueError("Missing renderer kernel")
+
+    if batch < 1:
+        raise ValueError("The batch size must be at least 1")
+
+    kernel = _prebuild(kernel)
+
+    return _progressive(
+        kernel, width, height, batch, samples, threshold, budget, seed, processes
+    )
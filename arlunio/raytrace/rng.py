@@ -0,0 +1,55 @@
+"""Random numbers used while rendering."""
+import contextlib
+import threading
+from typing import Optional
+
+import numpy as np
+import numpy.random as npr
+
+_STATE = threading.local()
+
+
+def current() -> Optional[np.random.Generator]:
+    """Return the random number generator set by :func:`using`, or :code:`None` if
+    there isn't one."""
+    return getattr(_STATE, "rng", None)
+
+
+@contextlib.contextmanager
+def using(rng: np.random.Generator):
+    """Draw the random numbers used by cameras and materials from the given
+    generator.
+
+    Outside of this context, random numbers are drawn from the global
+    :mod:`numpy.random` state.
+
+    Example
+    -------
+    >>> import numpy as np
+    >>> from arlunio.raytrace.rng import rand, using
+    >>> with using(np.random.default_rng(1)):
+    ...     a = rand(3)
+    >>> with using(np.random.default_rng(1)):
+    ...     b = rand(3)
+    >>> bool((a == b).all())
+    True
+    """
+
+    previous = current()
+    _STATE.rng = rng
+
+    try:
+        yield rng
+    finally:
+        _STATE.rng = previous
+
+
+def rand(n: int) -> np.ndarray:
+    """Return :code:`n` random numbers drawn uniformly from :math:`[0, 1)`."""
+
+    rng = current()
+
+    if rng is None:
+        return npr.rand(n)
+
+    return rng.random(n)
@@ -0,0 +1,475 @@
+"""Shapes described by signed distance fields."""
+import numpy as np
+
+import arlunio as ar
+import arlunio.mask as mask
+import arlunio.math as math
+from arlunio.tile import Viewport
+
+
+class Distance(np.ndarray):
+    """A signed distance field is just a float numpy array.
+
+    Each value is the distance from that point to the edge of a shape, negative for
+    points inside the shape and positive for points outside of it.
+    """
+
+    def __new__(cls, arr):
+        return np.asarray(arr, dtype=float).view(cls)
+
+
+def _rescale(f, grad, size):
+    """Turn an implicit function :math:`f(x, y) < size` into an approximate distance
+    by dividing through by the length of its gradient.
+
+    Wherever the gradient cannot be used, fall back to :code:`f - size` so that the
+    sign of the result always agrees with the original inequality.
+    """
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        d = (f - size) / grad
+
+    return np.where(np.isfinite(grad) & (grad > 0), d, f - size)
+
+
+def _box(xs, ys, width, height):
+    """The exact distance to the edge of a box with the given half width and
+    height."""
+
+    qx, qy = xs - width, ys - height
+
+    outside = np.hypot(np.maximum(qx, 0), np.maximum(qy, 0))
+    inside = np.minimum(np.maximum(qx, qy), 0)
+
+    return Distance(outside + inside)
+
+
+def _pixel(width, height, scale, stretch):
+    """Return the distance between neighbouring pixels, as produced by the
+    :class:`arlunio.math.X` and :class:`arlunio.math.Y` definitions."""
+
+    viewport = Viewport.current(width, height)
+    W, H = viewport.width, viewport.height
+
+    sx, sy = scale, scale
+
+    if not stretch and W > H:
+        sx = scale * (W / H)
+
+    if not stretch and H > W:
+        sy = scale * (H / W)
+
+    dx = 2 * sx / (W - 1) if W > 1 else 2 * sx
+    dy = 2 * sy / (H - 1) if H > 1 else 2 * sy
+
+    return max(dx, dy)
+
+
+def _coordinate_attribute(attributes, name, value, default):
+    """Return the value of the given coordinate attribute, preferring the value
+    inherited by the shape."""
+
+    if name not in attributes:
+        return default if value is None else value
+
+    if value is not None and value != attributes[name]:
+        raise ValueError(
+            f"Coverage {name}={value!r} does not match the shape's "
+            f"{name}={attributes[name]!r}"
+        )
+
+    return attributes[name]
+
+
+@ar.definition
+def Circle(x: math.X, y: math.Y, *, xc=0, yc=0, r=0.8) -> Distance:
+    """The distance to the edge of a circle.
+
+    The points with a negative distance are exactly those selected by
+    :class:`arlunio.shape.Circle` with the same attributes.
+
+    Attributes
+    ----------
+    xc:
+        The :math:`x`-coordinate of the circle's center.
+    yc:
+        The :math:`y`-coordinate of the circle's center.
+    r:
+        Controls the radius of the circle.
+
+    Example
+    -------
+    >>> from arlunio.sdf import Circle
+    >>> circle = Circle(r=1)
+    >>> circle(width=5, height=5).round(2)
+    array([[ 0.41,  0.12,  0.  ,  0.12,  0.41],
+           [ 0.12, -0.29, -0.5 , -0.29,  0.12],
+           [ 0.  , -0.5 , -1.  , -0.5 ,  0.  ],
+           [ 0.12, -0.29, -0.5 , -0.29,  0.12],
+           [ 0.41,  0.12,  0.  ,  0.12,  0.41]])
+    """
+
+    x = math.compact(x) - xc
+    y = math.compact(y) - yc
+
+    return Distance(np.sqrt(x ** 2 + y ** 2) - r ** 2)
+
+
+@ar.definition
+def Ellipse(x: math.X, y: math.Y, *, xc=0, yc=0, a=2, b=1, r=0.8) -> Distance:
+    """The approximate distance to the edge of an ellipse.
+
+    The points with a negative distance are exactly those selected by
+    :class:`arlunio.shape.Ellipse` with the same attributes. Computing the exact
+    distance to an ellipse is expensive, so the distance is estimated from the
+    equation of the ellipse and its gradient. The estimate is accurate close to the
+    edge which is where it matters for outlines and smooth edges.
+
+    Attributes
+    ----------
+    xc:
+        The :math:`x`-coordinate of the ellipse's center.
+    yc:
+        The :math:`y`-coordinate of the ellipse's center.
+    a:
+        Controls the width of the ellipse.
+    b:
+        Controls the height of the ellipse.
+    r:
+        Controls the overall size of the ellipse.
+    """
+
+    x = math.compact(x) - xc
+    y = math.compact(y) - yc
+
+    a = a ** 2
+    b = b ** 2
+
+    f = np.sqrt(x ** 2 / a + y ** 2 / b)
+    grad = np.sqrt((x / a) ** 2 + (y / b) ** 2)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        grad = grad / f
+
+    return Distance(_rescale(f, grad, r * r))
+
+
+@ar.definition
+def SuperEllipse(
+    x: math.X, y: math.Y, *, xc=0, yc=0, a=1, b=1, n=3, r=0.8, m=None
+) -> Distance:
+    """The approximate distance to the edge of a super ellipse.
+
+    The points with a negative distance are exactly those selected by
+    :class:`arlunio.shape.SuperEllipse` with the same attributes. As with
+    :class:`Ellipse` the distance is estimated from the equation of the curve and its
+    gradient.
+
+    Attributes
+    ----------
+    xc:
+        The :math:`x`-coordinate of the center of the super ellipse.
+    yc:
+        The :math:`y`-coordinate of the center of the super ellipse.
+    a:
+        Controls the width of the super ellipse.
+    b:
+        Controls the height of the super ellipse.
+    n:
+        Controls the profile of the curve far from :math:`x = 0`.
+    m:
+        Controls the profile of the curve close to :math:`x = 0`. If :code:`None`
+        (default) then it will be set to the value of :code:`n`.
+    r:
+        Controls the size of the super ellipse.
+    """
+
+    x = np.abs((math.compact(x) - xc) / a)
+    y = np.abs((math.compact(y) - yc) / b)
+
+    if m is None:
+        m = n
+
+    f = x ** n + y ** m
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gx = n * x ** (n - 1) / abs(a)
+        gy = m * y ** (m - 1) / abs(b)
+
+    return Distance(_rescale(f, np.hypot(gx, gy), r))
+
+
+@ar.definition
+def Square(x: math.X, y: math.Y, *, xc=0, yc=0, size=0.8) -> Distance:
+    """The distance to the edge of a square.
+
+    The points with a negative distance are exactly those selected by
+    :class:`arlunio.shape.Square` with the same attributes.
+
+    Attributes
+    ----------
+    xc:
+        The :math:`x`-coordinate of the square's center.
+    yc:
+        The :math:`y`-coordinate of the square's center.
+    size:
+        Half the length of the square's sides.
+
+    Example
+    -------
+    >>> from arlunio.sdf import Square
+    >>> square = Square(size=0.5)
+    >>> square(width=5, height=5).round(2)
+    array([[ 0.71,  0.5 ,  0.5 ,  0.5 ,  0.71],
+           [ 0.5 ,  0.  ,  0.  ,  0.  ,  0.5 ],
+           [ 0.5 ,  0.  , -0.5 ,  0.  ,  0.5 ],
+           [ 0.5 ,  0.  ,  0.  ,  0.  ,  0.5 ],
+           [ 0.71,  0.5 ,  0.5 ,  0.5 ,  0.71]])
+    """
+
+    xs = np.abs(math.compact(x) - xc)
+    ys = np.abs(math.compact(y) - yc)
+
+    return _box(xs, ys, size, size)
+
+
+@ar.definition
+def Rectangle(x: math.X, y: math.Y, *, xc=0, yc=0, size=0.6, ratio=1.618) -> Distance:
+    """The distance to the edge of a rectangle.
+
+    The points with a negative distance are exactly those selected by
+    :class:`arlunio.shape.Rectangle` with the same attributes.
+
+    Attributes
+    ----------
+    xc:
+        The :math:`x`-coordinate of the rectangle's center.
+    yc:
+        The :math:`y`-coordinate of the rectangle's center.
+    size:
+        Controls the area of the rectangle.
+    ratio:
+        The ratio of the rectangle's width to its height.
+    """
+
+    xs = np.abs(math.compact(x) - xc)
+    ys = np.abs(math.compact(y) - yc)
+
+    height = np.sqrt(size / ratio)
+    width = height * ratio
+
+    return _box(xs, ys, width, height)
+
+
+@ar.definition(operation=ar.Defn.OP_ADD)
+def Union(
+    width: int,
+    height: int,
+    *,
+    a: ar.Defn[Distance] = None,
+    b: ar.Defn[Distance] = None,
+) -> Distance:
+    """The union of two shapes, produced by adding their definitions together.
+
+    A point is inside the union if it is inside either :code:`a` or :code:`b`, so its
+    distance is the smaller of the two.
+
+    Attributes
+    ----------
+    a:
+        The first shape
+    b:
+        The second shape
+
+    Example
+    -------
+    >>> from arlunio.sdf import Fill, Square
+    >>> shape = Square(xc=-0.5, size=0.25) + Square(xc=0.5, size=0.25)
+    >>> Fill(defn=shape)(width=5, height=5)
+    Mask([[False, False, False, False, False],
+          [False, False, False, False, False],
+          [False,  True, False,  True, False],
+          [False, False, False, False, False],
+          [False, False, False, False, False]])
+    """
+    a = a(width=width, height=height)
+    b = b(width=width, height=height)
+
+    return Distance(np.minimum(a, b))
+
+
+@ar.definition(operation=ar.Defn.OP_SUB)
+def Subtract(
+    width: int,
+    height: int,
+    *,
+    a: ar.Defn[Distance] = None,
+    b: ar.Defn[Distance] = None,
+) -> Distance:
+    """Remove one shape from another, produced by subtracting their definitions.
+
+    A point is inside the result if it is inside :code:`a` **and not** inside
+    :code:`b`.
+
+    Attributes
+    ----------
+    a:
+        The first "base" shape
+    b:
+        The shape that defines the region to remove from :code:`a`
+    """
+    a = a(width=width, height=height)
+    b = b(width=width, height=height)
+
+    return Distance(np.maximum(a, -b))
+
+
+@ar.definition(operation=ar.Defn.OP_MUL)
+def Intersect(
+    width: int,
+    height: int,
+    *,
+    a: ar.Defn[Distance] = None,
+    b: ar.Defn[Distance] = None,
+) -> Distance:
+    """The intersection of two shapes, produced by multiplying their definitions.
+
+    A point is inside the intersection if it is inside both :code:`a` and :code:`b`,
+    so its distance is the larger of the two.
+
+    Attributes
+    ----------
+    a:
+        The first shape
+    b:
+        The second shape
+    """
+    a = a(width=width, height=height)
+    b = b(width=width, height=height)
+
+    return Distance(np.maximum(a, b))
+
+
+@ar.definition
+def Fill(width: int, height: int, *, defn=None) -> mask.Mask:
+    """Select every point inside a shape.
+
+    Attributes
+    ----------
+    defn:
+        The distance field producing definition.
+
+    Example
+    -------
+    >>> from arlunio.sdf import Circle, Fill
+    >>> fill = Fill(defn=Circle(r=1))
+    >>> fill(width=5, height=5)
+    Mask([[False, False, False, False, False],
+          [False,  True,  True,  True, False],
+          [False,  True,  True,  True, False],
+          [False,  True,  True,  True, False],
+          [False, False, False, False, False]])
+    """
+
+    if defn is None:
+        raise ValueError("You must provide a distance field producing definition.")
+
+    return mask.Mask(defn(width=width, height=height) < 0)
+
+
+@ar.definition
+def Outline(width: int, height: int, *, defn=None, pt=0.01) -> mask.Mask:
+    """Select every point close to the edge of a shape.
+
+    Unlike the :code:`pt` attribute of the definitions in :mod:`arlunio.shape`, which
+    is relative to the size of the shape, the thickness of the outline here is the
+    same all the way around the shape, whatever its size.
+
+    Attributes
+    ----------
+    defn:
+        The distance field producing definition.
+    pt:
+        Every point within this distance of the edge will be selected.
+
+    Example
+    -------
+    >>> from arlunio.sdf import Outline, Square
+    >>> outline = Outline(defn=Square(size=0.5), pt=0.1)
+    >>> outline(width=5, height=5)
+    Mask([[False, False, False, False, False],
+          [False,  True,  True,  True, False],
+          [False,  True, False,  True, False],
+          [False,  True,  True,  True, False],
+          [False, False, False, False, False]])
+    """
+
+    if defn is None:
+        raise ValueError("You must provide a distance field producing definition.")
+
+    return mask.Mask(np.abs(defn(width=width, height=height)) < pt)
+
+
+@ar.definition
+def Coverage(
+    width: int, height: int, *, defn=None, scale=None, stretch=None
+) -> np.ndarray:
+    """Estimate how much of each pixel is covered by a shape, producing smooth edges.
+
+    .. arlunio-image:: SDF Coverage Demo
+       :align: right
+
+       ::
+
+          import arlunio.image as image
+          import arlunio.sdf as sdf
+
+          shape = sdf.Circle(r=0.6) - sdf.Square(size=0.3)
+          coverage = sdf.Coverage(defn=shape)
+          img = image.fill(coverage(width=256, height=256), background="white")
+
+    Since the distance from each pixel to the edge of the shape is already known, the
+    fraction of the pixel covered by the shape can be estimated directly by comparing
+    that distance to the size of the pixel. This produces an array of floats in the
+    range :math:`[0, 1]` that can be given to :func:`arlunio.image.fill` to draw the
+    shape with smooth edges, without the extra evaluations needed by
+    :class:`arlunio.mask.Coverage`.
+
+    Attributes
+    ----------
+    defn:
+        The distance field producing definition.
+    scale:
+        The :code:`scale` attribute of the :class:`arlunio.math.X` and
+        :class:`arlunio.math.Y` coordinates used by the shape. If not given, it is
+        taken from the shape if it has this attribute, otherwise it defaults to
+        :code:`1`.
+    stretch:
+        The :code:`stretch` attribute of the :class:`arlunio.math.X` and
+        :class:`arlunio.math.Y` coordinates used by the shape. If not given, it is
+        taken from the shape if it has this attribute, otherwise it defaults to
+        :code:`False`.
+
+    Example
+    -------
+    >>> from arlunio.sdf import Coverage, Square
+    >>> coverage = Coverage(defn=Square(size=0.5))
+    >>> coverage(width=5, height=5)
+    array([[0. , 0. , 0. , 0. , 0. ],
+           [0. , 0.5, 0.5, 0.5, 0. ],
+           [0. , 0.5, 1. , 0.5, 0. ],
+           [0. , 0.5, 0.5, 0.5, 0. ],
+           [0. , 0. , 0. , 0. , 0. ]])
+    """
+
+    if defn is None:
+        raise ValueError("You must provide a distance field producing definition.")
+
+    attributes = defn.attributes(inherited=True)
+    scale = _coordinate_attribute(attributes, "scale", scale, 1)
+    stretch = _coordinate_attribute(attributes, "stretch", stretch, False)
+
+    d = np.asarray(defn(width=width, height=height))
+    pixel = _pixel(width, height, scale, stretch)
+
+    return np.clip(0.5 - d / pixel, 0, 1)
@@ -5,7 +5,119 @@ import arlunio.mask as mask
 import arlunio.math as math
 
 
-@ar.definition
+def _window(shape, width, height, dx, dy, xc=None, yc=None):
+    """Return the region of pixels covered by a shape with the given extent around
+    its center."""
+
+    xc = shape.xc if xc is None else xc
+    yc = shape.yc if yc is None else yc
+
+    return math.window(
+        width,
+        height,
+        (xc - dx, xc + dx),
+        (yc - dy, yc + dy),
+        x0=shape.x0,
+        y0=shape.y0,
+        scale=shape.scale,
+        stretch=shape.stretch,
+    )
+
+
+def _outer(shape, size):
+    """Return the outer extent of a shape of the given size, taking its :code:`pt`
+    attribute into account."""
+    return abs(size) * (1 + abs(shape.pt or 0))
+
+
+_BLOCK_SIZE = 1024 * 1024
+"""The number of bytes of scratch space to use when evaluating a shape."""
+
+
+def _rowwise(kernel, *args) -> mask.Mask:
+    """Evaluate a shape a block of rows at a time.
+
+    Rather than creating a number of full size temporary arrays, allocate the output
+    mask up front and call :code:`kernel(out, scratch, *args)` for each block of rows,
+    where :code:`out` is the corresponding slice of the output and :code:`scratch` is
+    a float array of the same shape that the kernel is free to overwrite. Any
+    arguments that vary along the rows of the image are sliced to match.
+    """
+
+    shape = np.broadcast_shapes(*(np.shape(a) for a in args))
+    out = mask.Mask(np.empty(shape, dtype=bool))
+
+    if len(shape) < 2 or out.size == 0:
+        kernel(out, np.empty(shape), *args)
+        return out
+
+    height = shape[0]
+    rows = max(1, _BLOCK_SIZE // (8 * out[0].size))
+    scratch = np.empty((min(rows, height),) + shape[1:])
+
+    def block(arg, rows):
+        if np.ndim(arg) < len(shape) or np.shape(arg)[0] == 1:
+            return arg
+
+        return arg[rows]
+
+    for start in range(0, height, rows):
+        stop = min(start + rows, height)
+        rs = slice(start, stop)
+
+        kernel(out[rs], scratch[: stop - start], *[block(a, rs) for a in args])
+
+    return out
+
+
+def _between(out, values, inner, outer):
+    """Select the values that lie strictly between the given limits."""
+
+    np.less(values, outer, out=out)
+    out &= inner < values
+
+
+def _radius(out, scratch, x, y, r, pt):
+    """Select the points where :code:`sqrt(x + y)` is within the given radius."""
+
+    np.add(x, y, out=scratch)
+    np.sqrt(scratch, out=scratch)
+
+    if pt is None:
+        np.less(scratch, r, out=out)
+        return
+
+    _between(out, scratch, (1 - pt) * r, (1 + pt) * r)
+
+
+def _level(out, scratch, x, y, r, pt):
+    """Select the points where :code:`x + y` is less than the given level."""
+
+    np.add(x, y, out=scratch)
+
+    if pt is None:
+        np.less(scratch, r, out=out)
+        return
+
+    _between(out, scratch, (1 - pt) * r, (1 + pt) * r)
+
+
+def _box(out, scratch, xo, yo, xi, yi):
+    """Select the points inside the outer box but not the inner box, given which
+    coordinates lie within the extent of each."""
+
+    np.logical_and(xo, yo, out=out)
+
+    if xi is not None:
+        out &= ~np.logical_and(xi, yi)
+
+
+def _circle_bounds(circle, width, height):
+    r = _outer(circle, circle.r ** 2)
+    return _window(circle, width, height, r, r)
+
+
+@ar.definition(bounds=_circle_bounds)
 def Circle(x: math.X, y: math.Y, *, xc=0, yc=0, r=0.8, pt=None) -> mask.Mask:
     """
     .. arlunio-image:: Basic Circle
@@ -116,20 +228,160 @@ def Circle(x: math.X, y: math.Y, *, xc=0, yc=0, r=0.8, pt=None) -> mask.Mask:
           img = rings(width=1920, height=1080)
     """
 
-    x = (x - xc) ** 2
-    y = (y - yc) ** 2
-    circle = np.sqrt(x + y)
+    x = (math.compact(x) - xc) ** 2
+    y = (math.compact(y) - yc) ** 2
 
-    if pt is None:
-        return mask.Mask(circle < r ** 2)
+    return _rowwise(_radius, x, y, r ** 2, pt)
+
+
+_BIN_SIZE = 32
+"""The size of the blocks of pixels used when evaluating many shapes at once."""
+
+
+def _instances(xc, yc, r, pt):
+    """Broadcast the attributes of a collection of circles into 1D arrays."""
+
+    pt = 0 if pt is None else pt
+    values = [np.ravel(np.asarray(v, dtype=float)) for v in (xc, yc, r, pt)]
+
+    xc, yc, r, pt = np.broadcast_arrays(*values)
+    return xc, yc, r ** 2, pt
+
+
+def _circles_bounds(circles, width, height):
+    xc, yc, r, pt = _instances(circles.xc, circles.yc, circles.r, circles.pt)
+
+    if xc.size == 0:
+        return (0, 0, 0, 0)
+
+    extent = np.abs(r) * (1 + np.abs(pt))
+
+    x0, x1 = np.min(xc - extent), np.max(xc + extent)
+    y0, y1 = np.min(yc - extent), np.max(yc + extent)
+
+    xc, yc = (x0 + x1) / 2, (y0 + y1) / 2
+    return _window(circles, width, height, x1 - xc, y1 - yc, xc=xc, yc=yc)
+
+
+def _block(arg, rows, cols):
+    """Return the block of the given coordinates, taking broadcasting into account."""
+
+    rows = rows if arg.shape[0] > 1 else slice(None)
+    cols = cols if arg.shape[1] > 1 else slice(None)
+
+    return arg[rows, cols]
+
+
+@ar.definition(bounds=_circles_bounds)
+def Circles(x: math.X, y: math.Y, *, xc=0, yc=0, r=0.8, pt=None) -> mask.Mask:
+    """Many circles at once.
+
+    .. arlunio-image:: Circles Demo
+       :align: right
+
+       ::
+
+          import numpy as np
+
+          from arlunio.shape import Circles
+          from arlunio.image import fill
+
+          rng = np.random.default_rng(1234)
+          xc, yc = rng.uniform(-1, 1, size=(2, 500))
+          r = rng.uniform(0.1, 0.3, size=500)
+
+          circles = Circles(xc=xc, yc=yc, r=r, pt=0.1)
+          image = fill(circles(width=256, height=256))
+
+    Produces the same mask as adding together a :class:`Circle` for each of the
+    values given to the :code:`xc`, :code:`yc`, :code:`r` and :code:`pt` attributes,
+    which can be arrays of values or a single value shared by every circle.
+
+    Rather than testing every pixel against every circle, the image is divided into
+    small blocks of pixels and each block is only tested against the circles that
+    could overlap it. This makes it possible to draw many thousands of circles at a
+    time.
+
+    Attributes
+    ----------
+    xc:
+        The :math:`x`-coordinates of the circles' centers.
+    yc:
+        The :math:`y`-coordinates of the circles' centers.
+    r:
+        The radii of the circles.
+    pt:
+        If :code:`None`, then all points within the radius of each circle will be
+        considered to be part of it. Otherwise all points between radii
+        :code:`(1 - pt) * r` and :code:`(1 + pt) * r` will be considered part of the
+        circle.
+
+    Example
+    -------
+    >>> from arlunio.shape import Circles
+    >>> circles = Circles(xc=[-0.5, 0.5], yc=[0.5, -0.5], r=0.5)
+    >>> circles(width=5, height=5)
+    Mask([[False, False, False, False, False],
+          [False,  True, False, False, False],
+          [False, False, False, False, False],
+          [False, False, False,  True, False],
+          [False, False, False, False, False]])
+    """
+
+    outline = pt is not None
+    xc, yc, r, pt = _instances(xc, yc, r, pt)
+    extent = np.abs(r) * (1 + np.abs(pt))
+
+    x = math.compact(np.asarray(x))
+    y = math.compact(np.asarray(y))
+
+    height, width = np.broadcast_shapes(x.shape, y.shape)
+    out = mask.Mask(np.zeros((height, width), dtype=bool))
 
-    inner = (1 - pt) * r ** 2
-    outer = (1 + pt) * r ** 2
+    for i in range(0, height, _BIN_SIZE):
+        rows = slice(i, i + _BIN_SIZE)
 
-    return mask.all_(inner < circle, circle < outer)
+        # Only consider the circles that overlap this row of blocks.
+        ys = _block(y, rows, slice(None))
+        nearby = np.flatnonzero((yc - extent <= ys.max()) & (ys.min() <= yc + extent))
 
+        if nearby.size == 0:
+            continue
 
-@ar.definition
+        for j in range(0, width, _BIN_SIZE):
+            cols = slice(j, j + _BIN_SIZE)
+
+            xs, ys = _block(x, rows, cols), _block(y, rows, cols)
+            cx, cy, e = xc[nearby], yc[nearby], extent[nearby]
+
+            overlaps = (cx - e <= xs.max()) & (xs.min() <= cx + e)
+            overlaps &= (cy - e <= ys.max()) & (ys.min() <= cy + e)
+
+            candidates = nearby[overlaps]
+
+            # Test the candidates in batches to limit the size of the temporaries.
+            for k in range(0, candidates.size, _BIN_SIZE):
+                idx = candidates[k : k + _BIN_SIZE, np.newaxis, np.newaxis]
+                circle = np.sqrt((xs - xc[idx]) ** 2 + (ys - yc[idx]) ** 2)
+
+                if outline:
+                    inner = (1 - pt[idx]) * r[idx]
+                    outer = (1 + pt[idx]) * r[idx]
+                    selected = (inner < circle) & (circle < outer)
+                else:
+                    selected = circle < r[idx]
+
+                out[rows, cols] |= selected.any(axis=0)
+
+    return out
+
+
+def _ellipse_bounds(ellipse, width, height):
+    r = _outer(ellipse, ellipse.r ** 2)
+    return _window(ellipse, width, height, abs(ellipse.a) * r, abs(ellipse.b) * r)
+
+
+@ar.definition(bounds=_ellipse_bounds)
 def Ellipse(x: math.X, y: math.Y, *, xc=0, yc=0, a=2, b=1, r=0.8, pt=None) -> mask.Mask:
     """
     .. arlunio-image:: Simple Ellipse
@@ -249,24 +501,30 @@ def Ellipse(x: math.X, y: math.Y, *, xc=0, yc=0, a=2, b=1, r=0.8, pt=None) -> ma
           img = atom(width=1920, height=1080)
     """
 
-    x = (x - xc) ** 2
-    y = (y - yc) ** 2
+    x = (math.compact(x) - xc) ** 2
+    y = (math.compact(y) - yc) ** 2
 
     a = a ** 2
     b = b ** 2
 
-    ellipse = np.sqrt(x / a + y / b)
+    return _rowwise(_radius, x / a, y / b, r ** 2, pt)
 
-    if pt is None:
-        return mask.Mask(ellipse < r * r)
 
-    inner = (1 - pt) * r ** 2
-    outer = (1 + pt) * r ** 2
+def _superellipse_bounds(ellipse, width, height):
+    n = ellipse.n
+    m = n if ellipse.m is None else ellipse.m
+
+    if n <= 0 or m <= 0:
+        return None
+
+    r = _outer(ellipse, ellipse.r)
+    dx = abs(ellipse.a) * r ** (1 / n)
+    dy = abs(ellipse.b) * r ** (1 / m)
 
-    return mask.all_(inner < ellipse, ellipse < outer)
+    return _window(ellipse, width, height, dx, dy)
 
 
-@ar.definition
+@ar.definition(bounds=_superellipse_bounds)
 def SuperEllipse(
     x: math.X, y: math.Y, *, xc=0, yc=0, a=1, b=1, n=3, r=0.8, m=None, pt=None
 ) -> mask.Mask:
@@ -397,24 +655,21 @@ def SuperEllipse(
 
     """
 
-    x = x - xc
-    y = y - yc
+    x = math.compact(x) - xc
+    y = math.compact(y) - yc
 
     if m is None:
         m = n
 
-    ellipse = np.abs(x / a) ** n + np.abs(y / b) ** m
-
-    if pt is None:
-        return mask.Mask(ellipse < r)
+    return _rowwise(_level, np.abs(x / a) ** n, np.abs(y / b) ** m, r, pt)
 
-    inner = (1 - pt) * r
-    outer = (1 + pt) * r
 
-    return mask.all_(inner < ellipse, ellipse < outer)
+def _square_bounds(square, width, height):
+    size = _outer(square, square.size)
+    return _window(square, width, height, size, size)
 
 
-@ar.definition
+@ar.definition(bounds=_square_bounds)
 def Square(x: math.X, y: math.Y, *, xc=0, yc=0, size=0.8, pt=None) -> mask.Mask:
     """
     .. arlunio-image:: Simple Square
@@ -479,22 +734,26 @@ def Square(x: math.X, y: math.Y, *, xc=0, yc=0, size=0.8, pt=None) -> mask.Mask:
           img = square(width=1920, height=1080)
     """
 
-    xs = np.abs(x - xc)
-    ys = np.abs(y - yc)
+    xs = np.abs(math.compact(x) - xc)
+    ys = np.abs(math.compact(y) - yc)
 
     if pt is None:
-        return mask.all_(xs < size, ys < size)
+        return _rowwise(_box, xs < size, ys < size, None, None)
 
     s = (1 - pt) * size
     S = (1 + pt) * size
 
-    inner = mask.all_(xs < s, ys < s)
-    outer = mask.all_(xs < S, ys < S)
+    return _rowwise(_box, xs < S, ys < S, xs < s, ys < s)
 
-    return outer - inner
 
+def _rectangle_bounds(rect, width, height):
+    h = np.sqrt(abs(rect.size / rect.ratio))
+    w = h * abs(rect.ratio)
 
-@ar.definition
+    return _window(rect, width, height, _outer(rect, w), _outer(rect, h))
+
+
+@ar.definition(bounds=_rectangle_bounds)
 def Rectangle(
     x: math.X, y: math.Y, *, xc=0, yc=0, size=0.6, ratio=1.618, pt=None
 ) -> mask.Mask:
@@ -557,25 +816,32 @@ def Rectangle(
           image = demo(width=1920, height=1080)
     """
 
-    xs = np.abs(x - xc)
-    ys = np.abs(y - yc)
+    xs = np.abs(math.compact(x) - xc)
+    ys = np.abs(math.compact(y) - yc)
 
     height = np.sqrt(size / ratio)
     width = height * ratio
 
     if pt is None:
-        return mask.all_(xs < width, ys < height)
+        return _rowwise(_box, xs < width, ys < height, None, None)
 
     w, W = (1 - pt) * width, (1 + pt) * width
     h, H = (1 - pt) * height, (1 + pt) * height
 
-    inner = mask.all_(xs < w, ys < h)
-    outer = mask.all_(xs < W, ys < H)
+    return _rowwise(_box, xs < W, ys < H, xs < w, ys < h)
+
+
+def _triangle_bounds(tri, width, height):
+    xs = [p[0] for p in (tri.a, tri.b, tri.c)]
+    ys = [p[1] for p in (tri.a, tri.b, tri.c)]
+
+    xc, yc = (min(xs) + max(xs)) / 2, (min(ys) + max(ys)) / 2
+    dx, dy = (max(xs) - min(xs)) / 2, (max(ys) - min(ys)) / 2
 
-    return outer - inner
+    return _window(tri, width, height, dx, dy, xc=xc, yc=yc)
 
 
-@ar.definition
+@ar.definition(bounds=_triangle_bounds)
 def Triangle(p: math.Barycentric) -> mask.Mask:
     """A triangle.
 
@@ -597,3 +863,189 @@ def Triangle(p: math.Barycentric) -> mask.Mask:
     l3 = p[:, :, 2]
 
     return mask.all_(0 < l1, l1 < 1, 0 < l2, l2 < 1, 0 < l3, l3 < 1)
+
+
+def _edges(points):
+    """Return the start and end points of each non-horizontal edge of a polygon."""
+
+    p0 = np.asarray(points, dtype=float).reshape(-1, 2)
+    p1 = np.roll(p0, -1, axis=0)
+
+    keep = p0[:, 1] != p1[:, 1]
+    return p0[keep].T, p1[keep].T
+
+
+def _is_convex(points) -> bool:
+    """Return :code:`True` if the given points describe a simple, convex polygon."""
+
+    p0 = np.asarray(points, dtype=float).reshape(-1, 2)
+
+    e0 = np.roll(p0, -1, axis=0) - p0
+    e1 = np.roll(e0, -1, axis=0)
+
+    cross = e0[:, 0] * e1[:, 1] - e0[:, 1] * e1[:, 0]
+    dot = (e0 * e1).sum(axis=1)
+
+    turns = cross[cross != 0]
+
+    if len(p0) < 3 or not ((turns > 0).all() or (turns < 0).all()):
+        return False
+
+    # Turning the same way at every corner is not enough, a polygon that revisits a
+    # vertex or doubles back along an edge can also do that...
+    if len(np.unique(p0, axis=0)) != len(p0) or (dot[cross == 0] <= 0).any():
+        return False
+
+    # ...as can a star.
+    return bool(np.isclose(abs(np.arctan2(cross, dot).sum()), 2 * np.pi))
+
+
+def _at_most_two(row, height) -> bool:
+    """Return :code:`True` if every row is crossed by either none or exactly two of a
+    polygon's edges."""
+
+    counts = np.bincount(row, minlength=height)
+    return bool(((counts == 0) | (counts == 2)).all())
+
+
+def _crossing(x0, y0, x1, y1, y):
+    """Return the :math:`x`-coordinate at which the given edges cross the given
+    horizontal line(s)."""
+    return x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+
+
+def _polygon_bounds(poly, width, height):
+    points = np.asarray(poly.points, dtype=float).reshape(-1, 2)
+
+    if len(points) == 0:
+        return (0, 0, 0, 0)
+
+    (x0, y0), (x1, y1) = points.min(axis=0), points.max(axis=0)
+    xc, yc = (x0 + x1) / 2, (y0 + y1) / 2
+
+    return _window(poly, width, height, x1 - xc, y1 - yc, xc=xc, yc=yc)
+
+
+@ar.definition(bounds=_polygon_bounds)
+def Polygon(
+    x: math.X,
+    y: math.Y,
+    *,
+    points=((0.5, -0.5), (0, 0.5), (-0.5, -0.5)),
+    rule="evenodd",
+) -> mask.Mask:
+    """A polygon.
+
+    .. arlunio-image:: Polygon Demo
+       :align: right
+
+       ::
+
+          import numpy as np
+
+          from arlunio.shape import Polygon
+          from arlunio.image import fill
+
+          t = np.linspace(0, 4 * np.pi, 5, endpoint=False) + np.pi / 2
+          star = Polygon(points=np.stack([np.cos(t), np.sin(t)], axis=1))
+          image = fill(star(width=256, height=256))
+
+    The polygon is described by a list of :code:`(x, y)` points with an edge between
+    each pair of consecutive points and between the last point and the first. The
+    polygon can be convex or concave and its edges are allowed to cross each other, in
+    which case the :code:`rule` attribute decides which regions are inside the
+    polygon.
+
+    Rather than testing each pixel against each edge of the polygon, the image is
+    processed one row of pixels at a time. The points at which the edges cross each
+    row are found and every pixel between a pair of crossings is filled in, making the
+    cost of drawing a polygon largely independent of the number of edges. Convex
+    polygons cross each row at most twice and are handled even more cheaply.
+
+    .. note::
+
+       Rows are only used when the :math:`x` coordinates increase along each row and
+       the :math:`y` coordinates only vary between rows, as is the case with the
+       coordinates produced by :class:`arlunio.math.X` and :class:`arlunio.math.Y`.
+       Otherwise each pixel is tested against each edge of the polygon.
+
+    Attributes
+    ----------
+    points:
+        The points describing the polygon.
+    rule:
+        How to decide if a point is inside the polygon when its edges cross. With
+        :code:`"evenodd"` (default) a point is inside if a line from the point out
+        to infinity crosses the polygon's edges an odd number of times. With
+        :code:`"nonzero"` a point is inside if the polygon's edges wind around the
+        point a non-zero number of times.
+
+    Example
+    -------
+    >>> from arlunio.shape import Polygon
+    >>> diamond = Polygon(points=[(0, 0.8), (0.8, 0), (0, -0.8), (-0.8, 0)])
+    >>> diamond(width=5, height=5)
+    Mask([[False, False, False, False, False],
+          [False, False,  True, False, False],
+          [False,  True,  True,  True, False],
+          [False, False,  True, False, False],
+          [False, False, False, False, False]])
+    """
+
+    if rule not in {"evenodd", "nonzero"}:
+        raise ValueError(f"Unknown fill rule: {rule!r}")
+
+    x = math.compact(np.asarray(x))
+    y = math.compact(np.asarray(y))
+
+    height, width = np.broadcast_shapes(x.shape, y.shape)
+    (x0, y0), (x1, y1) = _edges(points)
+
+    # Each edge covers the half open range of rows between its end points, and winds
+    # around the points to its left either upwards or downwards.
+    winding = np.where(y1 > y0, 1, -1) if rule == "nonzero" else np.ones(len(y0), int)
+
+    xs, ys = x.reshape(-1), y.reshape(-1)
+    rows = x.shape == (1, width) and y.shape == (height, 1)
+
+    if not rows or (width > 1 and not (np.diff(xs) > 0).all()):
+        inside = np.zeros((height, width), dtype=int)
+
+        for e in range(len(x0)):
+            crosses = (y0[e] <= y) != (y1[e] <= y)
+            crosses &= x < _crossing(x0[e], y0[e], x1[e], y1[e], y)
+
+            inside += np.where(crosses, winding[e], 0)
+
+        inside = inside if rule == "nonzero" else inside % 2
+        return mask.Mask(inside != 0)
+
+    row, edge = np.nonzero((y0 <= ys[:, None]) != (y1 <= ys[:, None]))
+    cx = _crossing(x0[edge], y0[edge], x1[edge], y1[edge], ys[row])
+
+    # When each row crosses the polygon's edges at most twice, the inside of each row
+    # is the single span between the crossings, whichever fill rule is used.
+    if _is_convex(points) or _at_most_two(row, height):
+        lo = np.full(height, np.inf)
+        hi = np.full(height, -np.inf)
+
+        np.minimum.at(lo, row, cx)
+        np.maximum.at(hi, row, cx)
+
+        return mask.Mask((lo[:, None] <= x) & (x < hi[:, None]))
+
+    # Every pixel to the left of a crossing is wound around by its edge, so start each
+    # row with the total and subtract each edge's winding from where it crosses.
+    col = np.searchsorted(xs, cx, side="left")
+    delta = np.zeros((height, width + 1), dtype=np.int32)
+
+    np.add.at(delta, (row, col), -winding[edge])
+    np.add.at(delta, (row, 0), winding[edge])
+    np.cumsum(delta, axis=1, out=delta)
+
+    inside = delta[:, :width]
+
+    if rule == "evenodd":
+        inside &= 1
+
+    return mask.Mask(inside != 0)
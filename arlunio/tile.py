@@ -0,0 +1,469 @@
+"""Evaluating definitions one region of an image at a time."""
+import concurrent.futures as futures
+import logging
+import os
+import threading
+from typing import Iterator
+from typing import Optional
+from typing import Tuple
+
+import attr
+import numpy as np
+
+import arlunio as ar
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # pragma: no cover
+    shared_memory = None
+
+logger = logging.getLogger(__name__)
+
+
+class _Stack(threading.local):
+    """Per-thread record of the state to restore as each viewport is exited."""
+
+    def __init__(self):
+        self.items = []
+
+
+_STACK = _Stack()
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class Viewport:
+    """Describes the region of an image that is currently being evaluated.
+
+    Normally the :code:`width` and :code:`height` inputs given to a definition describe
+    the size of the entire image. However while a viewport is active they instead
+    describe the size of a region within a larger image, whose top left corner is
+    found at :code:`(x, y)`. Definitions that produce coordinates such as
+    :class:`arlunio.math.X` and :class:`arlunio.math.Y` take the viewport into account
+    so that the values they produce match the corresponding region of the full image.
+
+    Viewports are activated using a :code:`with` statement
+
+    >>> import arlunio.math as math
+    >>> from arlunio.tile import Viewport
+    >>> x = math.X()
+    >>> with Viewport(width=4, height=4, x=2, y=1):
+    ...     x(width=2, height=2)
+    array([[0.33333333, 1.        ],
+           [0.33333333, 1.        ]])
+    """
+
+    width: int
+    """The width of the full image."""
+
+    height: int
+    """The height of the full image."""
+
+    x: int = 0
+    """The column in the full image where the region begins."""
+
+    y: int = 0
+    """The row in the full image where the region begins."""
+
+    def __enter__(self):
+        state = ar._STATE
+        _STACK.items.append((state.viewport, state.evaluation))
+
+        # Results computed for one region are not valid for any other so each region
+        # is given an evaluation of its own.
+        state.viewport, state.evaluation = self, None
+
+        return self
+
+    def __exit__(self, *args):
+        state = ar._STATE
+        state.viewport, state.evaluation = _STACK.items.pop()
+
+    @classmethod
+    def current(cls, width: int, height: int) -> "Viewport":
+        """Return the active viewport.
+
+        If no viewport is active, return a viewport covering an image with the given
+        :code:`width` and :code:`height`.
+        """
+
+        viewport = ar._STATE.viewport
+
+        if viewport is None:
+            return cls(width=width, height=height)
+
+        return viewport
+
+    def region(self, x: int, y: int) -> "Viewport":
+        """Return a viewport for the region offset by :code:`(x, y)` from the region
+        described by this viewport."""
+        return Viewport(
+            width=self.width, height=self.height, x=self.x + x, y=self.y + y
+        )
+
+
+def tiles(width: int, height: int, size) -> Iterator[Tuple[int, int, int, int]]:
+    """Divide an image into tiles.
+
+    Tiles are returned row by row as tuples of the form :code:`(x, y, width, height)`
+    any tiles along the right and bottom edges of the image will be smaller if the
+    tile size does not divide the image cleanly.
+
+    Parameters
+    ----------
+    width:
+        The width of the image
+    height:
+        The height of the image
+    size:
+        The size of each tile, either a single number for square tiles or a
+        :code:`(width, height)` tuple.
+
+    Example
+    -------
+    >>> from arlunio.tile import tiles
+    >>> list(tiles(5, 4, 3))
+    [(0, 0, 3, 3), (3, 0, 2, 3), (0, 3, 3, 1), (3, 3, 2, 1)]
+    """
+
+    tw, th = (size, size) if isinstance(size, int) else size
+
+    if tw < 1 or th < 1:
+        raise ValueError(f"Invalid tile size: {size}")
+
+    for y in range(0, height, th):
+        for x in range(0, width, tw):
+            yield x, y, min(tw, width - x), min(th, height - y)
+
+
+class _SharedBuffer:
+    """A block of shared memory that numpy arrays can be created on top of.
+
+    The block is kept alive for as long as any array that uses it, and is released
+    once the last of them is garbage collected.
+    """
+
+    def __init__(self, shape, dtype):
+        dtype = np.dtype(dtype)
+        size = max(int(np.prod(shape)) * dtype.itemsize, 1)
+
+        self.block = shared_memory.SharedMemory(create=True, size=size)
+        address = np.frombuffer(self.block.buf, dtype=np.uint8).ctypes.data
+
+        self.__array_interface__ = {
+            "shape": tuple(shape),
+            "typestr": dtype.str,
+            "descr": dtype.descr,
+            "data": (address, False),
+            "version": 3,
+        }
+
+    @property
+    def name(self) -> str:
+        return self.block.name
+
+    def unlink(self):
+        """Remove the block's name, so that no other process can attach to it."""
+        self.block.unlink()
+
+    def __del__(self):
+        self.block.close()
+
+
+def allocate(tile: np.ndarray, width: int, height: int, *, shared=False) -> np.ndarray:
+    """Allocate an array large enough to hold the full image that the given tile is
+    part of.
+
+    The array will have the same dtype as the tile, and will be of the same type if
+    the tile is a subclass of :code:`numpy.ndarray` such as a
+    :class:`arlunio.mask.Mask`. If :code:`shared` is :code:`True` the array is
+    created in a block of shared memory that worker processes can write into.
+    """
+
+    tile = np.asanyarray(tile)
+    shape = (height, width) + tile.shape[2:]
+
+    if shared:
+        out = np.asarray(_SharedBuffer(shape, tile.dtype))
+        out[...] = 0
+    else:
+        out = np.zeros(shape, dtype=tile.dtype)
+
+    if type(tile) is not np.ndarray:
+        out = out.view(type(tile))
+
+    return out
+
+
+def _shared_buffer(array: np.ndarray) -> _SharedBuffer:
+    """Find the shared memory block that the given array was allocated in."""
+
+    base = array
+
+    while not isinstance(base, _SharedBuffer):
+        base = base.base
+
+    return base
+
+
+@ar.definition
+def Tiled(width: int, height: int, *, defn=None, size=512, out=None):
+    """Evaluate a definition one tile at a time.
+
+    When evaluated, this will divide the image into tiles and evaluate the definition
+    given by the :code:`defn` attribute for each tile in turn, copying the result into
+    place in the final output. Since only one tile is evaluated at a time, any
+    intermediate arrays the definition creates are limited to the size of a single
+    tile. This makes it possible to evaluate definitions at resolutions where
+    evaluating them in one go would run out of memory.
+
+    The given definition must only take :code:`width` and :code:`height` as inputs and
+    it must produce arrays whose first two dimensions correspond to the height and
+    width of the image. Any definition that derives its output from
+    :class:`arlunio.math.X` and :class:`arlunio.math.Y` such as those found in
+    :mod:`arlunio.shape` will produce identical results whether or not they are
+    evaluated in tiles.
+
+    .. note::
+
+       Definitions such as :class:`arlunio.mask.Repeat` which use the :code:`width`
+       and :code:`height` inputs to decide on the layout of their output will not
+       produce the same results when evaluated in tiles.
+
+    Attributes
+    ----------
+    defn:
+        The definition to evaluate
+    size:
+        The size of each tile, either a single number for square tiles or a
+        :code:`(width, height)` tuple.
+    out:
+        If given, the array to write the result into. Otherwise a new array will be
+        allocated based on the result of evaluating the first tile.
+
+    Example
+    -------
+    >>> import numpy as np
+    >>> import arlunio.shape as shape
+    >>> from arlunio.tile import Tiled
+    >>> circle = shape.Circle()
+    >>> tiled = Tiled(defn=circle, size=64)
+    >>> np.array_equal(tiled(width=300, height=200), circle(width=300, height=200))
+    True
+    """
+
+    if defn is None:
+        raise ValueError("You must provide a definition to evaluate.")
+
+    viewport = Viewport.current(width, height)
+
+    for x, y, w, h in tiles(width, height, size):
+        logger.debug("Evaluating tile: (%s, %s, %s, %s)", x, y, w, h)
+
+        with viewport.region(x, y):
+            result = defn(width=w, height=h)
+
+        if out is None:
+            out = allocate(result, width, height)
+
+        out[y : y + h, x : x + w] = result
+
+    return out
+
+
+def _evaluate_tile(defn, viewport, width, height, buffer=None):
+    """Evaluate a single tile in a worker.
+
+    If :code:`buffer` is given it should be a tuple of the form
+    :code:`(name, shape, dtype, x, y)` describing the shared memory block to write the
+    result into and the position within it to write to. Otherwise the result is
+    returned.
+    """
+
+    with viewport:
+        result = defn(width=width, height=height)
+
+    if buffer is None:
+        return result
+
+    name, shape, dtype, x, y = buffer
+    block = shared_memory.SharedMemory(name=name)
+
+    try:
+        out = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        out[y : y + height, x : x + width] = result
+        del out
+    finally:
+        block.close()
+
+
+class Evaluator:
+    """Evaluate definitions tile by tile, in parallel.
+
+    The tiles of the image are shared out across a pool of workers from the
+    :mod:`python:concurrent.futures` module. By default a pool of processes is used
+    with each worker writing its results directly into the shared memory block that
+    holds the output, which requires the definition to be picklable. Definitions that
+    are created at the top level of a module, along with any combination of them, are
+    picklable.
+
+    Alternatively a pool of threads can be used, this works with any definition but
+    will only be of benefit if the definition spends most of its time in numpy
+    functions that release the GIL.
+
+    The same restrictions that apply to :class:`Tiled` also apply here. Definitions
+    must only take :code:`width` and :code:`height` as inputs and should derive their
+    output from the :class:`arlunio.math.X` and :class:`arlunio.math.Y` coordinates.
+
+    The pool of workers is created on first use and can be reused across multiple
+    evaluations by using the evaluator as a context manager, otherwise it is shut down
+    after each evaluation.
+
+    Parameters
+    ----------
+    size:
+        The size of each tile, either a single number for square tiles or a
+        :code:`(width, height)` tuple.
+    workers:
+        The number of workers to use, defaults to the number of CPUs available.
+    threads:
+        If :code:`True`, use a pool of threads instead of processes.
+
+    Example
+    -------
+    >>> import numpy as np
+    >>> import arlunio.shape as shape
+    >>> from arlunio.tile import Evaluator
+    >>> circle = shape.Circle() - shape.Square(size=0.4)
+    >>> with Evaluator(size=64, workers=2) as evaluator:
+    ...     result = evaluator.evaluate(circle, width=300, height=200)
+    >>> np.array_equal(result, circle(width=300, height=200))
+    True
+    """
+
+    def __init__(self, *, size=512, workers: Optional[int] = None, threads=False):
+        self.size = size
+        self.workers = workers if workers is not None else os.cpu_count()
+        self.threads = threads
+
+        self._pool = None
+        self._managed = False
+
+    def __enter__(self):
+        self._managed = True
+        return self
+
+    def __exit__(self, *args):
+        self._managed = False
+        self.shutdown()
+
+    @property
+    def pool(self) -> futures.Executor:
+        """The pool of workers used to evaluate tiles."""
+
+        if self._pool is None:
+            cls = (
+                futures.ThreadPoolExecutor
+                if self.threads
+                else futures.ProcessPoolExecutor
+            )
+            self._pool = cls(max_workers=self.workers)
+
+        return self._pool
+
+    def shutdown(self):
+        """Shut down the pool of workers."""
+
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def evaluate(self, defn: ar.Defn, *, width: int, height: int) -> np.ndarray:
+        """Evaluate the given definition.
+
+        Parameters
+        ----------
+        defn:
+            The definition to evaluate
+        width:
+            The width of the image to produce
+        height:
+            The height of the image to produce
+        """
+
+        viewport = Viewport.current(width, height)
+        regions = list(tiles(width, height, self.size))
+
+        # Evaluate the first tile here, so that we know what the output looks like.
+        x, y, w, h = regions[0]
+
+        with viewport.region(x, y):
+            first = defn(width=w, height=h)
+
+        shared = not self.threads and shared_memory is not None
+        out = allocate(first, width, height, shared=shared)
+        out[y : y + h, x : x + w] = first
+
+        try:
+            if self.threads:
+                self._evaluate_threads(defn, viewport, regions[1:], out)
+
+            elif shared_memory is not None:
+                self._evaluate_shared(defn, viewport, regions[1:], out)
+
+            else:  # pragma: no cover
+                self._evaluate_returned(defn, viewport, regions[1:], out)
+
+        finally:
+            if not self._managed:
+                self.shutdown()
+
+        return out
+
+    def _evaluate_threads(self, defn, viewport, regions, out):
+        """Evaluate tiles with threads, writing directly into the output."""
+
+        def evaluate(x, y, w, h):
+            out[y : y + h, x : x + w] = _evaluate_tile(
+                defn, viewport.region(x, y), w, h
+            )
+
+        jobs = [self.pool.submit(evaluate, *region) for region in regions]
+
+        for job in futures.as_completed(jobs):
+            job.result()
+
+    def _evaluate_shared(self, defn, viewport, regions, out):
+        """Evaluate tiles with processes, writing directly into the output's shared
+        memory block."""
+
+        buffer = _shared_buffer(out)
+
+        try:
+            jobs = []
+
+            for x, y, w, h in regions:
+                args = (buffer.name, out.shape, out.dtype, x, y)
+                region = viewport.region(x, y)
+
+                jobs.append(self.pool.submit(_evaluate_tile, defn, region, w, h, args))
+
+            for job in futures.as_completed(jobs):
+                job.result()
+
+        finally:
+            buffer.unlink()
+
+    def _evaluate_returned(self, defn, viewport, regions, out):  # pragma: no cover
+        """Evaluate tiles with processes, copying each result into the output."""
+
+        jobs = {
+            self.pool.submit(_evaluate_tile, defn, viewport.region(x, y), w, h): (x, y)
+            for x, y, w, h in regions
+        }
+
+        for job in futures.as_completed(jobs):
+            x, y = jobs[job]
+            result = job.result()
+            h, w = result.shape[:2]
+
+            out[y : y + h, x : x + w] = result
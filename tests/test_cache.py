@@ -0,0 +1,184 @@
+import numpy as np
+import py.test
+
+import arlunio as ar
+import arlunio.math as math
+import arlunio.shape as shape
+from arlunio.cache import Cache
+from arlunio.cache import CACHE
+from arlunio.cache import nbytes
+from arlunio.tile import Tiled
+from arlunio.tile import Viewport
+
+
+@py.test.fixture
+def cache():
+    """Ensure that each test starts with an empty cache."""
+
+    CACHE.clear()
+    yield CACHE
+    CACHE.clear()
+
+
+def test_nbytes_ignores_repeated_values():
+    """Ensure that values repeated by broadcasting are only counted once."""
+
+    assert nbytes(np.zeros((4, 8))) == 256
+    assert nbytes(np.broadcast_to(np.zeros((4, 1)), (4, 8))) == 32
+    assert nbytes(np.zeros((0, 8))) == 0
+
+
+def test_cache_evicts_least_recently_used():
+    """Ensure that once full, the least recently used results are discarded."""
+
+    cache = Cache(maxbytes=256)
+
+    for key in "ab":
+        cache.put(key, np.zeros(16))
+
+    assert cache.get("a") is not None
+
+    cache.put("c", np.zeros(16))
+
+    assert "b" not in cache
+    assert "a" in cache
+    assert len(cache) == 2
+    assert cache.nbytes == 256
+
+
+def test_cache_ignores_unsuitable_values():
+    """Ensure that anything other than an array that fits in the cache is ignored."""
+
+    cache = Cache(maxbytes=64)
+
+    cache.put("a", 1)
+    cache.put("b", np.zeros(16))
+
+    assert len(cache) == 0
+
+
+def test_cache_counts_hits_and_misses():
+    """Ensure that we keep track of how often results are found in the cache."""
+
+    cache = Cache()
+    cache.put("a", np.zeros(4))
+
+    cache.get("a")
+    cache.get("a")
+    cache.get("b")
+
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_cached_results_are_private(cache):
+    """Ensure that results shared through the cache can be modified without affecting
+    anyone else."""
+
+    r1 = math.R()(width=16, height=8)
+    expected = r1.copy()
+    r1 -= 1
+
+    r2 = math.R()(width=16, height=8)
+    r2 *= 2
+
+    r3 = math.R()(width=16, height=8)
+
+    assert cache.hits == 2
+    assert r2 is not r3
+    assert (r3 == expected).all()
+
+
+def test_cache_shares_readonly_results(cache):
+    """Ensure that results which are read-only to begin with are shared without
+    copying."""
+
+    x1 = math.X()(width=16, height=8)
+    x2 = math.X()(width=16, height=8)
+
+    assert x1 is x2
+    assert not x1.flags.writeable
+
+
+def test_cache_key_includes_attributes(cache):
+    """Ensure that changing an attribute produces a new result."""
+
+    r1 = math.R()(width=16, height=8)
+    r2 = math.R(scale=2)(width=16, height=8)
+
+    assert r1 is not r2
+    assert (r2 == 2 * r1).all()
+
+
+def test_cache_key_includes_viewport(cache):
+    """Ensure that results computed for one region of an image are not used for
+    another."""
+
+    x = math.X()
+
+    with Viewport(width=8, height=8, x=0):
+        left = x(width=4, height=4)
+
+    with Viewport(width=8, height=8, x=4):
+        right = x(width=4, height=4)
+
+    assert (left < 0).all()
+    assert (right > 0).all()
+
+
+def test_cache_ignores_unrelated_inputs(cache):
+    """Ensure that inputs a definition does not depend on are not part of the key."""
+
+    x = math.X()
+
+    x1 = x(width=4, height=4)
+    x2 = x(width=4, height=4, other=np.zeros(3))
+
+    assert x1 is x2
+
+
+def test_cache_skipped_for_array_inputs(cache):
+    """Ensure that definitions evaluated with arrays as inputs are not cached."""
+
+    x = np.broadcast_to(np.linspace(-1, 1, 8), (8, 8))
+    y = x.transpose()
+
+    math.R()(x=x, y=y)
+
+    assert len(cache) == 0
+
+
+def test_cache_reused_across_images(cache):
+    """Ensure that repeatedly rendering a scene reuses the coordinate grids."""
+
+    scene = shape.Circle() + shape.Square(size=0.2)
+    expected = scene(width=64, height=48)
+
+    misses = cache.misses
+    actual = scene(width=64, height=48)
+
+    assert cache.misses == misses
+    assert cache.hits > 0
+    assert (actual == expected).all()
+
+
+def test_cache_with_tiles(cache):
+    """Ensure that cached results are consistent when evaluating in tiles."""
+
+    r = math.R()
+    tiled = Tiled(defn=r, size=5)
+
+    expected = r(width=13, height=11)
+
+    assert (tiled(width=13, height=11) == expected).all()
+    assert (tiled(width=13, height=11) == expected).all()
+
+
+def test_cache_not_used_by_default(cache):
+    """Ensure that definitions are only cached when asked for."""
+
+    @ar.definition
+    def Double(x: math.X):
+        return 2 * x
+
+    Double()(width=4, height=4)
+    assert len(cache) == 1
@@ -1,5 +1,6 @@
 from typing import Any
 
+import numpy as np
 import py.test
 
 import arlunio as ar
@@ -492,3 +493,175 @@ def test_definition_operator_existing_definition():
             pass
 
     assert "has already been defined" in str(err.value)
+
+
+class TestDefinitionEvaluation:
+    """Tests relating to how a tree of definitions is evaluated."""
+
+    def test_shared_bases_evaluated_once(self):
+        """Ensure that a base definition shared by several parts of an evaluation is
+        only evaluated once."""
+
+        calls = []
+
+        @ar.definition
+        def Counter(width: int, height: int, *, offset=0):
+            calls.append(offset)
+            return np.full((height, width), offset)
+
+        @ar.definition
+        def Left(c: Counter):
+            return c
+
+        @ar.definition
+        def Right(c: Counter):
+            return c
+
+        @ar.definition
+        def Both(width: int, height: int, *, left=None, right=None):
+            return left(width=width, height=height) + right(width=width, height=height)
+
+        both = Both(left=Left(offset=1), right=Right(offset=1))
+        assert (both(width=2, height=2) == 2).all()
+        assert calls == [1]
+
+        both = Both(left=Left(offset=1), right=Right(offset=2))
+        assert (both(width=2, height=2) == 3).all()
+        assert calls == [1, 1, 2]
+
+    def test_shared_bases_distinguish_inputs(self):
+        """Ensure that bases evaluated with different inputs are not shared."""
+
+        calls = []
+
+        @ar.definition
+        def Counter(width: int, height: int):
+            calls.append((width, height))
+            return width * height
+
+        @ar.definition
+        def Area(c: Counter):
+            return c
+
+        @ar.definition
+        def Total(width: int, height: int, *, area=None):
+            return area(width=width, height=height) + area(width=height, height=1)
+
+        total = Total(area=Area())
+        assert total(width=2, height=3) == 9
+        assert calls == [(2, 3), (3, 1)]
+
+    def test_shared_bases_can_be_modified(self):
+        """Ensure that a definition may modify the result of a shared base in place,
+        without affecting anyone else it is shared with."""
+
+        calls = []
+
+        @ar.definition
+        def Grid(width: int, height: int):
+            calls.append((width, height))
+            return np.zeros((height, width))
+
+        @ar.definition
+        def Modify(g: Grid):
+            g += 1
+            return g
+
+        @ar.definition
+        def Keep(g: Grid):
+            return g
+
+        @ar.definition
+        def Both(width: int, height: int, *, a=None, b=None):
+            return a(width=width, height=height), b(width=width, height=height)
+
+        modified, kept = Both(a=Modify(), b=Keep())(width=2, height=2)
+
+        assert calls == [(2, 2)]
+        assert (modified == 1).all()
+        assert (kept == 0).all()
+
+
+class TestDefinitionPlan:
+    """Tests relating to the plan compiled for evaluating each definition."""
+
+    @py.test.fixture
+    def defns(self):
+        @ar.definition
+        def Base(width: int, height: int, *, a=1):
+            return np.full((height, width), a)
+
+        @ar.definition
+        def Other(width: int, *, a=1, b=2):
+            return a * b * width
+
+        @ar.definition
+        def Derived(base: Base, other: Other, offset: int, *, c=3):
+            return base + other + offset + c
+
+        return Base, Other, Derived
+
+    def test_plan_inputs(self, defns):
+        """Ensure that the plan only lists the inputs to pass directly to the
+        definition, while remembering every input the definition depends on."""
+
+        Base, Other, Derived = defns
+
+        assert Base._plan.inputs == ("width", "height")
+        assert Derived._plan.inputs == ("offset",)
+        assert Derived._plan.dependencies == {
+            "width",
+            "height",
+            "offset",
+            "base",
+            "other",
+        }
+
+    def test_plan_attributes(self, defns):
+        """Ensure that the plan routes each attribute to the bases that declare
+        it."""
+
+        Base, Other, Derived = defns
+        plan = Derived._plan
+
+        assert plan.attributes == ("c",)
+        assert set(plan.inherited) == {"a", "b", "c"}
+        assert plan.bases == (("base", Base, ("a",)), ("other", Other, ("a", "b")))
+        assert plan.overrides == {"base", "other"}
+
+        result = Derived(a=2, b=5, c=0)(width=2, height=1, offset=1)
+        assert (result == 2 + 2 * 5 * 2 + 1).all()
+
+    def test_plan_missing_inputs(self, defns):
+        """Ensure that we report any inputs that are missing."""
+
+        _, _, Derived = defns
+
+        with py.test.raises(TypeError) as err:
+            Derived()(width=2, height=1)
+
+        expected = "Unable to evaluate definition 'Derived', missing inputs: 'offset'"
+        assert str(err.value) == expected
+
+        with py.test.raises(TypeError) as err:
+            Derived()(offset=1)
+
+        expected = "Unable to evaluate definition 'Base', missing inputs: 'width', "
+        assert str(err.value) == expected + "'height'"
+
+    def test_plan_inputs_key_reused(self):
+        """Ensure that the key representing the inputs is only computed once for each
+        set of inputs."""
+
+        evaluation = ar._Evaluation()
+        inputs = {"width": 2, "height": 3}
+
+        key = evaluation.inputs_key(inputs)
+        assert evaluation.inputs_key(inputs) is key
+        assert evaluation.inputs_key(dict(inputs)) == key
+        assert evaluation.inputs_key({"width": 3, "height": 3}) != key
+
+        assert evaluation.inputs_key(inputs, frozenset({"width"})) != key
+
+        with py.test.raises(ar._Uncacheable):
+            evaluation.inputs_key({"width": np.zeros(2)}, frozenset({"width"}))
@@ -7,7 +7,10 @@ from hypothesis import given
 from hypothesis import settings
 
 import arlunio.image as image
+import arlunio.math as math
 import arlunio.testing as T
+from arlunio.mask import label
+from arlunio.mask import Mask
 
 
 @given(width=T.dimension, height=T.dimension)
@@ -149,6 +152,61 @@ class TestColorramp:
 
         assert (np.asarray(img) == pix).all()
 
+    def test_multiple_colors(self):
+        """Ensure that the colorramp can blend between more than two colors."""
+
+        values = np.array([[0.0, 0.25], [0.5, 1.0]])
+        img = image.colorramp(values, colors=["#f00", "#0f0", "#00f"], resolution=5)
+
+        pix = np.array(
+            [
+                [[255, 0, 0, 255], [127, 127, 0, 255]],
+                [[0, 255, 0, 255], [0, 0, 255, 255]],
+            ],
+            dtype=np.uint8,
+        )
+
+        assert (np.asarray(img) == pix).all()
+
+    def test_named_colormap(self):
+        """Ensure that the colorramp accepts the name of a colormap."""
+
+        values = np.array([[0.0, 1.0]])
+        img = image.colorramp(values, colors="viridis")
+
+        pix = np.array([[[68, 1, 84, 255], [253, 231, 37, 255]]], dtype=np.uint8)
+        assert (np.asarray(img) == pix).all()
+
+    def test_constant_values(self):
+        """Ensure that an array of identical values is given the start color."""
+
+        img = image.colorramp(np.ones((2, 3)), start="red")
+        assert (np.asarray(img) == (255, 0, 0, 255)).all()
+
+    def test_broadcast_values(self):
+        """Ensure that arrays with repeated values produce the same image as their
+        fully materialised equivalent."""
+
+        x = math.X()(width=32, height=16)
+        expected = image.colorramp(np.array(x), colors="magma")
+
+        assert image.colorramp(x, colors="magma") == expected
+
+    @py.test.mark.parametrize(
+        "kwargs",
+        [
+            {"start": "red", "colors": "viridis"},
+            {"colors": "not-a-colormap"},
+            {"colors": ["red"]},
+            {"colors": [(0.5, "red"), (0.0, "blue")]},
+        ],
+    )
+    def test_validation(self, kwargs):
+        """Ensure that invalid combinations of colors are rejected."""
+
+        with py.test.raises(ValueError):
+            image.colorramp(np.array([[0.0, 1.0]]), **kwargs)
+
 
 class TestFill:
     """Tests for the image.fill function."""
@@ -166,6 +224,16 @@ class TestFill:
 
         assert (np.asarray(img) == expected).all()
 
+    @settings(max_examples=50)
+    @given(mask=T.mask)
+    def test_with_packed_mask(self, mask):
+        """Ensure that the fill method accepts packed masks."""
+
+        expected = image.fill(mask, foreground="red")
+        img = image.fill(Mask(mask).pack(), foreground="red")
+
+        assert (np.asarray(img) == np.asarray(expected)).all()
+
     @py.test.mark.parametrize(
         "fg,fgval,bg,bgval",
         [
@@ -216,3 +284,160 @@ class TestFill:
         expected[mask] = (0, 0, 0, 255)
 
         assert (np.asarray(new_image) == expected).all()
+
+
+class TestCanvas:
+    """Tests for the image.Canvas class."""
+
+    def test_background(self):
+        """Ensure that the canvas is initialised with the background color."""
+
+        canvas = image.Canvas(3, 2, background="red")
+
+        assert canvas.pixels.shape == (2, 3, 4)
+        assert (canvas.pixels == (255, 0, 0, 255)).all()
+
+        canvas = image.Canvas(3, 2)
+        assert (canvas.pixels == 0).all()
+
+    @settings(max_examples=50)
+    @given(mask=T.mask)
+    def test_matches_fill(self, mask):
+        """Ensure that filling a canvas produces the same result as the fill
+        function."""
+
+        mask = Mask(mask)
+        layers = [(mask, "red"), (-mask, "#00ff0080"), (mask.pack(), None)]
+
+        height, width = mask.shape
+        expected = None
+        canvas = image.Canvas(width, height, background="white")
+
+        for m, color in layers:
+            expected = image.fill(
+                m, foreground=color, background="white", image=expected
+            )
+            canvas.fill(m, foreground=color)
+
+        assert canvas.image() == expected
+
+    def test_fromimage(self):
+        """Ensure that a canvas can be created from an existing image."""
+
+        img = image.new((2, 2), color="blue", mode="RGB")
+        mask = np.array([[True, False], [False, False]])
+
+        canvas = image.Canvas.fromimage(img)
+        canvas.fill(mask, foreground="red")
+
+        expected = image.fill(mask, foreground="red", image=img)
+        expected = np.asarray(expected.img.convert("RGBA"))
+
+        assert (np.asarray(canvas.image()) == expected).all()
+
+    def test_mask_size_mismatch(self):
+        """Ensure that masks must match the size of the canvas."""
+
+        canvas = image.Canvas(3, 2)
+
+        with py.test.raises(ValueError) as err:
+            canvas.fill(Mask.full(3, 2))
+
+        assert "does not match the size" in str(err.value)
+
+
+class TestFromLabels:
+    """Tests for the image.fromlabels function."""
+
+    def test_palette_list(self):
+        """Ensure that each label is given the corresponding color from the palette."""
+
+        labels = np.array([[0, 1], [2, 1]])
+        img = image.fromlabels(labels, [None, "red", "#00f"])
+
+        expected = np.array(
+            [[(0, 0, 0, 0), (255, 0, 0, 255)], [(0, 0, 255, 255), (255, 0, 0, 255)]]
+        )
+
+        assert (np.asarray(img) == expected).all()
+
+    def test_palette_dict(self):
+        """Ensure that the palette can be given as a dictionary, with any missing labels
+        left transparent."""
+
+        labels = np.array([[0, 3], [2, 3]], dtype=np.uint8)
+        img = image.fromlabels(labels, {0: "white", 3: "#0f08"})
+
+        expected = np.array(
+            [[(255, 255, 255, 255), (0, 255, 0, 136)], [(0, 0, 0, 0), (0, 255, 0, 136)]]
+        )
+
+        assert (np.asarray(img) == expected).all()
+
+    @settings(max_examples=50)
+    @given(mask=T.mask)
+    def test_matches_fill(self, mask):
+        """Ensure that coloring labels produces the same result as filling each mask
+        in turn."""
+
+        layers = [(mask, "red"), (~mask, "#00ff0080"), (mask[::-1], "blue")]
+        expected = None
+
+        for m, color in layers:
+            expected = image.fill(
+                m, foreground=color, background="white", image=expected
+            )
+
+        labels = label(*[m for m, _ in layers])
+        img = image.fromlabels(labels, ["white"] + [c for _, c in layers])
+
+        assert img == expected
+
+    @py.test.mark.parametrize(
+        "labels, palette, error",
+        [
+            (np.array([[0.0, 1.0]]), ["red", "blue"], TypeError),
+            (np.array([[0, 2]]), ["red", "blue"], ValueError),
+            (np.array([[-1, 0]]), ["red", "blue"], ValueError),
+        ],
+    )
+    def test_validation(self, labels, palette, error):
+        """Ensure that invalid labels are rejected."""
+
+        with py.test.raises(error):
+            image.fromlabels(labels, palette)
+
+
+class TestFillCoverage:
+    """Tests for filling with coverage values rather than a boolean mask."""
+
+    def test_fill(self):
+        """Ensure that coverage values are used as the opacity of the color."""
+
+        coverage = np.array([[0.0, 0.5], [1.0, 0.25]])
+        img = image.fill(coverage, foreground="red", background="blue")
+
+        expected = np.array(
+            [
+                [(0, 0, 255, 255), (128, 0, 127, 255)],
+                [(255, 0, 0, 255), (64, 0, 191, 255)],
+            ]
+        )
+
+        assert (np.asarray(img) == expected).all()
+
+    def test_canvas(self):
+        """Ensure that filling a canvas with coverage values produces the same result
+        as the fill function."""
+
+        rng = np.random.default_rng(1)
+        coverage = rng.random((20, 30))
+        coverage[coverage < 0.3] = 0
+
+        background = image.new((30, 20), color="#3a7f2c80")
+        expected = image.fill(coverage, foreground="#f0a01080", image=background)
+
+        canvas = image.Canvas.fromimage(background)
+        canvas.fill(coverage, foreground="#f0a01080")
+
+        assert canvas.image() == expected
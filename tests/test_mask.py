@@ -7,7 +7,9 @@ from hypothesis.strategies import integers
 
 import arlunio as ar
 import arlunio.mask as mask
+import arlunio.shape as shape
 import arlunio.testing as T
+from arlunio.tile import Tiled
 
 
 @ar.definition
@@ -357,11 +359,147 @@ class TestOperators:
         assert (r1 == r2).all()
 
 
+class TestPackedMask:
+    """Test cases for the :code:`PackedMask` type."""
+
+    @given(width=T.dimension, height=T.dimension, seed=integers(min_value=1))
+    def test_pack_unpack(self, width, height, seed):
+        """Ensure that packing then unpacking a mask leaves it unchanged."""
+
+        m = MaskGenerator(seed=seed)(width=width, height=height)
+        packed = m.pack()
+
+        assert packed.shape == m.shape
+        assert packed.nbytes < height * (width // 8 + 1) + 8
+
+        assert isinstance(packed.unpack(), mask.Mask)
+        assert (packed.unpack() == m).all()
+
+    @given(width=T.dimension, height=T.dimension, seed=integers(min_value=1))
+    def test_operators(self, width, height, seed):
+        """Ensure that combining packed masks produces the same result as combining
+        the masks themselves."""
+
+        a = MaskGenerator(seed=seed)(width=width, height=height)
+        b = MaskGenerator(seed=seed + 1)(width=width, height=height)
+        pa, pb = a.pack(), b.pack()
+
+        assert ((pa + pb).unpack() == (a + b)).all()
+        assert ((pa - pb).unpack() == (a - b)).all()
+        assert ((pa * pb).unpack() == (a * b)).all()
+        assert ((-pa).unpack() == (-a)).all()
+
+    def test_operators_with_masks(self):
+        """Ensure that packed masks can be combined with regular masks, with the result
+        remaining packed."""
+
+        a = mask.Mask([[True, False, True], [False, True, False]])
+        b = mask.Mask([[False, False, True], [True, True, False]])
+
+        for result, expected in [
+            (a.pack() + b, a + b),
+            (a + b.pack(), a + b),
+            (a.pack() - b, a - b),
+            (a - b.pack(), a - b),
+            (a * b.pack(), a * b),
+        ]:
+            assert isinstance(result, mask.PackedMask)
+            assert (result.unpack() == expected).all()
+
+    def test_negation_preserves_padding(self):
+        """Ensure that negating a mask does not set the bits used as padding."""
+
+        packed = mask.Mask.empty(3, 5).pack()
+        full = -packed
+
+        assert (full.unpack()).all()
+        assert np.unpackbits(full.bits).sum() == 15
+
+    def test_any_all(self):
+        """Ensure that :code:`any_` and :code:`all_` work with packed masks."""
+
+        a = MaskGenerator(seed=1)(width=70, height=9)
+        b = MaskGenerator(seed=2)(width=70, height=9)
+        c = MaskGenerator(seed=3)(width=70, height=9)
+
+        result = mask.any_(a.pack(), b, c.pack())
+        assert isinstance(result, mask.PackedMask)
+        assert (result.unpack() == mask.any_(a, b, c)).all()
+
+        result = mask.all_(True, a.pack(), b.pack(), c)
+        assert isinstance(result, mask.PackedMask)
+        assert (result.unpack() == mask.all_(a, b, c)).all()
+
+    def test_shape_mismatch(self):
+        """Ensure that packed masks of different shapes cannot be combined."""
+
+        a = mask.Mask.full(2, 3).pack()
+        b = mask.Mask.full(3, 2).pack()
+
+        with py.test.raises(ValueError) as err:
+            a + b
+
+        assert "shapes (2, 3) and (3, 2)" in str(err.value)
+
+    def test_array_conversion(self):
+        """Ensure that numpy unpacks packed masks when converting them to arrays."""
+
+        m = mask.Mask([[True, False], [False, True]])
+        assert (np.asarray(m.pack()) == m).all()
+
+    @py.test.mark.parametrize(
+        "f",
+        [np.any, np.logical_not, lambda p: np.logical_and(p, p.unpack())],
+        ids=["any", "logical_not", "logical_and"],
+    )
+    def test_ufuncs_rejected(self, f):
+        """Ensure that ufuncs refuse packed masks, rather than silently unpacking
+        them."""
+
+        packed = mask.Mask([[True, False], [False, True]]).pack()
+
+        with py.test.raises(TypeError):
+            f(packed)
+
+
+class TestLabel:
+    """Test cases for the :code:`label` function."""
+
+    @given(width=T.dimension, height=T.dimension, seed=integers(min_value=1))
+    def test_later_masks_take_priority(self, width, height, seed):
+        """Ensure that each element is labelled with the last mask to select it."""
+
+        masks = [
+            MaskGenerator(seed=seed + i)(width=width, height=height) for i in range(3)
+        ]
+        labels = mask.label(*masks)
+
+        expected = np.zeros((height, width), dtype=int)
+
+        for idx, m in enumerate(masks, start=1):
+            expected[m] = idx
+
+        assert labels.dtype == np.uint8
+        assert (labels == expected).all()
+
+    def test_many_masks(self):
+        """Ensure that the labels can hold large numbers of masks."""
+
+        masks = [mask.Mask.empty(2, 2)] * 299 + [mask.Mask.full(2, 2).pack()]
+        labels = mask.label(*masks)
+
+        assert labels.dtype == np.uint16
+        assert (labels == 300).all()
+
+
 class TestPixelize:
     """Tests for the pixelize definition."""
 
     @py.test.mark.parametrize(
-        "args, message", [({}, "provide a mask or a mask producing definition"),],
+        "args, message",
+        [
+            ({}, "provide a mask or a mask producing definition"),
+        ],
     )
     def test_validation(self, args, message):
         """Ensure that the definition checks it is being setup correctly."""
@@ -389,3 +527,181 @@ class TestPixelize:
 
         assert isinstance(result, mask.Mask), "Expected mask instance."
         assert result.shape == (width, width)
+
+    @py.test.mark.parametrize("width, height", [(8, 6), (9, 7), (5, 3), (100, 37)])
+    def test_non_divisible_sizes(self, width, height):
+        """Ensure that the result always has the requested size, with each pixel of the
+        mask enlarged as evenly as possible."""
+
+        m = mask.Mask([[True, False, True, False], [False, True, False, False]])
+        result = mask.Pixelize(mask=m)(width=width, height=height)
+
+        assert isinstance(result, mask.Mask)
+        assert result.shape == (height, width)
+
+        # Each row and column of the mask should be enlarged to within a pixel.
+        _, col_sizes = np.unique(np.arange(width) * 4 // width, return_counts=True)
+        _, row_sizes = np.unique(np.arange(height) * 2 // height, return_counts=True)
+
+        assert col_sizes.max() - col_sizes.min() <= 1
+        assert row_sizes.max() - row_sizes.min() <= 1
+
+        expected = np.repeat(np.repeat(m, row_sizes, axis=0), col_sizes, axis=1)
+        assert (result == expected).all()
+
+    def test_non_square_mask(self):
+        """Ensure that masks that are not square are enlarged correctly."""
+
+        m = mask.Mask([[True, False, False], [False, False, True]])
+        result = mask.Pixelize(mask=m)(width=6, height=4)
+
+        assert (result == np.kron(m, np.ones((2, 2), dtype=bool))).all()
+
+    def test_defn(self):
+        """Ensure that the definition is evaluated at the resolution given by the
+        scale."""
+
+        circle = shape.Circle()
+        result = mask.Pixelize(defn=circle, scale=8)(width=32, height=32)
+
+        expected = np.kron(circle(width=8, height=8), np.ones((4, 4), dtype=bool))
+        assert (result == expected).all()
+
+
+class TestMap:
+    """Tests for the map definition."""
+
+    def test_layout(self):
+        """Ensure that each cell contains the mask given by the legend."""
+
+        a, b = shape.Circle(), shape.Square(size=0.5)
+        layout = np.array([["a", "b", ""], ["b", "a", "a"]])
+
+        result = mask.Map(legend={"a": a, "b": b}, layout=layout)(width=30, height=20)
+
+        ma, mb = a(width=10, height=10), b(width=10, height=10)
+        empty = mask.Mask.empty(10, 10)
+
+        assert isinstance(result, mask.Mask)
+        assert (result == np.block([[ma, mb, empty], [mb, ma, ma]])).all()
+
+    def test_fill(self):
+        """Ensure that cells missing from the legend use the fill definition."""
+
+        layout = [[1, 0], [0, 0]]
+        result = mask.Map(legend={1: mask.Full()}, layout=layout, fill=mask.Empty())
+
+        expected = np.zeros((4, 6), dtype=bool)
+        expected[:2, :3] = True
+
+        assert (result(width=6, height=4) == expected).all()
+
+    @py.test.mark.parametrize("width, height", [(31, 23), (10, 7), (100, 3)])
+    def test_non_divisible_sizes(self, width, height):
+        """Ensure that the result has the requested size, even if the layout does not
+        divide it cleanly."""
+
+        layout = np.array([[1, 0, 1], [0, 1, 0], [1, 1, 0]])
+        result = mask.Map(legend={1: mask.Full()}, layout=layout)
+
+        result = result(width=width, height=height)
+        assert result.shape == (height, width)
+
+        # Each cell should still be either completely full or empty.
+        rows = np.searchsorted((np.arange(4) * height) // 3, np.arange(height), "right")
+        cols = np.searchsorted((np.arange(4) * width) // 3, np.arange(width), "right")
+
+        assert (result == (layout[rows[:, np.newaxis] - 1, cols - 1] == 1)).all()
+
+
+class TestRepeat:
+    """Tests for the repeat definition."""
+
+    @py.test.mark.parametrize("n, m", [(4, None), (2, 5), (1, 1)])
+    def test_divisible_sizes(self, n, m):
+        """Ensure that when the grid divides the image cleanly, the result is the cell
+        tiled across the image."""
+
+        circle = shape.Circle(xc=0.2)
+        result = mask.Repeat(defn=circle, n=n, m=m)(width=40, height=60)
+
+        rows = n if m is None else m
+        cell = circle(width=40 // n, height=60 // rows)
+
+        assert isinstance(result, mask.Mask)
+        assert (result == np.tile(cell, (rows, n))).all()
+
+    @py.test.mark.parametrize("width, height", [(35, 23), (41, 17), (7, 3)])
+    def test_non_divisible_sizes(self, width, height):
+        """Ensure that the pattern is continued into any remaining rows and
+        columns."""
+
+        circle = shape.Circle(yc=0.3)
+        result = mask.Repeat(defn=circle, n=3, m=2)(width=width, height=height)
+
+        s_width, s_height = max(width // 3, 1), max(height // 2, 1)
+        cell = circle(width=s_width, height=s_height)
+
+        rows, cols = np.indices((height, width))
+        expected = cell[rows % s_height, cols % s_width]
+
+        assert result.shape == (height, width)
+        assert (result == expected).all()
+
+    def test_out(self):
+        """Ensure that the result can be written into an existing array."""
+
+        out = np.ones((8, 12), dtype=bool)
+        result = mask.Repeat(defn=mask.Empty(), out=out)(width=12, height=8)
+
+        assert result is out
+        assert not out.any()
+
+
+class TestCoverage:
+    """Tests for the coverage definition."""
+
+    @py.test.mark.parametrize(
+        "defn",
+        [
+            shape.Circle(r=0.6) - shape.Square(size=0.3),
+            shape.Circle(r=0.3, pt=0.2, xc=0.7) + shape.Rectangle(size=0.1, ratio=3),
+            shape.Triangle(),
+        ],
+    )
+    @py.test.mark.parametrize("width, height", [(64, 48), (37, 53)])
+    def test_matches_supersampling(self, defn, width, height):
+        """Ensure that the coverage matches evaluating the entire mask at a higher
+        resolution."""
+
+        coverage = mask.Coverage(defn=defn, samples=3, size=(7, 5))
+        result = coverage(width=width, height=height)
+
+        expected = np.asarray(defn(width=width * 3, height=height * 3), dtype=float)
+        expected = expected.reshape(height, 3, width, 3).mean(axis=(1, 3))
+
+        assert result.shape == (height, width)
+        assert np.allclose(result, expected)
+
+    def test_tiled(self):
+        """Ensure that the coverage takes the active viewport into account."""
+
+        coverage = mask.Coverage(defn=shape.Circle(r=0.5, xc=0.3), samples=2, size=8)
+        tiled = Tiled(defn=coverage, size=(20, 13))
+
+        expected = coverage(width=50, height=40)
+        assert np.allclose(tiled(width=50, height=40), expected)
+
+    def test_no_edges(self):
+        """Ensure that masks without any edges are returned as they are."""
+
+        result = mask.Coverage(defn=mask.Full())(width=5, height=4)
+        assert (result == 1.0).all()
+
+    def test_validation(self):
+        """Ensure that a definition must be given."""
+
+        with py.test.raises(ValueError) as err:
+            mask.Coverage()(width=4, height=4)
+
+        assert "provide a mask producing definition" in str(err.value)
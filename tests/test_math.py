@@ -5,6 +5,10 @@ from hypothesis import assume
 from hypothesis import given
 
 import arlunio.testing as T
+from arlunio.math import Barycentric
+from arlunio.math import compact
+from arlunio.math import R
+from arlunio.math import T as Theta
 from arlunio.math import X
 from arlunio.math import Y
 
@@ -119,3 +123,45 @@ def test_Y_shifts_origin_accordingly(width, height, offset):
     y2s = y2(width=width, height=height)
 
     npt.assert_almost_equal(y1s - y2s, offset)
+
+
+@given(width=T.dimension, height=T.dimension)
+def test_compact_coordinates(width, height):
+    """Ensure that the coordinate grids are stored as a single row or column and that
+    compacting them preserves their values."""
+
+    xs = X()(width=width, height=height)
+    ys = Y()(width=width, height=height)
+
+    assert not xs.flags.writeable
+    assert not ys.flags.writeable
+
+    assert compact(xs).shape == (1, width)
+    assert compact(ys).shape == (height, 1)
+
+    npt.assert_array_equal(np.broadcast_to(compact(xs), xs.shape), xs)
+    npt.assert_array_equal(np.broadcast_to(compact(ys), ys.shape), ys)
+
+
+def test_compact_leaves_full_arrays():
+    """Ensure that arrays without any repeated axes are left as they are."""
+
+    vs = np.ones((3, 4))
+    assert compact(vs).shape == (3, 4)
+
+
+@py.test.mark.parametrize("defn", [R(), Theta(t0=1), Barycentric(a=(1, 0))])
+@py.test.mark.parametrize("width, height", [(1, 1), (7, 1), (1, 5), (32, 17)])
+def test_compact_consumers(defn, width, height):
+    """Ensure that definitions consuming the compacted coordinates produce the same
+    results as when given fully materialised coordinates."""
+
+    xs = np.array(X()(width=width, height=height))
+    ys = np.array(Y()(width=width, height=height))
+
+    expected = defn(x=xs, y=ys)
+    actual = defn(width=width, height=height)
+
+    assert actual.shape == expected.shape
+    assert actual.shape[:2] == (height, width)
+    npt.assert_array_equal(actual, expected)
@@ -0,0 +1,87 @@
+import json
+
+import numpy as np
+
+import arlunio as ar
+import arlunio.math as math
+import arlunio.shape as shape
+from arlunio.profile import Profiler
+
+
+def test_profiler_records_tree():
+    """Ensure that the profiler records each definition at its position in the
+    evaluation tree."""
+
+    @ar.definition
+    def Both(r: math.R, t: math.T):
+        return r * t
+
+    defn = shape.Circle() - shape.Circle(r=0.5)
+
+    with Profiler() as profiler:
+        Both()(width=16, height=16)
+        defn(width=16, height=16)
+        defn(width=16, height=16)
+
+    assert list(profiler.root.children.keys()) == ["Both", "MaskSub"]
+
+    both = profiler.root.children["Both"]
+    assert both.calls == 1
+    assert list(both.children.keys()) == ["R", "T"]
+    assert both.children["R"].children["X"].calls == 1
+    assert both.children["T"].children["X"].calls == 0
+    assert both.children["T"].children["X"].reused == 1
+
+    sub = profiler.root.children["MaskSub"]
+    assert sub.calls == 2
+    assert list(sub.children.keys()) == ["Circle"]
+
+    circle = sub.children["Circle"]
+    assert circle.calls == 4
+    assert circle.children["X"].calls == 2
+    assert circle.children["X"].reused == 2
+    assert sub.time >= circle.time >= circle.children["X"].time
+
+
+def test_profiler_inactive_outside_context():
+    """Ensure that evaluations are only recorded while the profiler is active."""
+
+    profiler = Profiler()
+    math.X()(width=4, height=4)
+
+    with profiler:
+        math.Y()(width=4, height=4)
+
+    math.X()(width=4, height=4)
+
+    assert list(profiler.root.children.keys()) == ["Y"]
+    assert ar._STATE.profiler is None
+
+
+def test_profiler_memory():
+    """Ensure that the profiler can record memory usage."""
+
+    @ar.definition
+    def Allocate(width: int, height: int):
+        return np.ones((height, width))
+
+    with Profiler(memory=True) as profiler:
+        Allocate()(width=256, height=256)
+
+    node = profiler.root.children["Allocate"]
+    assert node.memory >= 256 * 256 * 8
+    assert "memory=" in profiler.report()
+
+
+def test_profiler_json():
+    """Ensure that the measurements can be exported as JSON."""
+
+    with Profiler() as profiler:
+        math.R()(width=4, height=4)
+
+    data = json.loads(profiler.to_json())
+
+    assert len(data) == 1
+    assert data[0]["name"] == "R"
+    assert data[0]["calls"] == 1
+    assert [c["name"] for c in data[0]["children"]] == ["X", "Y"]
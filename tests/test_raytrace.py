@@ -0,0 +1,447 @@
+import concurrent.futures as futures
+
+import numpy as np
+import numpy.random as npr
+import py.test
+
+import arlunio as ar
+import arlunio.raytrace as rt
+import arlunio.raytrace.render as render_module
+import arlunio.raytrace.rng as rng
+from arlunio.raytrace.data import ScatterPoint
+
+
+def scene(n, seed=1234):
+    """Return a scene containing the given number of randomly placed spheres."""
+
+    rng = np.random.default_rng(seed)
+
+    xs = rng.uniform(-3, 3, size=n)
+    ys = rng.uniform(-2, 2, size=n)
+    zs = rng.uniform(-8, -2, size=n)
+    rs = rng.uniform(0.05, 0.4, size=n)
+
+    return [
+        rt.Sphere(center=np.array([x, y, z]), radius=r)
+        for x, y, z, r in zip(xs, ys, zs, rs)
+    ]
+
+
+def brute_force(objects, rays, t_min):
+    """Test every ray against every object."""
+
+    scatter = ScatterPoint.new(rays)
+    ids = np.full(scatter.hit.shape, -1)
+
+    for idx, obj in enumerate(objects):
+        test = obj(rays=rays, t_min=t_min, t_max=scatter.t)
+
+        ids[test.hit] = idx
+        scatter.merge(test)
+
+    return scatter, ids
+
+
+@ar.definition
+def Ground(rays: rt.Rays, t_min: float, t_max: float) -> rt.ScatterPoint:
+    sphere = rt.Sphere(center=np.array([0, -100.5, -1]), radius=100)
+    return sphere(rays=rays, t_min=t_min, t_max=t_max)
+
+
+@py.test.fixture
+def rays():
+    camera = rt.SimpleCamera(sampler=rt.SimpleSampler())
+    return camera(width=64, height=36)
+
+
+@py.test.mark.parametrize("n, leaf_size", [(1, 4), (5, 4), (200, 4), (200, 1)])
+def test_bvh_matches_brute_force(rays, n, leaf_size):
+    """Ensure that the hierarchy finds the same hits as testing every object."""
+
+    objects = scene(n)
+    expected, expected_ids = brute_force(objects, rays, 0.001)
+
+    bvh = rt.BVH.build(objects, leaf_size=leaf_size)
+    scatter, ids = bvh.intersect(rays, t_min=0.001)
+
+    assert expected.hit.any()
+    assert (ids == expected_ids).all()
+    assert (scatter.hit == expected.hit).all()
+    assert (scatter.t == expected.t).all()
+    assert (scatter.p == expected.p).all()
+    assert (scatter.normal == expected.normal).all()
+    assert (scatter.front_face == expected.front_face).all()
+
+
+def test_bvh_unbounded_objects(rays):
+    """Ensure that objects without a known bounding box are tested against every
+    ray."""
+
+    objects = scene(20) + [Ground()]
+    expected, expected_ids = brute_force(objects, rays, 0.001)
+
+    bvh = rt.BVH.build(objects)
+    scatter, ids = bvh.intersect(rays, t_min=0.001)
+
+    assert list(bvh.unbounded) == [20]
+    assert (ids == 20).any()
+    assert (ids == expected_ids).all()
+    assert (scatter.t == expected.t).all()
+
+
+def test_bvh_empty(rays):
+    """Ensure that a scene with no objects is not hit by any rays."""
+
+    scatter, ids = rt.BVH.build([]).intersect(rays, t_min=0.001)
+
+    assert not scatter.hit.any()
+    assert (ids == -1).all()
+
+
+def test_bvh_build_reuses_bvh():
+    """Ensure that building a hierarchy from a hierarchy returns it unchanged."""
+
+    bvh = rt.BVH.build(scene(10))
+    assert rt.BVH.build(bvh) is bvh
+
+
+def test_scatter_point_keeps_rays():
+    """Ensure that recording hits does not change the rays that produced them."""
+
+    camera = rt.SimpleCamera(sampler=rt.SimpleSampler())
+    rays = camera(width=16, height=9)
+    directions = np.array(rays.direction)
+
+    brute_force(scene(20), rays, 0.001)
+
+    assert (rays.direction == directions).all()
+
+
+@py.test.mark.parametrize(
+    "renderer",
+    [
+        rt.ZDepthRenderer(objects=scene(20)),
+        rt.ZDepthRenderer(objects=[rt.Spheres(centers=[[0, 0, -1], [1, 0, -2]])]),
+        rt.ClayRenderer(objects=rt.BVH.build(scene(20) + [Ground()])),
+        rt.MaterialRenderer(
+            objects=[(obj, rt.LambertianDiffuse()) for obj in scene(20) + [Ground()]]
+        ),
+    ],
+)
+def test_renderers(renderer):
+    """Ensure that each of the renderers can render a scene."""
+
+    npr.seed(1234)
+    assert renderer(width=32, height=18) is not None
+
+
+@py.test.mark.parametrize("n", [0, 1, 10, 150])
+def test_spheres(rays, n):
+    """Ensure that testing many spheres at once is the same as testing each sphere
+    in turn."""
+
+    objects = scene(n)
+    expected, _ = brute_force(objects, rays, 0.001)
+
+    centers = np.array([obj.center for obj in objects]).reshape(-1, 3)
+    radii = np.array([obj.radius for obj in objects])
+
+    spheres = rt.Spheres(centers=centers, radii=radii)
+    result = spheres(rays=rays, t_min=0.001, t_max=ScatterPoint.new(rays).t)
+
+    hit = expected.hit
+
+    assert (result.hit == hit).all()
+    assert (result.t == expected.t[hit]).all()
+    assert (result.p == expected.p[hit]).all()
+    assert (result.normal == expected.normal[hit]).all()
+    assert (result.front_face == expected.front_face[hit]).all()
+
+
+def test_spheres_t_max(rays):
+    """Ensure that spheres beyond the given maximum are ignored."""
+
+    spheres = rt.Spheres(centers=[[0, 0, -1], [0, 0, -3]], radii=0.5)
+    t_max = np.full(len(rays.direction), 2.0)
+
+    result = spheres(rays=rays, t_min=0.001, t_max=t_max)
+
+    assert result.hit.any()
+    assert (result.t < 2).all()
+    assert (result.p[:, 2] > -2).all()
+
+
+def test_spheres_default():
+    """Ensure that the default sphere matches that of a single sphere."""
+
+    camera = rt.SimpleCamera(sampler=rt.SimpleSampler())
+    rays = camera(width=16, height=9)
+    t_max = ScatterPoint.new(rays).t
+
+    expected = rt.Sphere()(rays=rays, t_min=0.001, t_max=t_max)
+    result = rt.Spheres()(rays=rays, t_min=0.001, t_max=t_max)
+
+    assert (result.hit == expected.hit).all()
+    assert (result.t == expected.t).all()
+
+
+def test_spheres_bvh(rays):
+    """Ensure that collections of spheres can be placed in a hierarchy."""
+
+    groups = [scene(30, seed=seed) for seed in range(4)]
+    expected, _ = brute_force(sum(groups, []), rays, 0.001)
+
+    objects = [
+        rt.Spheres(
+            centers=[obj.center for obj in group],
+            radii=[obj.radius for obj in group],
+        )
+        for group in groups
+    ]
+
+    scatter, ids = rt.BVH.build(objects).intersect(rays, t_min=0.001)
+
+    assert (scatter.hit == expected.hit).all()
+    assert (scatter.t == expected.t).all()
+    assert set(ids[scatter.hit]) <= {0, 1, 2, 3}
+
+
+def test_material_renderer_groups_materials():
+    """Ensure that each ray is colored by the material of the object it hits."""
+
+    left = rt.Sphere(center=np.array([-0.5, 0, -1]), radius=0.4)
+    right = rt.Sphere(center=np.array([0.5, 0, -1]), radius=0.4)
+
+    objects = [
+        (left, rt.LambertianDiffuse(color="red")),
+        (right, rt.LambertianDiffuse(color="blue")),
+    ]
+
+    camera = rt.SimpleCamera(sampler=rt.SimpleSampler())
+    renderer = rt.MaterialRenderer(objects=objects, camera=camera, bounces=2)
+
+    rays = camera(width=32, height=18)
+    background = rt.Gradient()(scatter=ScatterPoint.new(rays))
+    _, ids = rt.BVH.build([left, right]).intersect(rays, t_min=0.001)
+
+    color = renderer(width=32, height=18)
+
+    assert (ids == 0).any() and (ids == 1).any()
+    assert (color[ids == -1] == background[ids == -1]).all()
+    assert (color[ids == 0] == background[ids == 0] * [1, 0, 0]).all()
+    assert (color[ids == 1] == background[ids == 1] * [0, 0, 1]).all()
+
+
+def render(seed, processes=1, samples=10):
+    """Render a small scene, returning the resulting pixels."""
+
+    kernel = rt.MaterialRenderer(
+        objects=[(obj, rt.LambertianDiffuse()) for obj in scene(5) + [Ground()]],
+        bounces=4,
+    )
+
+    renderer = rt.SampledRenderer(
+        kernel=kernel, samples=samples, seed=seed, processes=processes
+    )
+    return np.asarray(renderer(width=16, height=9))
+
+
+def test_sampled_renderer_seed():
+    """Ensure that rendering with the same seed produces the same image."""
+
+    npr.seed(1)
+    expected = render(seed=42)
+
+    npr.seed(2)
+    assert (render(seed=42) == expected).all()
+    assert (render(seed=43) != expected).any()
+
+
+def test_sampled_renderer_processes():
+    """Ensure that the image produced does not depend on the number of processes."""
+
+    expected = render(seed=42, processes=1, samples=20)
+    assert (render(seed=42, processes=2, samples=20) == expected).all()
+
+
+def test_sampled_renderer_global_seed():
+    """Ensure that without a seed, the image follows the global numpy random state."""
+
+    npr.seed(5)
+    expected = render(seed=None)
+
+    npr.seed(5)
+    assert (render(seed=None) == expected).all()
+
+    npr.seed(6)
+    assert (render(seed=None) != expected).any()
+
+
+@py.test.mark.parametrize("n, expected", [(1, 1), (10, 10), (64, 64), (200, 64)])
+def test_sample_chunks(n, expected):
+    """Ensure that samples are split into as many chunks as possible, up to a limit
+    that does not depend on the number of processes."""
+
+    chunks = render_module._chunks(list(range(n)))
+
+    assert len(chunks) == expected
+    assert sum(chunks, []) == list(range(n))
+    assert max(map(len, chunks)) - min(map(len, chunks)) <= 1
+
+
+def test_rng_using():
+    """Ensure that random numbers are drawn from the generator in use, restoring the
+    global state afterwards."""
+
+    with rng.using(np.random.default_rng(7)):
+        a = rng.rand(5)
+
+        with rng.using(np.random.default_rng(8)):
+            assert rng.current() is not None
+
+        b = rng.rand(5)
+
+    assert rng.current() is None
+
+    expected = np.random.default_rng(7).random(10)
+    assert (np.concatenate([a, b]) == expected).all()
+
+
+def progressive(**kwargs):
+    """Render a small scene progressively, returning each step."""
+
+    kernel = rt.MaterialRenderer(
+        objects=[(obj, rt.LambertianDiffuse()) for obj in scene(5) + [Ground()]],
+        bounces=4,
+    )
+
+    renderer = rt.ProgressiveRenderer(kernel=kernel, **kwargs)
+    return list(renderer(width=16, height=9))
+
+
+def test_progressive_renderer_samples():
+    """Ensure that an image is produced after each batch, until the requested number
+    of samples have been taken."""
+
+    steps = progressive(batch=4, samples=10, seed=1)
+
+    assert [s.samples for s in steps] == [4, 8, 10]
+    assert all(np.asarray(s.image).shape == (9, 16, 3) for s in steps)
+    assert steps[0].noise > steps[-1].noise
+
+
+def test_progressive_renderer_processes(monkeypatch):
+    """Ensure that each batch is spread across the processes, without changing the
+    result."""
+
+    maps = []
+
+    class Executor(futures.ProcessPoolExecutor):
+        def map(self, fn, *iterables):
+            iterables = [list(it) for it in iterables]
+            maps.append(len(iterables[0]))
+
+            return super().map(fn, *iterables)
+
+    expected = progressive(samples=40, batch=16, seed=42)
+    assert [s.samples for s in expected] == [16, 32, 40]
+
+    monkeypatch.setattr(render_module.futures, "ProcessPoolExecutor", Executor)
+    result = progressive(samples=40, batch=16, seed=42, processes=2)
+
+    assert maps == [16, 16, 8]
+
+    for r, e in zip(result, expected):
+        assert r.noise == e.noise
+        assert (np.asarray(r.image) == np.asarray(e.image)).all()
+
+
+def test_progressive_renderer_threshold():
+    """Ensure that rendering stops once the noise is below the threshold."""
+
+    steps = progressive(batch=4, threshold=0.1, seed=1)
+
+    assert steps[-1].noise <= 0.1
+    assert all(s.noise > 0.1 for s in steps[:-1])
+
+
+def test_progressive_renderer_budget():
+    """Ensure that rendering stops once the time budget has been spent."""
+
+    steps = progressive(budget=0.0, seed=1)
+
+    assert len(steps) == 1
+    assert steps[0].samples == 1
+
+
+def test_progressive_renderer_noise():
+    """Ensure that the noise is the standard error of the pixel colors."""
+
+    kernel = rt.MaterialRenderer(objects=[(Ground(), rt.LambertianDiffuse())])
+    renderer = rt.ProgressiveRenderer(kernel=kernel, batch=3, samples=5, seed=7)
+    noise = [s.noise for s in renderer(width=8, height=4)][-1]
+
+    cols = []
+    for child in np.random.SeedSequence(7).spawn(5):
+        with rng.using(np.random.default_rng(child)):
+            cols.append(kernel(width=8, height=4))
+
+    expected = np.std(cols, axis=0, ddof=1).max() / np.sqrt(5)
+    assert noise == py.test.approx(expected)
+
+
+def test_progressive_renderer_missing_kernel():
+    """Ensure that we raise an error if there is no kernel to render."""
+
+    with py.test.raises(ValueError):
+        rt.ProgressiveRenderer()(width=4, height=4)
+
+
+def test_material_renderer_prebuilt():
+    """Ensure that the material renderer accepts a prebuilt hierarchy along with the
+    material of each object."""
+
+    objects = [(obj, rt.LambertianDiffuse()) for obj in scene(10) + [Ground()]]
+    bvh = rt.BVH.build([obj for obj, _ in objects])
+    materials = [mat for _, mat in objects]
+
+    npr.seed(1234)
+    expected = rt.MaterialRenderer(objects=objects)(width=16, height=9)
+
+    npr.seed(1234)
+    result = rt.MaterialRenderer(objects=bvh, materials=materials)(width=16, height=9)
+
+    assert (result == expected).all()
+
+    with py.test.raises(ValueError):
+        rt.MaterialRenderer(objects=bvh)(width=16, height=9)
+
+
+@py.test.mark.parametrize(
+    "kernel",
+    [
+        rt.MaterialRenderer(
+            objects=[(obj, rt.LambertianDiffuse()) for obj in scene(5) + [Ground()]]
+        ),
+        rt.ClayRenderer(objects=scene(5)),
+    ],
+)
+def test_sampling_builds_scene_once(kernel, monkeypatch):
+    """Ensure that the hierarchy for the scene is built once, not for every sample."""
+
+    built = []
+    build = rt.BVH.build.__func__
+
+    def counting(cls, objects, **kwargs):
+        if not isinstance(objects, rt.BVH):
+            built.append(objects)
+
+        return build(cls, objects, **kwargs)
+
+    monkeypatch.setattr(rt.BVH, "build", classmethod(counting))
+
+    rt.SampledRenderer(kernel=kernel, samples=4, seed=1)(width=8, height=4)
+    assert len(built) == 1
+
+    list(rt.ProgressiveRenderer(kernel=kernel, batch=2, samples=4)(width=8, height=4))
+    assert len(built) == 2
@@ -0,0 +1,174 @@
+import numpy as np
+import py.test
+
+import arlunio.image as image
+import arlunio.mask as mask
+import arlunio.sdf as sdf
+import arlunio.shape as shape
+from arlunio.tile import Tiled
+
+SHAPES = [
+    (sdf.Circle(r=0.4, xc=0.3, yc=-0.2), shape.Circle(r=0.4, xc=0.3, yc=-0.2)),
+    (sdf.Circle(x0=0.5, scale=2), shape.Circle(x0=0.5, scale=2)),
+    (sdf.Ellipse(a=1, b=0.5, r=0.6, yc=0.5), shape.Ellipse(a=1, b=0.5, r=0.6, yc=0.5)),
+    (sdf.Ellipse(r=0.5, stretch=True), shape.Ellipse(r=0.5, stretch=True)),
+    (sdf.SuperEllipse(n=0.5, r=0.3, xc=-1), shape.SuperEllipse(n=0.5, r=0.3, xc=-1)),
+    (sdf.SuperEllipse(n=3, m=0.2, a=0.5), shape.SuperEllipse(n=3, m=0.2, a=0.5)),
+    (sdf.Square(size=0.2, xc=1.2), shape.Square(size=0.2, xc=1.2)),
+    (sdf.Rectangle(size=0.1, ratio=4), shape.Rectangle(size=0.1, ratio=4)),
+    (sdf.Rectangle(size=0.1, ratio=0.25), shape.Rectangle(size=0.1, ratio=0.25)),
+]
+
+
+@py.test.mark.parametrize("defn, expected", SHAPES)
+@py.test.mark.parametrize("width, height", [(64, 64), (97, 41)])
+def test_shapes_match_masks(defn, expected, width, height):
+    """Ensure that the points inside each distance field are exactly those selected
+    by the corresponding shape."""
+
+    distance = defn(width=width, height=height)
+
+    assert isinstance(distance, sdf.Distance)
+    assert distance.shape == (height, width)
+    assert ((distance < 0) == expected(width=width, height=height)).all()
+
+
+@py.test.mark.parametrize("defn", [d for d, _ in SHAPES if getattr(d, "n", 1) >= 1])
+def test_shapes_are_distances(defn):
+    """Ensure that close to the edge of each shape the values change no faster than
+    the distance between the points."""
+
+    width, height = 128, 128
+    distance = np.asarray(defn(width=width, height=height))
+    pixel = 2 * defn.scale / (width - 1)
+
+    step = np.abs(np.diff(distance, axis=1))
+    edge = np.abs(distance[:, 1:]) < 2 * pixel
+
+    assert (step[edge] <= pixel * 1.5).all()
+
+
+def test_circle_distance():
+    """Ensure that the distance to a circle is exact."""
+
+    distance = sdf.Circle(r=0.5)(width=5, height=5)
+
+    assert distance[2, 2] == -0.25
+    assert distance[2, 0] == 0.75
+    assert distance[0, 2] == 0.75
+
+
+def test_operators():
+    """Ensure that combining distance fields matches combining the corresponding
+    masks."""
+
+    a, b = sdf.Circle(xc=-0.25), sdf.Square(xc=0.25, size=0.5)
+    p, q = shape.Circle(xc=-0.25), shape.Square(xc=0.25, size=0.5)
+
+    for defn, expected in [(a + b, p + q), (a - b, p - q), (a * b, p * q)]:
+        distance = defn(width=64, height=48)
+
+        assert isinstance(distance, sdf.Distance)
+        assert ((distance < 0) == expected(width=64, height=48)).all()
+
+
+def test_outline():
+    """Ensure that an outline selects the points close to the edge of a shape."""
+
+    outline = sdf.Outline(defn=sdf.Square(size=0.5), pt=0.1)
+    result = outline(width=64, height=64)
+
+    assert isinstance(result, mask.Mask)
+    assert result.any()
+    assert not result[32, 32]
+    assert not result[0, 0]
+
+    # Away from the corners, which are rounded off, this matches the square outline.
+    expected = shape.Square(size=0.6) - shape.Square(size=0.4)
+    expected = expected(width=64, height=64)
+
+    assert not (result & ~expected).any()
+    assert (result[32] == expected[32]).all()
+    assert (result[:, 32] == expected[:, 32]).all()
+
+
+def test_fill():
+    """Ensure that filling a shape selects the same points as the corresponding
+    shape."""
+
+    fill = sdf.Fill(defn=sdf.Circle(r=0.6))
+    result = fill(width=32, height=32)
+
+    assert isinstance(result, mask.Mask)
+    assert (result == shape.Circle(r=0.6)(width=32, height=32)).all()
+
+
+@py.test.mark.parametrize("width, height", [(64, 64), (97, 41), (33, 120)])
+def test_coverage(width, height):
+    """Ensure that coverage is only fractional along the edges of a shape."""
+
+    defn = sdf.Circle(r=0.7) - sdf.Square(size=0.2)
+    coverage = sdf.Coverage(defn=defn)(width=width, height=height)
+
+    assert coverage.shape == (height, width)
+    assert coverage.min() == 0
+    assert coverage.max() == 1
+
+    inside = mask.Coverage(defn=sdf.Fill(defn=defn))(width=width, height=height)
+    partial = (0 < coverage) & (coverage < 1)
+
+    assert (inside[coverage == 1] > 0).all()
+    assert (inside[coverage == 0] < 1).all()
+    assert partial.any()
+    assert np.abs(coverage - inside).max() < 0.5
+
+
+@py.test.mark.parametrize(
+    "defn",
+    [sdf.Circle(r=0.6, scale=2), sdf.Ellipse(r=0.5, stretch=True, scale=0.5)],
+)
+def test_coverage_inherits_coordinates(defn):
+    """Ensure that coverage uses the coordinate attributes of the shape, rather than
+    its own defaults."""
+
+    width, height = 64, 40
+    attributes = defn.attributes(inherited=True)
+    scale, stretch = attributes["scale"], attributes["stretch"]
+
+    coverage = sdf.Coverage(defn=defn)(width=width, height=height)
+    explicit = sdf.Coverage(defn=defn, scale=scale, stretch=stretch)
+
+    assert (coverage == explicit(width=width, height=height)).all()
+
+    with py.test.raises(ValueError) as err:
+        sdf.Coverage(defn=defn, scale=scale + 1)(width=width, height=height)
+
+    assert "does not match" in str(err.value)
+
+
+def test_coverage_tiled():
+    """Ensure that coverage is consistent when evaluating in tiles."""
+
+    coverage = sdf.Coverage(defn=sdf.Circle() + sdf.Square(xc=1, size=0.3))
+    tiled = Tiled(defn=coverage, size=(13, 7))
+
+    expected = coverage(width=97, height=41)
+    assert (tiled(width=97, height=41) == expected).all()
+
+
+def test_coverage_fill():
+    """Ensure that coverage can be used to draw shapes with smooth edges."""
+
+    coverage = sdf.Coverage(defn=sdf.Circle())(width=32, height=32)
+    img = image.fill(coverage, foreground="#000", background="#fff")
+
+    pixels = np.asarray(img)[..., 0]
+    assert len(np.unique(pixels)) > 2
+
+
+@py.test.mark.parametrize("name", ["Fill", "Outline", "Coverage"])
+def test_missing_defn(name):
+    """Ensure that we raise an error if there is no distance field to use."""
+
+    with py.test.raises(ValueError):
+        getattr(sdf, name)()(width=4, height=4)
@@ -0,0 +1,443 @@
+import numpy as np
+import py.test
+
+import arlunio as ar
+import arlunio.mask as mask
+import arlunio.math as math
+import arlunio.shape as shape
+from arlunio.profile import Profiler
+from arlunio.tile import Tiled
+
+STAR = [(np.cos(t), np.sin(t)) for t in np.linspace(0, 4 * np.pi, 5, endpoint=False)]
+
+SHAPES = [
+    shape.Circle(r=0.4, xc=0.3, yc=-0.2),
+    shape.Circle(r=0.5, pt=0.1, x0=0.5, scale=2),
+    shape.Ellipse(a=1, b=0.5, r=0.6, yc=0.5),
+    shape.Ellipse(r=0.5, pt=0.05, stretch=True),
+    shape.SuperEllipse(n=0.5, r=0.3, xc=-1),
+    shape.SuperEllipse(n=3, m=0.2, a=0.5, pt=0.1),
+    shape.Square(size=0.2, xc=1.2),
+    shape.Square(size=0.3, pt=0.1, yc=0.9),
+    shape.Rectangle(size=0.1, ratio=4, y0=0.5),
+    shape.Rectangle(size=0.1, ratio=0.25, pt=0.2),
+    shape.Polygon(points=[(0, 0.8), (0.8, 0), (0, -0.8), (-0.8, 0)], x0=0.2),
+    shape.Polygon(points=STAR, rule="nonzero", scale=2),
+    shape.Triangle(),
+    shape.Triangle(a=(0.9, 0.9), b=(1.5, 0.1), c=(0.2, 0.8)),
+]
+
+
+def evaluate_everywhere(defn, width, height):
+    """Evaluate the given shape at every pixel, by providing the coordinates
+    explicitly."""
+
+    x = math.X(x0=defn.x0, scale=defn.scale, stretch=defn.stretch)
+    y = math.Y(y0=defn.y0, scale=defn.scale, stretch=defn.stretch)
+
+    x, y = x(width=width, height=height), y(width=width, height=height)
+
+    if isinstance(defn, shape.Triangle):
+        p = math.Barycentric(a=defn.a, b=defn.b, c=defn.c)
+        return defn(p=p(x=x, y=y))
+
+    return defn(x=x, y=y)
+
+
+@py.test.fixture(params=[True, False], ids=["restricted", "default"])
+def restrict(request, monkeypatch):
+    """Run the test both with evaluation restricted to any bounds, however small the
+    image, and with the default thresholds."""
+
+    if request.param:
+        monkeypatch.setattr(ar, "_RESTRICT_MIN_PIXELS", 0)
+
+    return request.param
+
+
+@py.test.mark.parametrize("defn", SHAPES)
+@py.test.mark.parametrize("width, height", [(64, 64), (97, 41), (33, 120)])
+def test_bounds_contain_shape(defn, width, height, restrict):
+    """Ensure that a shape is entirely contained within its bounds and that
+    restricting evaluation to them does not change the result."""
+
+    expected = evaluate_everywhere(defn, width, height)
+    result = defn(width=width, height=height)
+
+    assert isinstance(result, mask.Mask)
+    assert result.shape == expected.shape
+    assert (result == expected).all()
+
+    x0, y0, x1, y1 = defn.bounds(width, height)
+    inside = np.full((height, width), False)
+    inside[y0:y1, x0:x1] = True
+
+    assert not (expected & ~inside).any()
+
+
+def test_bounds_smaller_than_image():
+    """Ensure that the bounds of a small shape are much smaller than the image."""
+
+    circle = shape.Circle(r=0.3, xc=0.5, yc=0.5)
+    x0, y0, x1, y1 = circle.bounds(200, 200)
+
+    assert (x1 - x0) * (y1 - y0) < 0.1 * 200 * 200
+
+
+def test_bounds_outside_image(restrict):
+    """Ensure that shapes entirely outside of the image have empty bounds and still
+    produce a mask of the correct size."""
+
+    square = shape.Square(size=0.1, xc=5)
+    x0, y0, x1, y1 = square.bounds(32, 16)
+
+    assert x0 == x1
+
+    result = square(width=32, height=16)
+
+    assert isinstance(result, mask.Mask)
+    assert result.shape == (16, 32)
+    assert not result.any()
+
+
+def test_bounds_operators(restrict):
+    """Ensure that operators combine the bounds of their operands."""
+
+    left = shape.Circle(r=0.3, xc=-0.5)
+    right = shape.Circle(r=0.3, xc=0.5)
+    width, height = 128, 64
+
+    lx0, ly0, lx1, ly1 = left.bounds(width, height)
+    rx0, ry0, rx1, ry1 = right.bounds(width, height)
+
+    assert (left + right).bounds(width, height) == (lx0, ly0, rx1, ry1)
+    assert (left - right).bounds(width, height) == left.bounds(width, height)
+
+    x0, y0, x1, y1 = (left * right).bounds(width, height)
+    assert x0 == x1
+
+    square = shape.Square(size=0.05)
+    combined = (left + right) - square
+
+    expected = left(width=width, height=height) + right(width=width, height=height)
+    expected = expected - square(width=width, height=height)
+
+    assert (combined(width=width, height=height) == expected).all()
+
+
+UNBOUNDED = [
+    mask.Repeat(defn=shape.Circle(r=0.6), n=4),
+    mask.Pixelize(defn=shape.Circle(r=0.6), scale=16),
+    mask.Map(
+        layout=np.array([[1, 0, 1], [0, 1, 0]]),
+        legend={1: shape.Circle(r=0.6), 0: shape.Square(size=0.4)},
+    ),
+]
+
+
+@py.test.mark.parametrize("other", UNBOUNDED)
+@py.test.mark.parametrize("op", ["sub", "mul"])
+def test_bounds_operators_unbounded(other, op):
+    """Ensure that operands without bounds are evaluated over the full image, even
+    when the other operand has bounds."""
+
+    circle = shape.Circle(r=0.5, xc=0.4, yc=0.3)
+    defn = circle - other if op == "sub" else circle * other
+
+    assert circle._restriction({"width": 512, "height": 512}) is not None
+    assert defn.bounds(512, 512) is None
+
+    a, b = circle(width=512, height=512), other(width=512, height=512)
+    expected = a - b if op == "sub" else a * b
+
+    assert (defn(width=512, height=512) == expected).all()
+
+
+def test_bounds_tiled(restrict):
+    """Ensure that bounded evaluation takes the active viewport into account."""
+
+    defn = shape.Circle(r=0.3, xc=0.5) + shape.Square(size=0.2, xc=-0.8)
+    tiled = Tiled(defn=defn, size=(23, 17))
+
+    expected = evaluate_everywhere(shape.Circle(r=0.3, xc=0.5), 100, 80)
+    expected += evaluate_everywhere(shape.Square(size=0.2, xc=-0.8), 100, 80)
+
+    assert (tiled(width=100, height=80) == expected).all()
+
+
+def test_restriction_threshold():
+    """Ensure that evaluation is only restricted when the bounds skip enough of the
+    image to be worth it."""
+
+    circle = shape.Circle(r=0.3, xc=0.5)
+
+    assert circle._restriction({"width": 32, "height": 32}) is None
+    assert circle._restriction({"width": 512, "height": 512}) is not None
+
+    assert shape.Circle(r=0.95)._restriction({"width": 512, "height": 512}) is None
+
+
+def test_restriction_shares_bases(monkeypatch):
+    """Ensure that bases evaluated within the same restricted region are shared."""
+
+    monkeypatch.setattr(ar, "_RESTRICT_MIN_PIXELS", 0)
+    defn = shape.Circle(r=0.3) + shape.Circle(r=0.25)
+
+    with Profiler() as profiler:
+        result = defn(width=64, height=64)
+
+    expected = shape.Circle(r=0.3)(width=64, height=64)
+    assert (result == expected).all()
+
+    add = profiler.root.children["MaskAdd"]
+    assert add.calls == 1
+    assert add.children["Circle"].calls == 2
+    assert add.children["Circle"].children["X"].calls == 1
+    assert add.children["Circle"].children["X"].reused == 1
+
+
+@py.test.mark.parametrize("defn", SHAPES[:-2])
+def test_rowwise(defn, monkeypatch):
+    """Ensure that evaluating a shape in small blocks of rows does not change the
+    result."""
+
+    expected = evaluate_everywhere(defn, 97, 41)
+
+    monkeypatch.setattr(shape, "_BLOCK_SIZE", 3 * 8 * 97)
+    result = evaluate_everywhere(defn, 97, 41)
+
+    assert isinstance(result, mask.Mask)
+    assert (result == expected).all()
+
+
+def test_rowwise_coordinates(monkeypatch):
+    """Ensure that shapes evaluated in blocks of rows can still be given coordinates
+    that vary in both directions."""
+
+    x = math.X()(width=50, height=40)
+    y = math.Y()(width=50, height=40)
+    u, v = x + y, y - x
+
+    circle = shape.Circle(r=0.5, pt=0.1)
+    radius = np.sqrt(u ** 2 + v ** 2)
+    expected = (0.9 * 0.25 < radius) & (radius < 1.1 * 0.25)
+
+    monkeypatch.setattr(shape, "_BLOCK_SIZE", 8 * 8 * 50)
+    assert (circle(x=u, y=v) == expected).all()
+
+
+@py.test.mark.parametrize("pt", [None, 0.1, [0.05, 0.2, 0.1, 0.3, 0.15]])
+@py.test.mark.parametrize("width, height", [(64, 64), (97, 41), (33, 120)])
+def test_circles(pt, width, height):
+    """Ensure that drawing many circles at once is the same as adding together the
+    individual circles."""
+
+    xc = [-1.2, 0.3, 0.35, 0.9, 0]
+    yc = [0.5, -0.2, -0.1, 0.8, 0]
+    r = [0.3, 0.5, 0.2, 0.6, 0.1]
+    pts = np.broadcast_to(np.asarray(pt, dtype=float), (5,))
+
+    circles = shape.Circles(xc=xc, yc=yc, r=r, pt=pt)
+    result = circles(width=width, height=height)
+
+    expected = mask.Mask.empty(height, width)
+
+    for i in range(5):
+        p = None if pt is None else pts[i]
+        circle = shape.Circle(xc=xc[i], yc=yc[i], r=r[i], pt=p)
+
+        expected = expected + circle(width=width, height=height)
+
+    assert isinstance(result, mask.Mask)
+    assert (result == expected).all()
+    assert (evaluate_everywhere(circles, width, height) == expected).all()
+
+    x0, y0, x1, y1 = circles.bounds(width, height)
+    inside = np.full((height, width), False)
+    inside[max(y0, 0) : y1, max(x0, 0) : x1] = True
+
+    assert not (expected & ~inside).any()
+
+
+def test_circles_many():
+    """Ensure that we can draw many circles at once."""
+
+    rng = np.random.default_rng(1234)
+    xc, yc = rng.uniform(-2, 2, size=(2, 2000))
+    r = rng.uniform(0.05, 0.2, size=2000)
+
+    circles = shape.Circles(xc=xc, yc=yc, r=r)
+    result = circles(width=200, height=100)
+
+    x = math.X()(width=200, height=100)[..., np.newaxis]
+    y = math.Y()(width=200, height=100)[..., np.newaxis]
+    expected = (np.sqrt((x - xc) ** 2 + (y - yc) ** 2) < r ** 2).any(axis=-1)
+
+    assert (result == expected).all()
+
+
+def test_circles_coordinates():
+    """Ensure that circles can be given coordinates that vary in both directions."""
+
+    x = math.X()(width=50, height=40)
+    y = math.Y()(width=50, height=40)
+    u, v = x + y, y - x
+
+    circles = shape.Circles(xc=[0, 0.5], yc=[0.5, 0], r=0.5)
+
+    expected = shape.Circle(yc=0.5, r=0.5)(x=u, y=v)
+    expected = expected + shape.Circle(xc=0.5, r=0.5)(x=u, y=v)
+
+    assert (circles(x=u, y=v) == expected).all()
+
+
+def test_circles_tiled():
+    """Ensure that circles are consistent when evaluated in tiles."""
+
+    circles = shape.Circles(xc=[-0.5, 0.5, 1.2], yc=[0, 0.3, -0.6], r=0.6, pt=0.1)
+    tiled = Tiled(defn=circles, size=(23, 17))
+
+    assert (tiled(width=100, height=80) == circles(width=100, height=80)).all()
+
+
+def test_circles_empty():
+    """Ensure that drawing no circles produces an empty mask."""
+
+    circles = shape.Circles(xc=[], yc=[])
+    result = circles(width=16, height=8)
+
+    assert circles.bounds(16, 8) == (0, 0, 0, 0)
+    assert result.shape == (8, 16)
+    assert not result.any()
+
+
+def inside_polygon(points, x, y, rule):
+    """Test each point against each edge of a polygon."""
+
+    points = np.asarray(points, dtype=float)
+    winding = np.zeros(np.broadcast_shapes(x.shape, y.shape), dtype=int)
+
+    for (x0, y0), (x1, y1) in zip(points, np.roll(points, -1, axis=0)):
+
+        if y0 == y1:
+            continue
+
+        crosses = (y0 <= y) != (y1 <= y)
+        crosses &= x < x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+
+        winding += np.where(crosses, 1 if y1 > y0 or rule == "evenodd" else -1, 0)
+
+    return winding % 2 == 1 if rule == "evenodd" else winding != 0
+
+
+# Turns the same way at each corner, but passes through (0.5, -0.5) twice.
+REVISIT = [(-0.75, 0.75), (0.5, -0.5), (0, -0.75), (-0.75, -0.25), (1, 0), (0.5, -0.5)]
+
+POLYGONS = [
+    [(0, 0.8), (0.8, 0), (0, -0.8), (-0.8, 0)],
+    [(-1, -1), (1, -1), (1, 1), (0, 0), (-1, 1)],
+    STAR,
+    np.random.default_rng(1234).uniform(-1, 1, size=(12, 2)),
+    REVISIT,
+]
+
+
+@py.test.mark.parametrize("points", POLYGONS)
+@py.test.mark.parametrize("rule", ["evenodd", "nonzero"])
+@py.test.mark.parametrize("width, height", [(64, 64), (97, 41), (33, 120)])
+def test_polygon(points, rule, width, height):
+    """Ensure that filling polygons row by row agrees with testing each pixel."""
+
+    x = math.X()(width=width, height=height)
+    y = math.Y()(width=width, height=height)
+    expected = inside_polygon(points, x, y, rule)
+
+    polygon = shape.Polygon(points=points, rule=rule)
+    result = polygon(width=width, height=height)
+
+    assert isinstance(result, mask.Mask)
+    assert (result == expected).all()
+
+    # Coordinates that vary in both directions are tested pixel by pixel.
+    assert (polygon(x=x + 0, y=y + 0) == expected).all()
+
+
+@py.test.mark.parametrize("points", POLYGONS)
+def test_polygon_convex(points, monkeypatch):
+    """Ensure that the fast path for convex polygons does not change the result."""
+
+    polygon = shape.Polygon(points=points)
+    expected = polygon(width=97, height=41)
+
+    monkeypatch.setattr(shape, "_is_convex", lambda points: False)
+    assert (polygon(width=97, height=41) == expected).all()
+
+
+def test_polygon_is_convex():
+    """Ensure that we can tell which polygons are convex."""
+
+    assert shape._is_convex(POLYGONS[0])
+    assert shape._is_convex(POLYGONS[0][::-1])
+    assert not shape._is_convex(POLYGONS[1])
+    assert not shape._is_convex(STAR)
+    assert not shape._is_convex(REVISIT)
+
+    # Doubling back along an edge
+    assert not shape._is_convex([(0, 0), (1, 0), (0.5, 0), (0.5, 1)])
+
+
+def test_polygon_revisits_vertex():
+    """Ensure that a polygon passing through the same vertex twice is filled
+    according to the fill rule."""
+
+    x = math.X()(width=40, height=23)
+    y = math.Y()(width=40, height=23)
+
+    result = shape.Polygon(points=REVISIT)(width=40, height=23)
+    assert (result == inside_polygon(REVISIT, x, y, "evenodd")).all()
+
+
+@py.test.mark.parametrize("rule", ["evenodd", "nonzero"])
+def test_polygon_two_crossings(rule, monkeypatch):
+    """Ensure that non-convex polygons crossed at most twice on each row are filled
+    the same way as any other polygon."""
+
+    points = [(-1, 0), (1, 0.9), (0, 0), (1, -0.9)]
+    assert not shape._is_convex(points)
+
+    x = math.X()(width=97, height=41)
+    y = math.Y()(width=97, height=41)
+    expected = inside_polygon(points, x, y, rule)
+
+    polygon = shape.Polygon(points=points, rule=rule)
+    assert (polygon(width=97, height=41) == expected).all()
+
+    monkeypatch.setattr(shape, "_at_most_two", lambda row, height: False)
+    assert (polygon(width=97, height=41) == expected).all()
+
+
+def test_polygon_fill_rule():
+    """Ensure that the fill rule decides if the center of a star is filled."""
+
+    evenodd = shape.Polygon(points=STAR)(width=33, height=33)
+    nonzero = shape.Polygon(points=STAR, rule="nonzero")(width=33, height=33)
+
+    assert not evenodd[16, 16]
+    assert nonzero[16, 16]
+    assert (nonzero[evenodd]).all()
+
+
+def test_polygon_tiled():
+    """Ensure that polygons are consistent when evaluated in tiles."""
+
+    polygon = shape.Polygon(points=POLYGONS[3], rule="nonzero")
+    tiled = Tiled(defn=polygon, size=(23, 17))
+
+    assert (tiled(width=100, height=80) == polygon(width=100, height=80)).all()
+
+
+def test_polygon_invalid_rule():
+    """Ensure that we raise an error when given an unknown fill rule."""
+
+    with py.test.raises(ValueError, match="fill rule"):
+        shape.Polygon(rule="other")(width=4, height=4)
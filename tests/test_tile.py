@@ -0,0 +1,161 @@
+import gc
+import weakref
+from multiprocessing import shared_memory
+
+import numpy as np
+import py.test
+from hypothesis import given
+from hypothesis.strategies import integers
+
+import arlunio as ar
+import arlunio.mask as mask
+import arlunio.math as math
+import arlunio.shape as shape
+import arlunio.testing as T
+from arlunio.tile import _shared_buffer
+from arlunio.tile import Evaluator
+from arlunio.tile import Tiled
+from arlunio.tile import tiles
+from arlunio.tile import Viewport
+
+
+@given(width=T.dimension, height=T.dimension, size=integers(min_value=16, max_value=64))
+def test_tiles_cover_image(width, height, size):
+    """Ensure that the tiles cover every pixel of the image exactly once."""
+
+    counts = np.zeros((height, width), dtype=int)
+
+    for x, y, w, h in tiles(width, height, size):
+        counts[y : y + h, x : x + w] += 1
+
+    assert (counts == 1).all()
+
+
+def test_tiles_validation():
+    """Ensure that tile sizes are validated."""
+
+    with py.test.raises(ValueError) as err:
+        list(tiles(4, 4, (0, 2)))
+
+    assert "Invalid tile size" in str(err.value)
+
+
+def test_viewport_restored():
+    """Ensure that the previous viewport is restored when exiting a viewport."""
+
+    outer = Viewport(width=8, height=8)
+    inner = outer.region(2, 3)
+
+    assert Viewport.current(4, 4) == Viewport(width=4, height=4)
+
+    with outer:
+        with inner:
+            assert Viewport.current(4, 4) == Viewport(width=8, height=8, x=2, y=3)
+
+        assert Viewport.current(4, 4) is outer
+
+    assert Viewport.current(4, 4) == Viewport(width=4, height=4)
+
+
+@py.test.mark.parametrize(
+    "defn",
+    [
+        math.X(),
+        math.Y(scale=2),
+        math.R(x0=0.5),
+        math.Barycentric(),
+        shape.Circle(pt=0.1),
+        shape.Square() + shape.Circle(xc=0.5),
+    ],
+)
+@py.test.mark.parametrize("width, height, size", [(64, 48, 16), (97, 131, (25, 40))])
+def test_tiled_matches_direct_evaluation(defn, width, height, size):
+    """Ensure that evaluating a definition in tiles produces the same result as
+    evaluating it directly."""
+
+    tiled = Tiled(defn=defn, size=size)
+
+    expected = defn(width=width, height=height)
+    actual = tiled(width=width, height=height)
+
+    assert type(actual) is type(expected)
+    assert actual.shape == expected.shape
+    assert (actual == expected).all()
+
+
+def test_tiled_nested():
+    """Ensure that tiles of tiles are positioned relative to the outer tile."""
+
+    circle = shape.Circle()
+    tiled = Tiled(defn=Tiled(defn=circle, size=7), size=(20, 30))
+
+    result = tiled(width=64, height=48)
+
+    assert isinstance(result, mask.Mask)
+    assert (result == circle(width=64, height=48)).all()
+
+
+def test_tiled_validation():
+    """Ensure that a definition is required."""
+
+    with py.test.raises(ValueError) as err:
+        Tiled()(width=4, height=4)
+
+    assert "must provide a definition" in str(err.value)
+
+
+@py.test.mark.parametrize("threads", [False, True])
+def test_evaluator_matches_direct_evaluation(threads):
+    """Ensure that evaluating a definition in parallel produces the same result as
+    evaluating it directly."""
+
+    defn = (shape.Circle() + shape.Square(xc=0.5)) - shape.Circle(r=0.2)
+    expected = defn(width=97, height=64)
+
+    with Evaluator(size=(30, 20), workers=2, threads=threads) as evaluator:
+        result = evaluator.evaluate(defn, width=97, height=64)
+        again = evaluator.evaluate(math.R(), width=40, height=40)
+
+    assert isinstance(result, mask.Mask)
+    assert (result == expected).all()
+    assert (again == math.R()(width=40, height=40)).all()
+
+
+def test_evaluator_result_is_shared():
+    """Ensure that worker processes write directly into the array that is returned
+    rather than a copy of it, and that its memory is released along with it."""
+
+    defn = shape.Circle()
+
+    with Evaluator(size=32, workers=2) as evaluator:
+        result = evaluator.evaluate(defn, width=64, height=48)
+
+    assert isinstance(result, mask.Mask)
+    assert (result == defn(width=64, height=48)).all()
+
+    buffer = _shared_buffer(result)
+    result[...] = False
+
+    with py.test.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=buffer.name)
+
+    ref = weakref.ref(buffer)
+    del buffer, result
+    gc.collect()
+
+    assert ref() is None
+
+
+def test_evaluator_threads_local_definition():
+    """Ensure that definitions that cannot be pickled can be evaluated using
+    threads."""
+
+    @ar.definition
+    def Local(x: math.X, y: math.Y) -> mask.Mask:
+        return x > y
+
+    evaluator = Evaluator(size=16, workers=2, threads=True)
+    result = evaluator.evaluate(Local(), width=50, height=30)
+
+    assert (result == Local()(width=50, height=30)).all()
+    assert evaluator._pool is None